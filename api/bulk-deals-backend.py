@@ -4,33 +4,52 @@ Vercel Serverless Python Function for Bulk Deals API
 import json
 import os
 from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
 
 # Load database from file
 DATABASE_PATH = os.path.join(os.path.dirname(__file__), '..', 'python-services', 'data', 'bulk-deals', 'bulk_deals_database.json')
 
+# Deals serialized per write (see python-services/deal_stream.py)
+STREAM_CHUNK_SIZE = 2000
+
 def load_database():
     if os.path.exists(DATABASE_PATH):
         with open(DATABASE_PATH, 'r') as f:
             return json.load(f)
     return {'deals': [], 'metadata': {}}
 
+def dumps(value):
+    return json.dumps(value, separators=(',', ':'), default=str)
+
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
+        db = load_database()
+        deals = db.get('deals', [])
+        query = parse_qs(urlparse(self.path).query)
+        ndjson = query.get('format', [''])[0].lower() == 'ndjson' or \
+            'application/x-ndjson' in (self.headers.get('Accept') or '')
+
         self.send_response(200)
-        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-type', 'application/x-ndjson' if ndjson else 'application/json')
         self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('X-Total-Count', str(len(deals)))
         self.end_headers()
-        
-        db = load_database()
-        response = {
-            'success': True,
-            'deals': db.get('deals', []),
-            'count': len(db.get('deals', [])),
-            'metadata': db.get('metadata', {})
-        }
-        self.wfile.write(json.dumps(response).encode())
+
+        # Envelope first, then the deals a chunk at a time, instead of one json.dumps of everything
+        if not ndjson:
+            envelope = {'success': True, 'count': len(deals), 'metadata': db.get('metadata', {})}
+            self.wfile.write((dumps(envelope)[:-1] + ',"deals":[').encode())
+        for i in range(0, len(deals), STREAM_CHUNK_SIZE):
+            chunk = deals[i:i + STREAM_CHUNK_SIZE]
+            if ndjson:
+                body = ''.join(dumps(deal) + '\n' for deal in chunk)
+            else:
+                body = ('' if i == 0 else ',') + dumps(chunk)[1:-1]
+            self.wfile.write(body.encode())
+        if not ndjson:
+            self.wfile.write(b']}')
         return
-    
+
     def do_OPTIONS(self):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
@@ -18,7 +18,7 @@ import io
 import re
 from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 from collections import OrderedDict
-from bulk_deals_database import BulkDealsDatabase, create_database_api
+from bulk_deals_database import create_database_api, open_database
 
 logging.basicConfig(
     level=logging.INFO,
@@ -102,7 +102,8 @@ def add_security_headers(response):
     response.headers['X-Content-Type-Options'] = 'nosniff'
     response.headers['X-Frame-Options'] = 'DENY'
     response.headers['X-XSS-Protection'] = '1; mode=block'
-    response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, proxy-revalidate'
+    # Bulk deals data routes set revalidation headers with an ETag (see create_database_api)
+    response.headers.setdefault('Cache-Control', 'no-store, no-cache, must-revalidate, proxy-revalidate')
     return response
 
 @app.after_request
@@ -120,11 +121,11 @@ except ImportError:
     logger.warning("bsedata not available - market data endpoints disabled")
 
 # Initialize Bulk Deals Database
-db_manager = BulkDealsDatabase()
+db_manager = open_database()
 create_database_api(app, db_manager)
 
 def load_database():
-    return db_manager.database
+    return db_manager
 
 def invalidate_db_cache():
     pass # Managed by BulkDealsDatabase
@@ -167,11 +168,13 @@ def health():
         'bse_available': BSE_AVAILABLE,
         'cache_stats': {
             'quote_cache_size': len(quote_cache.cache),
-            'pdf_cache_size': len(pdf_cache.cache)
+            'pdf_cache_size': len(pdf_cache.cache),
+            'bulk_deals_responses': app.extensions['bulk_deals_response_cache'].stats()
         },
         'database': {
-            'total_deals': len(db.get('deals', [])),
-            'last_updated': db.get('metadata', {}).get('last_updated')
+            'total_deals': len(db.store),
+            'engine': db.engine,
+            'last_updated': db.metadata.get('last_updated')
         }
     })
 
@@ -395,31 +398,17 @@ def get_announcements():
 @app.route('/api/bulk-deals/stats', methods=['GET'])
 def get_stats():
     db = load_database()
-    deals = db.get('deals', [])
+    start = request.args.get('start')
+    end = request.args.get('end')
+    daily = request.args.get('daily', '').lower() in ('1', 'true')
     
-    bse_count = len([d for d in deals if d.get('exchange', '').upper() == 'BSE'])
-    nse_count = len([d for d in deals if d.get('exchange', '').upper() == 'NSE'])
-    
-    buy_count = len([d for d in deals if d.get('dealType', '').upper() == 'B'])
-    sell_count = len([d for d in deals if d.get('dealType', '').upper() == 'S'])
-    
-    dates = [d.get('date', '') for d in deals if d.get('date')]
-    
-    total_value = sum(d.get('value', 0) for d in deals)
+    # Sums over the per-date rollup rows in the window (whole history by default)
+    stats = db.get_stats(start, end, daily=daily)
     
     return jsonify({
         'success': True,
-        'total_deals': len(deals),
-        'bse_deals': bse_count,
-        'nse_deals': nse_count,
-        'buy_deals': buy_count,
-        'sell_deals': sell_count,
-        'total_value': total_value,
-        'date_range': {
-            'earliest': min(dates) if dates else None,
-            'latest': max(dates) if dates else None
-        },
-        'metadata': db.get('metadata', {})
+        **stats,
+        'metadata': db.metadata
     })
 
 @app.route('/api/bulk-deals/search', methods=['GET'])
@@ -431,18 +420,8 @@ def search_deals():
     if len(query) < 2:
         return jsonify({'success': False, 'error': 'Query too short (min 2 chars)'}), 400
     
-    db = load_database()
-    deals = db.get('deals', [])
-    
-    results = []
-    for deal in deals:
-        scrip_name = deal.get('scripName', '').lower()
-        client_name = deal.get('clientName', '').lower()
-        
-        if query in scrip_name or query in client_name:
-            results.append(deal)
-            if len(results) >= limit:
-                break
+    # Trigram index over security and client names, newest and largest deals first
+    results = load_database().search_deals(query, limit)
     
     return jsonify({
         'success': True,
@@ -0,0 +1,232 @@
+"""
+Benchmark the bulk deals storage engines
+Compares memory and scan times of the dict and columnar engines, date-range
+queries answered by a full scan vs the sorted date index, equality filters
+as string predicates vs dictionary codes, name search latency through the
+trigram index, windowed stats from the daily rollups, and on-disk size of the
+JSON file vs the binary snapshot.
+
+Usage (from python-services directory):
+
+    python benchmark_deal_store.py              # real database if present
+    python benchmark_deal_store.py --rows 183005 --synthetic
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from typing import Dict, List
+
+import numpy as np
+
+from bulk_deals_database import DATABASE_FILE
+from deal_indexes import DailyRollups, DateIndex, SearchIndex
+from deal_snapshot import write_snapshot
+from deal_store import ColumnarDealStore, create_store, date_to_ordinal
+
+
+def synthetic_deals(rows: int, seed: int = 42) -> List[Dict]:
+    """Deals with roughly the cardinalities of the real BSE/NSE history"""
+    rng = random.Random(seed)
+    start = date(2012, 5, 24)
+    days = [(start + timedelta(days=i)).isoformat() for i in range(0, 4970, 1) if (start + timedelta(days=i)).weekday() < 5]
+    scrips = [(str(500000 + i), f"COMPANY {i} LTD") for i in range(6000)]
+    clients = [f"CLIENT {i} {'PRIVATE LIMITED' if i % 3 else 'HUF'}" for i in range(40000)]
+    deals = []
+    for _ in range(rows):
+        scrip, name = rng.choice(scrips)
+        deals.append({
+            'date': rng.choice(days),
+            'scripCode': scrip,
+            'securityName': name,
+            'clientName': rng.choice(clients),
+            'side': rng.choice(('BUY', 'SELL')),
+            'quantity': rng.randint(1000, 5_000_000),
+            'price': round(rng.uniform(1, 5000), 2),
+            'type': 'bulk',
+            'exchange': 'BSE' if rng.random() < 0.998 else 'NSE',
+        })
+    return deals
+
+
+def timed(fn, repeat: int = 5) -> float:
+    """Best-of-N wall time in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, (time.perf_counter() - t0) * 1000)
+    return best
+
+
+def measure(engine: str, raw: str) -> Dict:
+    gc.collect()
+    tracemalloc.start()
+    deals = json.loads(raw)['deals']
+    store = create_store(engine, deals)
+    del deals
+    gc.collect()
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start, end = store.date_bounds()
+    client = store.get(len(store) // 2)['clientName'].lower()
+    month_start = (date.fromisoformat(end) - timedelta(days=29)).isoformat()
+    return {
+        'engine': engine,
+        'memory_mb': memory / (1024 * 1024),
+        'range_30d_ms': timed(lambda: store.take(store.offsets_between(month_start, end))),
+        'range_full_ms': timed(lambda: store.offsets_between(start, end), repeat=3),
+        'stats_ms': timed(lambda: (store.value_counts('exchange'), store.value_counts('side'), store.date_bounds()), repeat=3),
+        'search_ms': timed(lambda: store.offsets_matching('clientName', lambda v: 'capital' in v.lower()), repeat=3),
+        'ranges': measure_date_ranges(store, start, end),
+        'search_index': measure_search_index(store),
+        'rollups': measure_rollups(store, end),
+        # Case-insensitive client filter: predicate on every string vs dictionary codes
+        'filter_ms': (
+            timed(lambda: store.offsets_matching('clientName', lambda v: v.upper() == client.upper()), repeat=3),
+            timed(lambda: store.offsets_equal('clientName', client, ignore_case=True), repeat=3),
+        ),
+    }
+
+
+def measure_search_index(store, queries: int = 2000) -> Dict:
+    """Build time and p50/p99 latency of SearchIndex over substrings of stored names"""
+    t0 = time.perf_counter()
+    index = SearchIndex.from_store(store)
+    build_ms = (time.perf_counter() - t0) * 1000
+    date_index = DateIndex(store.date_ordinals())
+    rng = random.Random(7)
+    latencies = []
+    for _ in range(queries):
+        name = rng.choice(index.names)
+        length = rng.randint(2, 14)
+        start = rng.randint(0, max(0, len(name) - length))
+        t0 = time.perf_counter()
+        index.search(name[start:start + length], 100, date_index)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return {'build_ms': build_ms, 'p50_ms': float(np.percentile(latencies, 50)),
+            'p99_ms': float(np.percentile(latencies, 99))}
+
+
+def measure_rollups(store, end: str) -> Dict:
+    """DailyRollups build time and summary latency over the whole history and the last year"""
+    t0 = time.perf_counter()
+    rollups = DailyRollups.from_store(store)
+    build_ms = (time.perf_counter() - t0) * 1000
+    year_start = date_to_ordinal((date.fromisoformat(end) - timedelta(days=364)).isoformat())
+    return {
+        'build_ms': build_ms,
+        'rows': len(rollups),
+        'full_ms': timed(lambda: rollups.summary()),
+        'year_ms': timed(lambda: rollups.summary(year_start, date_to_ordinal(end))),
+    }
+
+
+def measure_uninterned(raw: str) -> float:
+    """MB held by the plain json.loads deal list (one string object per field per deal)"""
+    gc.collect()
+    tracemalloc.start()
+    deals = json.loads(raw)['deals']
+    gc.collect()
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del deals
+    return memory / (1024 * 1024)
+
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def measure_files(raw: str) -> Dict:
+    """MB on disk: the JSON file vs the binary snapshot (dictionaries stored once)"""
+    store = ColumnarDealStore.from_dicts(json.loads(raw)['deals'])
+    tmp = tempfile.mkdtemp()
+    try:
+        write_snapshot(tmp, store, None)
+        snapshot_bytes = directory_size(tmp)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return {'json_mb': len(raw.encode('utf-8')) / (1024 * 1024), 'snapshot_mb': snapshot_bytes / (1024 * 1024)}
+
+
+def measure_date_ranges(store, start: str, end: str) -> Dict:
+    """1-day, 30-day and full-history range queries: full scan vs DateIndex"""
+    index = DateIndex(store.date_ordinals())
+    end_date = date.fromisoformat(end)
+    windows = {
+        '1 day': (end, end),
+        '30 days': ((end_date - timedelta(days=29)).isoformat(), end),
+        'full': (start, end),
+    }
+    results = {}
+    for label, (lo, hi) in windows.items():
+        lo_ord, hi_ord = date_to_ordinal(lo), date_to_ordinal(hi)
+        results[label] = (
+            timed(lambda: store.take(store.offsets_between(lo, hi)), repeat=3),
+            timed(lambda: store.take(np.sort(index.offsets_between(lo_ord, hi_ord))), repeat=3),
+        )
+    results['1 day count'] = (
+        timed(lambda: len(store.offsets_between(end, end)), repeat=3),
+        timed(lambda: index.count_between(date_to_ordinal(end), date_to_ordinal(end)), repeat=3),
+    )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk deals storage engines")
+    parser.add_argument('--rows', type=int, default=183005, help="Rows for the synthetic dataset")
+    parser.add_argument('--synthetic', action='store_true', help="Ignore the real database file")
+    args = parser.parse_args()
+
+    if not args.synthetic and os.path.exists(DATABASE_FILE):
+        print(f"📁 Using {DATABASE_FILE}")
+        with open(DATABASE_FILE, 'r', encoding='utf-8') as f:
+            raw = f.read()
+    else:
+        print(f"🧪 Using {args.rows:,} synthetic deals")
+        raw = json.dumps({'deals': synthetic_deals(args.rows)})
+
+    uninterned_mb = measure_uninterned(raw)
+    results = [measure(engine, raw) for engine in ('dict', 'columnar')]
+    files = measure_files(raw)
+
+    print(f"\n{'engine':<10}{'memory MB':>12}{'30d range':>12}{'full range':>12}{'stats':>10}{'search':>10}")
+    print(f"{'json':<10}{uninterned_mb:>12.1f}   (plain json.loads, strings not interned)")
+    for r in results:
+        print(f"{r['engine']:<10}{r['memory_mb']:>12.1f}{r['range_30d_ms']:>10.2f}ms"
+              f"{r['range_full_ms']:>10.2f}ms{r['stats_ms']:>8.2f}ms{r['search_ms']:>8.2f}ms")
+
+    print(f"\n{'engine':<10}{'client filter: predicate':>26}{'codes':>12}")
+    for r in results:
+        predicate_ms, codes_ms = r['filter_ms']
+        print(f"{r['engine']:<10}{predicate_ms:>24.2f}ms{codes_ms:>10.2f}ms")
+
+    print(f"\n{'engine':<10}{'search index build':>20}{'p50':>10}{'p99':>10}")
+    for r in results:
+        si = r['search_index']
+        print(f"{r['engine']:<10}{si['build_ms']:>18.1f}ms{si['p50_ms']:>8.2f}ms{si['p99_ms']:>8.2f}ms")
+
+    print(f"\n{'engine':<10}{'rollup build':>14}{'days':>8}{'full stats':>12}{'1y stats':>12}")
+    for r in results:
+        ru = r['rollups']
+        print(f"{r['engine']:<10}{ru['build_ms']:>12.1f}ms{ru['rows']:>8}{ru['full_ms']:>10.3f}ms{ru['year_ms']:>10.3f}ms")
+
+    print(f"\n💾 On disk: JSON {files['json_mb']:.1f} MB, binary snapshot {files['snapshot_mb']:.1f} MB")
+
+    print(f"\n{'engine':<10}{'range':<14}{'scan':>12}{'date index':>14}")
+    for r in results:
+        for label, (scan_ms, index_ms) in r['ranges'].items():
+            print(f"{r['engine']:<10}{label:<14}{scan_ms:>10.3f}ms{index_ms:>12.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -31,6 +31,8 @@ except Exception as e:
     bulk_deals_scraper = None
 
 from bulk_deals_database import BulkDealsDatabase, initialize_database, create_database_api
+from deal_ingest import deal_to_scraped, scraped_to_deal
+from deal_store import normalize_date
 
 app = Flask(__name__)
 CORS(app)
@@ -252,35 +254,39 @@ def get_bulk_deals():
         if not date:
             # Default to today's date
             date = datetime.now().strftime('%Y-%m-%d')
-        
-        # Try to load from cached file first (for automatic downloads)
-        data_dir = os.path.join(os.path.dirname(__file__), 'data', 'bulk-deals')
-        cache_file = os.path.join(data_dir, f'bulk_deals_{date}.json')
-        
-        if os.path.exists(cache_file):
-            print(f"[BSE Service] Loading bulk deals from cache: {cache_file}")
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                cached_data = json.load(f)
-                return jsonify({
-                    "success": True,
-                    "date": date,
-                    "count": cached_data.get('count', 0),
-                    "data": cached_data.get('deals', []),
-                    "cached": True,
-                    "downloaded_at": cached_data.get('downloaded_at')
-                })
-        
-        # If not cached, scrape fresh data
+        date = normalize_date(date)
+        exchange = request.args.get('exchange', 'both').upper()
+
+        # Served from the database's date index; day files are ingested into it
+        deals = bulk_deals_db.get_deals_by_date_range(date, date, exchange if exchange in ('BSE', 'NSE') else None)
+
+        # Scrape only for a date newer than anything ingested (e.g. today before the evening update)
+        _, latest = bulk_deals_db.aggregates.date_bounds()
+        if deals or not bulk_deals_scraper or (latest and date <= latest):
+            return jsonify({
+                "success": True,
+                "date": date,
+                "count": len(deals),
+                "data": [deal_to_scraped(d) for d in deals],
+                "cached": True,
+                "source": "database"
+            })
+
         print(f"[BSE Service] Fetching bulk deals for date: {date}")
         deals = bulk_deals_scraper.scrape_bulk_deals(date)
+        if deals:
+            bulk_deals_db.add_deals([scraped_to_deal(d, date) for d in deals])
         
-        return jsonify({
+        response = jsonify({
             "success": True,
             "date": date,
             "count": len(deals),
             "data": deals,
             "cached": False
         })
+        # Live scrape, not database data: no generation ETag
+        response.headers['Cache-Control'] = 'no-store'
+        return response
     except Exception as e:
         print(f"[BSE Service] Error fetching bulk deals: {e}")
         return jsonify({"error": str(e)}), 500
@@ -292,13 +298,16 @@ def get_company_bulk_deals(scrip_code):
     
     try:
         deals = bulk_deals_scraper.get_company_bulk_deals(scrip_code, days)
-        return jsonify({
+        response = jsonify({
             'success': True,
             'data': deals,
             'count': len(deals),
             'scripCode': scrip_code,
             'days': days
         })
+        # Scraped live, so it can't be tagged with the database generation
+        response.headers['Cache-Control'] = 'no-store'
+        return response
     except Exception as e:
         return jsonify({
             'success': False,
@@ -9,7 +9,8 @@ Usage (from python-services directory):
     python bulk_deals_backfill.py --days 730
 
 This will fetch combined BSE+NSE bulk deals for the last ~2 years and
-store them under data/bulk-deals/bulk_deals_YYYY-MM-DD.json
+store them under data/bulk-deals/bulk_deals_YYYY-MM-DD.json, then ingest them into the
+bulk deals database (see deal_ingest.py)
 """
 
 import argparse
@@ -19,7 +20,9 @@ import os
 import time
 from datetime import datetime, timedelta
 
+from bulk_deals_database import open_database
 from bulk_deals_scraper import BulkDealsScraper
+from deal_ingest import ingest_day_files
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data", "bulk-deals")
 os.makedirs(DATA_DIR, exist_ok=True)
@@ -114,6 +117,9 @@ def main() -> None:
     time.sleep(max(args.delay, 0))
     current += timedelta(days=1)
 
+  # Stream the day files into the main database (files already ingested are skipped)
+  ingest_day_files(open_database(), DATA_DIR)
+
   logger.info("Backfill complete")
 
 
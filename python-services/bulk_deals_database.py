@@ -6,32 +6,172 @@ Scheduled to update daily at 6:02 PM IST
 
 import os
 import json
+import base64
+import hashlib
 import requests
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Any
+from datetime import date, datetime, timedelta
+from functools import wraps
+from collections import Counter
+from typing import List, Dict, Iterator, Optional, Any, Sequence, Tuple
 import time
 import schedule
 import threading
-import re
+
+import numpy as np
+
+from deal_ingest import ingest_day_files
+from deal_aggregate import NAME_FIELDS, AggregateQuery, Aggregator
+from deal_entities import ClientEntities
+from deal_export import (
+    EXPORT_DIRNAME, EXPORT_FORMATS, download_name, export_filename, prune_exports,
+    table_from_columns, table_from_store, write_table,
+)
+from deal_indexes import (
+    TOP_METRICS, DailyRollups, DateIndex, DealAggregates, DealColumns, DedupIndex, FuzzyNameIndex, KeysetIndex,
+    PostingIndex, SearchIndex, TopIndex, exchange_class, key_hash, key_hashes, scrip_key, side_class,
+)
+from deal_log import DealLog
+from deal_query import MAX_ORDINAL, DealQuery, QueryPlanner, parse_exchange, parse_side
+from deal_response_cache import ResponseCache
+from deal_snapshot import SNAPSHOT_DIRNAME, is_current, load_snapshot, read_manifest, source_signature, write_snapshot
+from deal_store import (
+    DEAL_FIELDS, ColumnarDealStore, create_store, date_to_ordinal, dedup_key,
+    normalize_date, parse_number, parse_float,
+)
+from deal_stream import (
+    NDJSON_MIMETYPE, STREAM_CHUNK_SIZE, iter_columnar, iter_json, iter_ndjson, parse_fields, project,
+    rows_from_columns, to_columns, wants_columnar, wants_ndjson,
+)
 
 # Database file path
 DATA_DIR = os.path.join(os.path.dirname(__file__), 'data', 'bulk-deals')
-DATABASE_FILE = os.path.join(DATA_DIR, 'bulk_deals_database.json')
-METADATA_FILE = os.path.join(DATA_DIR, 'database_metadata.json')
+DATABASE_FILENAME = 'bulk_deals_database.json'
+METADATA_FILENAME = 'database_metadata.json'
+LOG_FILENAME = 'bulk_deals_log.jsonl'
+LOCK_FILENAME = 'bulk_deals.lock'
+DATABASE_FILE = os.path.join(DATA_DIR, DATABASE_FILENAME)
+METADATA_FILE = os.path.join(DATA_DIR, METADATA_FILENAME)
+
+# In-memory engine: 'dict' keeps one dict per deal, 'columnar' keeps typed NumPy columns
+DEFAULT_ENGINE = os.environ.get('BULK_DEALS_ENGINE', 'dict').lower()
+
+# Storage backend: 'json' (snapshot + deal log, held in memory) or 'sqlite' (see bulk_deals_sqlite.py)
+DEFAULT_BACKEND = os.environ.get('BULK_DEALS_BACKEND', 'json').lower()
+
+# Fold the deal log into the snapshot once it grows past this size (~16k deals)
+COMPACT_THRESHOLD_BYTES = 4 * 1024 * 1024
+
+# Data responses may be stored but are revalidated against their ETag every time
+DATA_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+
+# /api/bulk-deals/database page sizes (limit=)
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# /api/bulk-deals/names/search: name kinds (type=) and matches per response (limit=)
+NAME_KINDS = ('client', 'security')
+DEFAULT_NAME_MATCHES = 10
+MAX_NAME_MATCHES = 100
+
+
+def encode_cursor(deal_date: str, key: str, occurrence: int = 0) -> str:
+    """Opaque page token for the (date, stable key, occurrence) of the last deal on a page.
+
+    The key must mean the same deal in every process: the dedup key hash in memory,
+    the row id in SQLite - never a store offset, which each worker assigns itself.
+    occurrence tells apart stored deals sharing a (date, key): their rank in storage order.
+    """
+    raw = json.dumps([deal_date, key, occurrence], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str, int]:
+    """(date, stable key, occurrence) from encode_cursor(); ValueError if the token is malformed.
+
+    Tokens issued before the occurrence was added decode with occurrence 0.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        deal_date, key, *rest = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"invalid cursor: {cursor!r}") from e
+    occurrence = rest[0] if len(rest) == 1 else 0
+    if (not isinstance(deal_date, str) or not isinstance(key, str) or len(rest) > 1
+            or type(occurrence) is not int or occurrence < 0):
+        raise ValueError(f"invalid cursor: {cursor!r}")
+    return deal_date, key, occurrence
+
 
 class BulkDealsDatabase:
     """Manages historical bulk deals database"""
     
-    def __init__(self):
-        os.makedirs(DATA_DIR, exist_ok=True)
-        self.database = self._load_database()
+    def __init__(self, engine: Optional[str] = None, data_dir: Optional[str] = None):
+        self.data_dir = data_dir or DATA_DIR
+        self.database_file = os.path.join(self.data_dir, DATABASE_FILENAME)
+        self.metadata_file = os.path.join(self.data_dir, METADATA_FILENAME)
+        self.snapshot_dir = os.path.join(self.data_dir, SNAPSHOT_DIRNAME)
+        self.export_dir = os.path.join(self.data_dir, EXPORT_DIRNAME)
+        os.makedirs(self.data_dir, exist_ok=True)
+        self.engine = (engine or DEFAULT_ENGINE).lower()
+        self.log = DealLog(os.path.join(self.data_dir, LOG_FILENAME),
+                           os.path.join(self.data_dir, LOCK_FILENAME))
+        self._write_lock = threading.Lock()
+        self._compacting = threading.Lock()
+        self._fuzzy_lock = threading.Lock()
+        self._fuzzy = None
+        self._load()
+
+    def _load(self):
+        """Build the store and indexes from disk (also the fallback when refresh() can't catch up)"""
+        # Startup: binary snapshot (JSON only if it is missing or stale) + replay of
+        # deals logged since the last compaction, read together under the log lock
         self.metadata = self._load_metadata()
-        self._normalize_existing_records()
+        changed = False
+        with self.log.lock():
+            snapshot = self._load_binary_snapshot()
+            if snapshot:
+                self.store, self.dedup_index, hashes = snapshot
+            else:
+                database = self._load_database()
+                changed = self._normalize_existing_records(database)
+                self.store = create_store(self.engine, database.get('deals', []))
+                # One hash per deal, by offset; deals stored before the key was canonical can
+                # share one, and stay stored: the keyset index orders them by offset
+                hashes = key_hashes(self.store.dedup_keys())
+                self.dedup_index = DedupIndex.from_hashes(np.unique(hashes))
+                if not changed and len(self.store):
+                    self._write_binary_snapshot(self.store, hashes)
+            # Position in the change feed that refresh() continues from
+            self._log_stamp = self.log.stamp()
+            position = self.log.position()
+            self._log_generation = position['generation']
+            logged, self._log_epoch, self._log_offset = self.log.read_since(position['epoch'], 0)
+        self.date_index = DateIndex(self.store.date_ordinals())
+        self.keyset_index = KeysetIndex(self.store.date_ordinals(), hashes)
+        self.aggregates = DealAggregates.from_store(self.store)
+        # Client indexes and rollups key on the stored investor entity, not the raw spelling
+        self.client_entities = ClientEntities.from_store(self.store)
+        self.rollups = DailyRollups.from_store(self.store)
+        self.search_index = SearchIndex.from_store(self.store)
+        self.scrip_index = PostingIndex.from_store(self.store, 'scripCode', scrip_key)
+        self.client_index = PostingIndex.from_store(self.store, 'clientEntity', str, self.client_entities.key)
+        self.deal_columns = DealColumns.from_store(self.store)
+        self.planner = QueryPlanner(self.date_index, self.scrip_index, self.client_index,
+                                    self.search_index, self.deal_columns)
+        self.top_indexes = {metric: TopIndex(self.deal_columns, metric) for metric in TOP_METRICS}
+        self.aggregator = Aggregator(self.deal_columns, self.scrip_index, self.client_index)
+        replayed = self._insert(logged)
+        if changed:
+            self._update_metadata()
+            self.compact()
+        elif replayed:
+            self._update_metadata()
 
-    def _normalize_existing_records(self):
-        deals = self.database.get('deals', [])
+    def _normalize_existing_records(self, database: Dict[str, Any]) -> bool:
+        """Normalize date/exchange/side of loaded deals; returns True if anything changed"""
+        deals = database.get('deals', [])
         if not deals:
-            return
+            return False
 
         changed = False
         by_date: Dict[str, List[int]] = {}
@@ -55,60 +195,66 @@ class BulkDealsDatabase:
             if k:
                 by_date.setdefault(k, []).append(i)
 
+        changed = self._assign_client_entities(deals) or changed
         if changed:
-            self.database['by_date'] = by_date
-            self._update_metadata()
-            self._save_database()
+            database['by_date'] = by_date
+        return changed
     
+    @staticmethod
+    def _assign_client_entities(deals: List[Dict]) -> bool:
+        """Give deals stored before the clientEntity field theirs, resolved in storage order;
+        returns True if any deal was missing one"""
+        entities = ClientEntities()
+        changed = False
+        for d in deals:
+            key = entities.assign(d.get('clientName'), d.get('clientEntity'))
+            if (d.get('clientEntity') or '') != key:
+                d['clientEntity'] = key
+                changed = True
+        return changed
+
     def _load_database(self) -> Dict[str, Any]:
         """Load existing database or create empty one"""
-        if os.path.exists(DATABASE_FILE):
+        if os.path.exists(self.database_file):
             try:
-                with open(DATABASE_FILE, 'r', encoding='utf-8') as f:
+                with open(self.database_file, 'r', encoding='utf-8') as f:
                     return json.load(f)
             except:
                 pass
         return {"deals": [], "by_date": {}}
 
-    @staticmethod
-    def _normalize_date(date_value: Any) -> str:
-        s = str(date_value or "").strip()
-        if not s:
-            return ""
-
-        if re.match(r"^\d{4}-\d{2}-\d{2}$", s):
-            return s
-
-        # Try common formats seen in NSE/BSE files
-        for fmt in (
-            "%d/%m/%Y",
-            "%d-%m-%Y",
-            "%d-%b-%Y",
-            "%d-%B-%Y",
-            "%Y/%m/%d",
-            "%Y-%m-%d",
-        ):
-            try:
-                return datetime.strptime(s, fmt).strftime("%Y-%m-%d")
-            except Exception:
-                pass
+    def _load_binary_snapshot(self):
+        """(store, dedup index, key hashes) from the binary snapshot if it matches the JSON file, else None.
 
-        # Fallback: handle D/M/YYYY variants
-        m = re.match(r"^(\d{1,2})[/-](\d{1,2})[/-](\d{4})$", s)
-        if m:
-            dd, mm, yyyy = m.group(1), m.group(2), m.group(3)
-            try:
-                return datetime(int(yyyy), int(mm), int(dd)).strftime("%Y-%m-%d")
-            except Exception:
-                return s
+        The columnar engine keeps the memory-mapped year shards as they are;
+        the dict engine materializes them into dicts.
+        """
+        snapshot = load_snapshot(self.snapshot_dir, source_signature(self.database_file))
+        if snapshot is None:
+            return None
+        columns, dedup_index, hashes = snapshot
+        print(f"⚡ Loaded {len(columns)} deals from binary snapshot "
+              f"({len(columns.shards)} mapped year shards, {len(columns.tail)} in memory)")
+        if self.engine != 'columnar':
+            columns = create_store(self.engine, columns.to_dicts(), columns.dictionaries)
+        return columns, dedup_index, hashes
 
-        return s
+    def _write_binary_snapshot(self, store, hashes: Optional[np.ndarray] = None):
+        """Mirror the JSON snapshot as column files; callers hold the log lock"""
+        source = source_signature(self.database_file)
+        if is_current(read_manifest(self.snapshot_dir), source):
+            return
+        if not isinstance(store, ColumnarDealStore):
+            store = ColumnarDealStore.from_dicts(store.to_dicts())
+        write_snapshot(self.snapshot_dir, store, source, hashes)
+
+    _normalize_date = staticmethod(normalize_date)
     
     def _load_metadata(self) -> Dict:
         """Load metadata about database"""
-        if os.path.exists(METADATA_FILE):
+        if os.path.exists(self.metadata_file):
             try:
-                with open(METADATA_FILE, 'r', encoding='utf-8') as f:
+                with open(self.metadata_file, 'r', encoding='utf-8') as f:
                     return json.load(f)
             except:
                 pass
@@ -119,13 +265,59 @@ class BulkDealsDatabase:
             "exchanges": {"NSE": 0, "BSE": 0}
         }
     
-    def _save_database(self):
-        """Save database to file"""
-        with open(DATABASE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(self.database, f, indent=2, default=str)
-        
-        with open(METADATA_FILE, 'w', encoding='utf-8') as f:
+    def _save_metadata(self):
+        """Save metadata to file"""
+        with open(self.metadata_file, 'w', encoding='utf-8') as f:
             json.dump(self.metadata, f, indent=2, default=str)
+
+    def _write_snapshot(self, database: Dict[str, Any]):
+        """Atomically replace the JSON snapshot"""
+        tmp_path = self.database_file + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(database, f, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.database_file)
+
+    def compact(self):
+        """Fold the deal log into the snapshot, then rotate the log.
+
+        Works from the files rather than this worker's memory, so deals logged by
+        other processes (gunicorn workers, daily_update.py) are never dropped.
+        """
+        with self._compacting, self.log.lock():
+            logged = self.log.read()
+            database = self._load_database()
+            changed = self._normalize_existing_records(database)
+            if not logged and not changed:
+                return 0
+
+            deals = database.setdefault('deals', [])
+            by_date = database.setdefault('by_date', {})
+            existing_keys = DedupIndex(dedup_key(d) for d in deals)
+            merged = 0
+            for deal in logged:
+                if not existing_keys.add(dedup_key(deal)):
+                    continue
+                deals.append(deal)
+                by_date.setdefault(deal.get('date', ''), []).append(len(deals) - 1)
+                merged += 1
+            if merged:
+                # Deals logged before the clientEntity field (later ones carry theirs)
+                self._assign_client_entities(deals)
+
+            self._write_snapshot(database)
+            self._write_binary_snapshot(ColumnarDealStore.from_dicts(deals))
+            self.log.rotate()
+            self._save_metadata()
+        print(f"🗜️ Compacted {merged} logged deals into {os.path.basename(self.database_file)}")
+        return merged
+
+    def compact_in_background(self):
+        """Run compact() on a daemon thread unless one is already running"""
+        if self._compacting.locked():
+            return
+        threading.Thread(target=self.compact, daemon=True).start()
     
     def fetch_nse_bulk_deals(self) -> List[Dict]:
         """Fetch recent bulk deals from NSE"""
@@ -182,13 +374,11 @@ class BulkDealsDatabase:
             'remarks': deal.get('remarks', ''),
         }
     
-    def add_deals(self, deals: List[Dict]):
-        """Add deals to database, avoiding duplicates"""
-        added = 0
-        existing_keys = set(
-            f"{self._normalize_date(d.get('date'))}|{d.get('scripCode','')}|{d.get('clientName','')}|{d.get('side','')}|{d.get('exchange','')}"
-            for d in self.database.get('deals', [])
-        )
+    def _insert(self, deals: List[Dict]) -> List[Dict]:
+        """Normalize and add deals to memory, skipping duplicates; returns the added deals"""
+        added = []
+        added_offsets = []
+        added_hashes = []
 
         for deal in deals:
             date_norm = self._normalize_date(deal.get('date'))
@@ -196,64 +386,334 @@ class BulkDealsDatabase:
             deal['exchange'] = str(deal.get('exchange', '')).upper() or deal.get('exchange', '')
             deal['side'] = str(deal.get('side', '')).upper() or deal.get('side', '')
 
-            key = f"{date_norm}|{deal.get('scripCode','')}|{deal.get('clientName','')}|{deal.get('side','')}|{deal.get('exchange','')}"
-            if key in existing_keys:
+            # O(1) per deal against the persistent dedup index
+            h = key_hash(dedup_key(deal))
+            if not self.dedup_index.add_hash(h):
                 continue
 
-            self.database['deals'].append(deal)
-            existing_keys.add(key)
+            # Resolved once here and stored, so every worker and reload files the deal under the same investor
+            deal['clientEntity'] = self.client_entities.assign(deal.get('clientName'), deal.get('clientEntity'))
+            offset = self.store.append(deal)
+            added.append(deal)
+            added_offsets.append(offset)
+            added_hashes.append(h)
 
-            date_key = date_norm
-            if date_key not in self.database['by_date']:
-                self.database['by_date'][date_key] = []
-            self.database['by_date'][date_key].append(len(self.database['deals']) - 1)
+        ordinals = [date_to_ordinal(d['date']) for d in added]
+        self.date_index.add_many(ordinals, added_offsets)
+        self.keyset_index.add_many(ordinals, added_hashes, added_offsets)
+        self.aggregates.add(added)
+        self.rollups.add(added)
+        self.search_index.add(added, added_offsets)
+        self.scrip_index.add(added, added_offsets)
+        self.client_index.add(added, added_offsets)
+        # Last: the query planner only considers rows DealColumns has, so they are in every index
+        self.deal_columns.add(added, added_offsets)
+        for index in self.top_indexes.values():
+            index.refresh()
+        return added
 
-            added += 1
-        
-        if added > 0:
-            self._update_metadata()
-            self._save_database()
-            print(f"Added {added} new deals to database")
+    def add_deals(self, deals: List[Dict]):
+        """Add deals to database, avoiding duplicates"""
+        with self._write_lock:
+            added = self._insert(deals)
+            if added:
+                # O(new deals) append; the snapshot is rewritten only by compaction
+                self.log.append(added)
+                self._update_metadata(len(added))
+                self._save_metadata()
+                print(f"Added {len(added)} new deals to database")
+
+        if added and self.log.size() >= COMPACT_THRESHOLD_BYTES:
+            self.compact_in_background()
         
-        return added
+        return len(added)
     
-    def _update_metadata(self):
-        """Update database metadata"""
-        deals = self.database['deals']
-        if not deals:
+    def refresh(self) -> int:
+        """Apply deals other processes logged since this worker last looked; returns how many were new.
+
+        A stat of the generation file when nothing changed, so it is cheap to call per request.
+        """
+        if self.log.stamp() == self._log_stamp:
+            return 0
+        with self._write_lock:
+            with self.log.lock():
+                stamp = self.log.stamp()
+                generation = self.log.position()['generation']
+                changes = self.log.read_since(self._log_epoch, self._log_offset)
+            if changes is None:
+                print("🔁 Missed more than one compaction, reloading bulk deals database")
+                self._load()
+                return 0
+            deals, self._log_epoch, self._log_offset = changes
+            self._log_stamp = stamp
+            self._log_generation = generation
+            # Our own appends come back too; the dedup index skips them
+            added = self._insert(deals)
+            if added:
+                self._update_metadata()
+        return len(added)
+
+    @property
+    def generation(self) -> int:
+        """Change-feed generation this worker's data reflects (the counter is shared by every writer).
+
+        Advanced only by _load() and refresh(), which read the feed up to it under the log lock;
+        a worker's own add_deals() catches up on its next refresh().
+        """
+        return self._log_generation
+
+    def _update_metadata(self, last_added: Optional[int] = None):
+        """Refresh metadata from the running aggregates (no pass over the deals).
+
+        last_added is the size of the batch add_deals just stored; other refreshes keep the previous one.
+        """
+        agg = self.aggregates
+        if not agg.total:
             return
 
-        dates = [self._normalize_date(d.get('date')) for d in deals if d.get('date')]
-        dates = [d for d in dates if d]
-        nse_count = sum(1 for d in deals if d.get('exchange') == 'NSE')
-        bse_count = sum(1 for d in deals if d.get('exchange') == 'BSE')
-        
+        start, end = agg.date_bounds()
         self.metadata = {
             "last_updated": datetime.now().isoformat(),
-            "total_deals": len(deals),
+            "total_deals": agg.total,
             "date_range": {
-                "start": min(dates) if dates else None,
-                "end": max(dates) if dates else None
+                "start": start,
+                "end": end
             },
-            "exchanges": {"NSE": nse_count, "BSE": bse_count},
-            "unique_dates": len(self.database['by_date'])
+            "exchanges": {"NSE": agg.exchanges.get('NSE', 0), "BSE": agg.exchanges.get('BSE', 0)},
+            "unique_dates": len(agg.dates),
+            "sides": dict(agg.sides),
+            "types": dict(agg.types),
+            "total_value": round(agg.total_value, 2),
+            "last_update_added": self.metadata.get('last_update_added', 0) if last_added is None else last_added,
         }
     
-    def get_deals_by_date_range(self, start_date: str, end_date: str) -> List[Dict]:
-        """Get deals within a date range"""
-        start_norm = self._normalize_date(start_date)
-        end_norm = self._normalize_date(end_date)
-        result = []
-        for deal in self.database['deals']:
-            deal_date = self._normalize_date(deal.get('date', ''))
-            if start_norm <= deal_date <= end_norm:
-                result.append(deal)
-        return result
+    def _date_range_offsets(self, start_date: str, end_date: str) -> np.ndarray:
+        lo = date_to_ordinal(self._normalize_date(start_date))
+        hi = date_to_ordinal(self._normalize_date(end_date))
+        # Storage order, as the full scan used to return
+        return np.sort(self.date_index.offsets_between(lo, hi))
+
+    def get_deals_by_date_range(self, start_date: str, end_date: str,
+                                exchange: Optional[str] = None) -> List[Dict]:
+        """Get deals within a date range (binary search on the date index), optionally for one exchange"""
+        offsets = self._date_range_offsets(start_date, end_date)
+        if exchange:
+            offsets = self.store.offsets_equal('exchange', exchange.upper(), within=offsets)
+        return self.store.take(offsets)
+
+    def count_deals(self, start_date: str, end_date: str, exchange: Optional[str] = None) -> int:
+        """Count deals within a date range without materializing them"""
+        if not exchange:
+            lo = date_to_ordinal(self._normalize_date(start_date))
+            hi = date_to_ordinal(self._normalize_date(end_date))
+            return self.date_index.count_between(lo, hi)
+        offsets = self._date_range_offsets(start_date, end_date)
+        return len(self.store.offsets_equal('exchange', exchange.upper(), within=offsets))
     
+    def get_deals_page(self, limit: int, cursor: Optional[str] = None, start_date: Optional[str] = None,
+                       end_date: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """A page of deals, newest first, and the cursor of the next page (None after the last).
+
+        Ordered by (date desc, dedup key hash desc, then storage order), so a cursor from any
+        worker resumes just after the same deal; each page is a seek in the keyset index.
+        """
+        lo, hi = self._ordinal_bounds(start_date, end_date)
+        before = None
+        if cursor:
+            deal_date, key, occurrence = decode_cursor(cursor)
+            h = int(key, 16)
+            if not 0 <= h < 2 ** 64:
+                raise ValueError(f"invalid cursor: {cursor!r}")
+            before = (date_to_ordinal(deal_date), h, occurrence)
+        offsets, last, more = self.keyset_index.page(lo, hi, limit, before)
+        deals = self.store.take(offsets)
+        next_cursor = None
+        if more and deals:
+            h, occurrence = last
+            next_cursor = encode_cursor(deals[-1].get('date', ''), f"{h:016x}", occurrence)
+        return deals, next_cursor
+
     def get_all_deals(self) -> List[Dict]:
         """Get all deals"""
-        return self.database['deals']
-    
+        return self.store.to_dicts()
+
+    def _stream_offsets(self, start_date: Optional[str], end_date: Optional[str]) -> np.ndarray:
+        if start_date and end_date:
+            return self._date_range_offsets(start_date, end_date)
+        return np.arange(len(self.store))
+
+    def _take(self, offsets, fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """Deals at offsets; with fields, just those fields, read from the store's columns"""
+        if not fields:
+            return self.store.take(offsets)
+        return rows_from_columns(self.store.take_columns(offsets, fields), fields)
+
+    def iter_deals(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                   chunk_size: int = STREAM_CHUNK_SIZE,
+                   fields: Optional[Sequence[str]] = None) -> Tuple[int, Iterator[List[Dict]]]:
+        """(count, chunks of deals) for a date range or, without both bounds, the whole database.
+
+        The rows are fixed when called; deals are only materialized as each chunk is consumed.
+        """
+        offsets = self._stream_offsets(start_date, end_date)
+
+        def chunks() -> Iterator[List[Dict]]:
+            for i in range(0, len(offsets), chunk_size):
+                yield self._take(offsets[i:i + chunk_size], fields)
+
+        return len(offsets), chunks()
+
+    def iter_columns(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                     fields: Sequence[str] = DEAL_FIELDS) -> Tuple[int, Iterator[Tuple[str, List[Any]]]]:
+        """(count, (field, values) per field) in the same row order as iter_deals, a column at a time"""
+        offsets = self._stream_offsets(start_date, end_date)
+
+        def columns() -> Iterator[Tuple[str, List[Any]]]:
+            for f in fields:
+                yield f, self.store.take_columns(offsets, (f,))[f]
+
+        return len(offsets), columns()
+
+    def export_table(self, start_date: Optional[str] = None, end_date: Optional[str] = None):
+        """Arrow table of a date range (or, without both bounds, everything) in iter_deals row order"""
+        if self.store.engine == 'columnar':
+            return table_from_store(self.store, self._stream_offsets(start_date, end_date))
+        _, columns = self.iter_columns(start_date, end_date)
+        return table_from_columns(columns)
+
+    def export(self, fmt: str = 'parquet', start_date: Optional[str] = None,
+               end_date: Optional[str] = None) -> str:
+        """Path of a Parquet or Arrow file of a date range, written once per generation and range"""
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        if start_date and end_date:
+            start_date, end_date = self._normalize_date(start_date), self._normalize_date(end_date)
+        else:
+            start_date = end_date = None
+        generation = self.generation
+        path = os.path.join(self.export_dir, export_filename(fmt, generation, start_date, end_date))
+        if not os.path.exists(path):
+            os.makedirs(self.export_dir, exist_ok=True)
+            write_table(self.export_table(start_date, end_date), path, fmt)
+            removed = prune_exports(self.export_dir, generation)
+            print(f"📦 Exported {os.path.basename(path)}" + (f" (pruned {removed} stale)" if removed else ""))
+        return path
+
+    def get_deals_by_scrip(self, scrip_code: str, start_date: Optional[str] = None,
+                           end_date: Optional[str] = None) -> List[Dict]:
+        """Get a security's deals (case-insensitive code match), newest first"""
+        return self._posted_deals(self.scrip_index, scrip_code, start_date, end_date)
+
+    def get_deals_by_client(self, client_name: str, start_date: Optional[str] = None,
+                            end_date: Optional[str] = None) -> List[Dict]:
+        """Get an investor's deals under any spelling of their name, newest first"""
+        return self._posted_deals(self.client_index, client_name, start_date, end_date)
+
+    def _posted_deals(self, index: PostingIndex, value: str, start_date: Optional[str],
+                      end_date: Optional[str]) -> List[Dict]:
+        lo, hi = self._ordinal_bounds(start_date, end_date)
+        return self.store.take(index.offsets(value, lo, hi)[::-1])
+
+    def _ordinal_bounds(self, start_date: Optional[str], end_date: Optional[str]) -> Tuple[int, int]:
+        """Date ordinal window for optional start/end dates (open-ended when missing).
+
+        Only the unbounded window (0, MAX_ORDINAL) takes in deals with unparseable dates
+        (ordinal 0); a window with any bound starts at 1, so they are in no window on any
+        endpoint, as in DateIndex.
+        """
+        lo = date_to_ordinal(self._normalize_date(start_date)) if start_date else 0
+        hi = date_to_ordinal(self._normalize_date(end_date)) if end_date else MAX_ORDINAL
+        if hi < MAX_ORDINAL:
+            lo = max(lo, 1)
+        return lo, hi
+
+    def get_stats(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                  daily: bool = False) -> Dict[str, Any]:
+        """Deal counts, traded value and distinct scrips/clients for a date window, from the daily rollups"""
+        lo, hi = self._ordinal_bounds(start_date, end_date)
+        stats = self.rollups.summary(lo, hi)
+        if daily:
+            stats['daily'] = self.rollups.daily(lo, hi)
+        return stats
+
+    def search_deals(self, query: str, limit: int = 100) -> List[Dict]:
+        """Deals whose security or client name contains query (case-insensitive), newest and largest first"""
+        return self.store.take(self.search_index.search(query, limit, self.date_index))
+
+    def query(self, query: DealQuery) -> Tuple[List[Dict], int, Dict[str, Any]]:
+        """(requested page of matching deals, total matches, plan) for a DealQuery, planned over the indexes"""
+        lo, hi = self._ordinal_bounds(query.start, query.end)
+        offsets, total, plan = self.planner.run(query, lo, hi)
+        return self.store.take(offsets), total, plan
+
+    def aggregate(self, query: AggregateQuery) -> Tuple[List[Dict[str, Any]], int]:
+        """(requested groups with their metrics, non-empty group count) for an AggregateQuery;
+        scrip and client groups are named after their latest deal"""
+        lo, hi = self._ordinal_bounds(query.start, query.end)
+        groups, total, latest = self.aggregator.run(query, lo, hi)
+        if latest is not None:
+            field = NAME_FIELDS[query.group_by]
+            for group, name in zip(groups, self.store.take_columns(latest, [field])[field]):
+                group['name'] = name
+        return groups, total
+
+    def get_top_deals(self, k: int, by: str = 'value', start_date: Optional[str] = None,
+                      end_date: Optional[str] = None, exchange: Optional[str] = None,
+                      side: Optional[str] = None) -> List[Dict]:
+        """The k largest deals by traded value or quantity in a date window, largest first (ties: newest first)"""
+        if by not in TOP_METRICS:
+            raise ValueError(f"by must be one of: {', '.join(TOP_METRICS)}")
+        lo, hi = self._ordinal_bounds(start_date, end_date)
+        offsets = self.top_indexes[by].top(k, lo, hi, exchange_class(exchange) if exchange else 0,
+                                           side_class(side) if side else 0)
+        return self.store.take(offsets)
+
+    def _name_sources(self) -> Dict[str, Tuple[List[str], Sequence[int], Optional[List[str]]]]:
+        """Distinct names per kind for the fuzzy indexes: (names, deal counts, scrip codes or None)"""
+        # Clients are searched by investor entity, with the deals of every spelling
+        clients = self.client_index.keys()
+        client_counts = np.bincount(self.client_index.row_keys(), minlength=len(clients))
+        names, codes = self.store.values('securityName'), self.store.values('scripCode')
+        counts = Counter(names)
+        # A renamed scrip keeps its code, a reused name shows the latest one
+        latest = dict(zip(names, codes))
+        securities = [name for name in counts if name]
+        return {
+            'client': (list(clients), client_counts, None),
+            'security': (securities, [counts[name] for name in securities], [latest[name] for name in securities]),
+        }
+
+    def _fuzzy_indexes(self) -> Dict[str, Tuple[FuzzyNameIndex, Optional[List[str]]]]:
+        """Fuzzy name index (and scrip codes) per kind, rebuilt on first use after the generation moves"""
+        generation = self.generation
+        built = self._fuzzy
+        if built is None or built[0] != generation:
+            with self._fuzzy_lock:
+                built = self._fuzzy
+                if built is None or built[0] != generation:
+                    started = time.time()
+                    built = (generation, {kind: (FuzzyNameIndex(names, counts), codes)
+                                          for kind, (names, counts, codes) in self._name_sources().items()})
+                    self._fuzzy = built
+                    print(f"🔤 Fuzzy name indexes built in {(time.time() - started) * 1000:.0f}ms")
+        return built[1]
+
+    def fuzzy_search(self, query: str, kinds: Sequence[str] = NAME_KINDS,
+                     limit: int = DEFAULT_NAME_MATCHES) -> List[Dict[str, Any]]:
+        """Client / security names closest to a possibly misspelt query, best first (ties: most deals, then by name)"""
+        matches = []
+        for kind, (index, codes) in self._fuzzy_indexes().items():
+            if kind not in kinds:
+                continue
+            for i, score in index.search(query, limit):
+                match: Dict[str, Any] = {'type': kind, 'name': index.names[i], 'score': score,
+                                         'deals': int(index.counts[i])}
+                if codes is not None:
+                    match['scripCode'] = codes[i]
+                matches.append(match)
+        matches.sort(key=lambda m: (-m['score'], -m['deals'], m['name']))
+        return matches[:limit]
+
     def update_daily(self):
         """Daily update task - fetches latest deals"""
         print(f"\n🔄 Running daily update at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -274,19 +734,19 @@ class BulkDealsDatabase:
             print(f"❌ Error during daily update: {e}")
             return 0
     
-    @staticmethod
-    def _parse_number(value) -> int:
-        try:
-            return int(str(value).replace(',', '').replace(' ', ''))
-        except:
-            return 0
-    
-    @staticmethod
-    def _parse_float(value) -> float:
-        try:
-            return float(str(value).replace(',', '').replace(' ', ''))
-        except:
-            return 0.0
+    _parse_number = staticmethod(parse_number)
+    _parse_float = staticmethod(parse_float)
+
+
+def open_database(backend: Optional[str] = None, **kwargs) -> BulkDealsDatabase:
+    """Open the bulk deals database with the configured storage backend"""
+    backend = (backend or DEFAULT_BACKEND).lower()
+    if backend == 'sqlite':
+        from bulk_deals_sqlite import SQLiteBulkDealsDatabase
+        return SQLiteBulkDealsDatabase(**kwargs)
+    if backend != 'json':
+        raise ValueError(f"Unknown bulk deals backend: {backend} (expected json or sqlite)")
+    return BulkDealsDatabase(**kwargs)
 
 
 def load_historical_csv(csv_path: str, db: BulkDealsDatabase):
@@ -332,6 +792,8 @@ def start_daily_scheduler(db: BulkDealsDatabase):
     """Start the daily scheduler at 6:02 PM IST"""
     # Schedule daily update at 6:02 PM
     schedule.every().day.at("18:02").do(db.update_daily)
+    # Fold the day's logged deals into the JSON snapshot after the update
+    schedule.every().day.at("18:30").do(db.compact_in_background)
     
     # Run scheduler in background thread
     scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
@@ -342,10 +804,10 @@ def start_daily_scheduler(db: BulkDealsDatabase):
 
 def initialize_database():
     """Initialize database with historical data and start scheduler"""
-    db = BulkDealsDatabase()
+    db = open_database()
     
     print("🚀 Initializing Bulk Deals Database")
-    print(f"📁 Database location: {DATABASE_FILE}")
+    print(f"📁 Database location: {db.database_file}")
     
     # Check if we need to load initial data
     if db.metadata['total_deals'] == 0:
@@ -353,8 +815,8 @@ def initialize_database():
         
         # Try to load from CSV if exists
         csv_files = [
-            os.path.join(DATA_DIR, 'historical_bulk_deals.csv'),
-            os.path.join(DATA_DIR, 'bulk_deals_history.csv'),
+            os.path.join(db.data_dir, 'historical_bulk_deals.csv'),
+            os.path.join(db.data_dir, 'bulk_deals_history.csv'),
         ]
         
         for csv_file in csv_files:
@@ -367,6 +829,9 @@ def initialize_database():
     else:
         print(f"📊 Database has {db.metadata['total_deals']} deals")
         print(f"📅 Date range: {db.metadata['date_range']['start']} to {db.metadata['date_range']['end']}")
+
+    # Fold in per-day caches written by bulk_deals_backfill.py / scheduler.py
+    ingest_day_files(db)
     
     # Start daily scheduler
     start_daily_scheduler(db)
@@ -377,25 +842,158 @@ def initialize_database():
 # Flask API endpoints for the database
 def create_database_api(app, db: BulkDealsDatabase):
     """Add database API endpoints to Flask app"""
-    from flask import jsonify, request
+    from flask import Response, jsonify, request, send_file, stream_with_context
+
+    @app.before_request
+    def apply_database_changes():
+        """Pick up deals added by other workers / daily_update.py before serving"""
+        try:
+            db.refresh()
+        except Exception as e:
+            print(f"⚠️ Could not apply bulk deals changes: {e}")
+
+    response_cache = ResponseCache()
+    app.extensions['bulk_deals_response_cache'] = response_cache
+
+    def request_key() -> str:
+        """Path, normalized query and Accept header of the current request"""
+        query = '&'.join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+        # Routes default their windows to today, so the day is part of the key
+        return f"{request.path}?{query}|{request.headers.get('Accept', '')}|{date.today().isoformat()}"
+
+    def data_etag() -> str:
+        """Database generation plus the normalized query"""
+        digest = hashlib.blake2b(request_key().encode('utf-8'), digest_size=8).hexdigest()
+        return f"{db.generation}-{digest}"
+
+    def cached(view):
+        """Answer repeated identical requests from response_cache in the negotiated encoding.
+
+        A miss runs the view; a streamed body is passed through and stored once it completes.
+        """
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key, generation = request_key(), db.generation
+            entry = response_cache.get(key, generation)
+            if entry is None:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or 'Cache-Control' in response.headers:
+                    return response
+                headers = {k: v for k, v in response.headers.items() if k not in ('Content-Type', 'Content-Length')}
+                if response.is_streamed:
+                    response.response = response_cache.tee(key, generation, response.response,
+                                                           response.mimetype, headers)
+                    response.vary.add('Accept-Encoding')
+                    return response
+                entry = response_cache.put(key, generation, response.get_data(), response.mimetype, headers)
+                if entry is None:
+                    return response
+            encoding = entry.negotiate(request.accept_encodings.quality)
+            response = app.response_class(entry.encodings[encoding], mimetype=entry.mimetype)
+            response.headers.update(entry.headers)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+            response.vary.add('Accept-Encoding')
+            return response
+        return wrapper
+
+    def requested_shape() -> Tuple[Optional[Sequence[str]], bool]:
+        """(fields, columnar) from ?fields= and ?format=columnar; columnar defaults to every field"""
+        fields = parse_fields(request.args.get('fields'))
+        columnar = wants_columnar(request.args.get('format'))
+        return ((fields or DEAL_FIELDS) if columnar else fields), columnar
+
+    def shape(deals: List[Dict], fields: Optional[Sequence[str]], columnar: bool):
+        if columnar:
+            return to_columns(deals, fields)
+        return project(deals, fields) if fields else deals
+
+    def bad_request(error: ValueError):
+        return jsonify({'success': False, 'error': str(error)}), 400
+
+    def is_data_request() -> bool:
+        return request.method == 'GET' and request.path.startswith('/api/bulk-deals')
+
+    @app.before_request
+    def answer_not_modified():
+        """304 for an If-None-Match still matching the current generation, before any data is read"""
+        if not is_data_request() or not request.if_none_match:
+            return None
+        etag = data_etag()
+        if not request.if_none_match.contains_weak(etag):
+            return None
+        response = app.response_class(status=304)
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = DATA_CACHE_CONTROL
+        response.headers['Vary'] = 'Accept'
+        return response
+
+    @app.after_request
+    def tag_data_response(response):
+        """ETag + revalidation headers on bulk deals data; routes that set Cache-Control themselves opt out"""
+        if is_data_request() and response.status_code == 200 and 'Cache-Control' not in response.headers:
+            response.set_etag(data_etag(), weak=True)
+            response.headers['Cache-Control'] = DATA_CACHE_CONTROL
+            response.vary.add('Accept')
+        return response
     
     @app.route('/api/bulk-deals/database', methods=['GET'])
+    @cached
     def get_database_deals():
-        """Get deals from database with optional date filtering"""
+        """Get deals from database with optional date filtering: paged with limit/cursor, else streamed
+        (JSON, NDJSON with format=ndjson, or one array per field with format=columnar; fields= projects)"""
         start_date = request.args.get('start')
         end_date = request.args.get('end')
+        try:
+            fields, columnar = requested_shape()
+        except ValueError as e:
+            return bad_request(e)
         
-        if start_date and end_date:
-            deals = db.get_deals_by_date_range(start_date, end_date)
-        else:
-            deals = db.get_all_deals()
+        if request.args.get('limit') or request.args.get('cursor'):
+            # Keyset pagination: newest first, continue with ?cursor=<next_cursor>
+            limit = min(max(request.args.get('limit', type=int, default=DEFAULT_PAGE_SIZE), 1), MAX_PAGE_SIZE)
+            try:
+                deals, next_cursor = db.get_deals_page(limit, request.args.get('cursor'), start_date, end_date)
+            except ValueError:
+                return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
+            return jsonify({
+                'success': True,
+                'count': len(deals),
+                'data': shape(deals, fields, columnar),
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
+            })
         
-        return jsonify({
-            'success': True,
-            'count': len(deals),
-            'data': deals,
-            'metadata': db.metadata
-        })
+        if columnar:
+            count, columns = db.iter_columns(start_date, end_date, fields)
+            envelope = {'success': True, 'count': count, 'metadata': db.metadata}
+            return Response(stream_with_context(iter_columnar(envelope, columns)), mimetype='application/json')
+        
+        count, chunks = db.iter_deals(start_date, end_date, fields=fields)
+        
+        if wants_ndjson(request.args.get('format'), request.headers.get('Accept')):
+            response = Response(stream_with_context(iter_ndjson(chunks)), mimetype=NDJSON_MIMETYPE)
+            response.headers['X-Total-Count'] = str(count)
+            return response
+        
+        envelope = {'success': True, 'count': count, 'metadata': db.metadata}
+        return Response(stream_with_context(iter_json(envelope, chunks)), mimetype='application/json')
+    
+    @app.route('/api/bulk-deals/export', methods=['GET'])
+    def export_deals():
+        """Parquet (default) or Arrow IPC file of the deals, optionally for a start/end range"""
+        fmt = request.args.get('format', 'parquet').lower()
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({'success': False, 'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+        try:
+            path = db.export(fmt, request.args.get('start'), request.args.get('end'))
+        except RuntimeError as e:
+            return jsonify({'success': False, 'error': str(e)}), 503
+        response = send_file(path, mimetype=EXPORT_FORMATS[fmt][0], as_attachment=True,
+                             download_name=download_name(path), etag=False)
+        # Revalidated against the generation ETag like the rest of the data routes
+        del response.headers['Cache-Control']
+        return response
     
     @app.route('/api/bulk-deals/database/metadata', methods=['GET'])
     def get_database_metadata():
@@ -405,6 +1003,128 @@ def create_database_api(app, db: BulkDealsDatabase):
             'metadata': db.metadata
         })
     
+    @app.route('/api/bulk-deals/by-scrip/<code>', methods=['GET'])
+    @cached
+    def deals_by_scrip(code):
+        """A security's deals, newest first, from the per-scrip posting list"""
+        try:
+            fields, columnar = requested_shape()
+        except ValueError as e:
+            return bad_request(e)
+        deals = db.get_deals_by_scrip(code, request.args.get('start'), request.args.get('end'))
+        return jsonify({
+            'success': True,
+            'scripCode': code,
+            'count': len(deals),
+            'data': shape(deals, fields, columnar)
+        })
+
+    @app.route('/api/bulk-deals/by-client', methods=['GET'])
+    @cached
+    def deals_by_client():
+        """A client's deals, newest first, from the per-client posting list"""
+        name = request.args.get('name', '').strip()
+        if not name:
+            return jsonify({'success': False, 'error': 'name is required'}), 400
+        try:
+            fields, columnar = requested_shape()
+        except ValueError as e:
+            return bad_request(e)
+        deals = db.get_deals_by_client(name, request.args.get('start'), request.args.get('end'))
+        return jsonify({
+            'success': True,
+            'clientName': name,
+            'count': len(deals),
+            'data': shape(deals, fields, columnar)
+        })
+    
+    @app.route('/api/bulk-deals/query', methods=['GET'])
+    @cached
+    def query_deals():
+        """Filtered, sorted page of deals: start/end, exchange, side, type, scrip (repeatable or
+        comma-separated), client, q (name text), min_value/max_value, sort (date|value, '-' for
+        descending), limit/offset; fields/format as for /database; explain=true adds the plan"""
+        limit = min(max(request.args.get('limit', type=int, default=DEFAULT_PAGE_SIZE), 1), MAX_PAGE_SIZE)
+        try:
+            fields, columnar = requested_shape()
+            query = DealQuery.from_args(request.args, limit)
+        except ValueError as e:
+            return bad_request(e)
+        deals, total, plan = db.query(query)
+        result = {
+            'success': True,
+            'total': total,
+            'count': len(deals),
+            'offset': query.offset,
+            'data': shape(deals, fields, columnar),
+        }
+        if request.args.get('explain', '').lower() in ('1', 'true'):
+            result['plan'] = plan
+        return jsonify(result)
+    
+    @app.route('/api/bulk-deals/top', methods=['GET'])
+    @cached
+    def top_deals():
+        """The k largest deals (default 20) by value or quantity (by=), for start/end, exchange and
+        side; fields/format as for /database"""
+        k = min(max(request.args.get('k', type=int, default=20), 1), MAX_PAGE_SIZE)
+        by = request.args.get('by', 'value').strip().lower()
+        try:
+            fields, columnar = requested_shape()
+            if by not in TOP_METRICS:
+                raise ValueError(f"by must be one of: {', '.join(TOP_METRICS)}")
+            exchange = parse_exchange(request.args.get('exchange'))
+            side = parse_side(request.args.get('side'))
+        except ValueError as e:
+            return bad_request(e)
+        deals = db.get_top_deals(k, by, request.args.get('start'), request.args.get('end'), exchange, side)
+        return jsonify({
+            'success': True,
+            'by': by,
+            'count': len(deals),
+            'data': shape(deals, fields, columnar)
+        })
+    
+    @app.route('/api/bulk-deals/aggregate', methods=['GET'])
+    @cached
+    def aggregate_deals():
+        """Deal count, qty, value and net_value (metrics=) per scrip, client, month or exchange
+        (group_by=), for start/end, side and exchange; sort by key or a metric ('-' for descending),
+        limit groups"""
+        limit = min(max(request.args.get('limit', type=int, default=DEFAULT_PAGE_SIZE), 1), MAX_PAGE_SIZE)
+        try:
+            query = AggregateQuery.from_args(request.args, limit)
+        except ValueError as e:
+            return bad_request(e)
+        groups, total = db.aggregate(query)
+        return jsonify({
+            'success': True,
+            'group_by': query.group_by,
+            'total_groups': total,
+            'count': len(groups),
+            'data': groups
+        })
+    
+    @app.route('/api/bulk-deals/names/search', methods=['GET'])
+    @cached
+    def search_names():
+        """Typo-tolerant client / security name lookup (q=, type=client|security, default both),
+        best matches first with their deal counts"""
+        query = request.args.get('q', '').strip()
+        if len(query) < 2:
+            return bad_request(ValueError('q must be at least 2 characters'))
+        kind = request.args.get('type', '').strip().lower()
+        if kind and kind not in NAME_KINDS:
+            return bad_request(ValueError(f"type must be one of: {', '.join(NAME_KINDS)}"))
+        limit = min(max(request.args.get('limit', type=int, default=DEFAULT_NAME_MATCHES), 1), MAX_NAME_MATCHES)
+        matches = db.fuzzy_search(query, (kind,) if kind else NAME_KINDS, limit)
+        return jsonify({
+            'success': True,
+            'query': query,
+            'count': len(matches),
+            'data': matches
+        })
+    
     @app.route('/api/bulk-deals/database/update', methods=['POST'])
     def trigger_update():
         """Manually trigger database update"""
@@ -592,14 +1312,13 @@ def create_database_api(app, db: BulkDealsDatabase):
         now = datetime.now()
         
         # Check if we already have today's data
-        existing = db.get_deals_by_date_range(today, today)
-        bse_existing = [d for d in existing if d.get('exchange') == 'BSE']
+        bse_existing = db.count_deals(today, today, exchange='BSE')
         
-        if len(bse_existing) > 0:
+        if bse_existing > 0:
             return jsonify({
                 'success': True,
-                'message': f'Today\'s BSE data already exists ({len(bse_existing)} deals)',
-                'count': len(bse_existing),
+                'message': f'Today\'s BSE data already exists ({bse_existing} deals)',
+                'count': bse_existing,
                 'fetched': False
             })
         
@@ -0,0 +1,693 @@
+"""
+SQLite Storage Backend for Bulk Deals
+Deals live in a local SQLite file with indexes on isoDate, (scripCode, isoDate),
+(clientEntity, isoDate) and the add_deals dedup key, so workers no longer each hold
+the full deal list in RAM. isoDate is the stored date normalized, NULL when it does
+not parse: windows and newest-first orders use it, so undated deals sort oldest and
+fall in no window, as in memory.
+
+Enable with BULK_DEALS_BACKEND=sqlite after a one-shot migration:
+
+    python bulk_deals_sqlite.py migrate
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from bulk_deals_database import BulkDealsDatabase, DATA_DIR, METADATA_FILENAME, decode_cursor, encode_cursor
+from deal_aggregate import AGGREGATE_METRICS, NAME_FIELDS, AggregateQuery
+from deal_entities import ClientEntities, canonical_client_name
+from deal_export import EXPORT_DIRNAME
+from deal_indexes import BUY_SIDES, SELL_SIDES, TOP_METRICS, DailyRollups, DealAggregates, side_class, type_key
+from deal_query import MAX_ORDINAL, DealQuery
+from deal_store import DEAL_FIELDS, date_to_ordinal, dedup_key, parse_float, parse_number
+from deal_stream import STREAM_CHUNK_SIZE
+
+SQLITE_FILENAME = 'bulk_deals.sqlite3'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS deals (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL DEFAULT '',
+    scripCode TEXT NOT NULL DEFAULT '',
+    securityName TEXT NOT NULL DEFAULT '',
+    clientName TEXT NOT NULL DEFAULT '',
+    clientEntity TEXT NOT NULL DEFAULT '',
+    side TEXT NOT NULL DEFAULT '',
+    quantity INTEGER NOT NULL DEFAULT 0,
+    price REAL NOT NULL DEFAULT 0,
+    type TEXT NOT NULL DEFAULT '',
+    exchange TEXT NOT NULL DEFAULT '',
+    remarks TEXT NOT NULL DEFAULT '',
+    isoDate TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_deals_iso_date ON deals(isoDate);
+CREATE INDEX IF NOT EXISTS idx_deals_scrip_iso_date ON deals(scripCode COLLATE NOCASE, isoDate);
+CREATE INDEX IF NOT EXISTS idx_deals_entity_iso_date ON deals(clientEntity COLLATE NOCASE, isoDate);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_deals_dedup ON deals(date, scripCode, clientName, side, exchange);
+"""
+
+# Indexes on the raw date column, replaced by the isoDate ones
+RAW_DATE_INDEXES = ('idx_deals_date', 'idx_deals_scrip_date', 'idx_deals_entity_date')
+
+COLUMNS = ', '.join(DEAL_FIELDS)
+INSERT_SQL = (f"INSERT OR IGNORE INTO deals ({COLUMNS}, isoDate, extra) "
+              f"VALUES ({', '.join('?' * (len(DEAL_FIELDS) + 2))})")
+
+# Stay under SQLITE_MAX_VARIABLE_NUMBER on older builds
+MAX_PARAMS = 900
+
+NAME_LIKE = "securityName LIKE ? ESCAPE '\\' OR clientName LIKE ? ESCAPE '\\'"
+
+
+# SQL group key per AggregateQuery.group_by, normalized like the in-memory keys
+GROUP_KEYS = {
+    'scrip': 'UPPER(TRIM(scripCode))',
+    'client': 'clientEntity',
+    'month': "COALESCE(SUBSTR(isoDate, 1, 7), '')",
+    'exchange': "CASE WHEN UPPER(TRIM(exchange)) IN ('BSE', 'NSE') THEN UPPER(TRIM(exchange)) ELSE '' END",
+}
+
+
+def iso_date(value: str) -> Optional[str]:
+    """The isoDate of a stored date: YYYY-MM-DD, or None where memory has ordinal 0"""
+    ordinal = date_to_ordinal(value)
+    return date.fromordinal(ordinal).isoformat() if ordinal else None
+
+
+def _like_pattern(text: str) -> str:
+    """LIKE pattern matching text anywhere, with its wildcards escaped"""
+    return '%' + str(text or '').replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def _chunks(items: List[Any], size: int = MAX_PARAMS) -> Iterable[List[Any]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class SQLiteDealStore:
+    """Deal store over a SQLite table; offsets are row ids"""
+
+    engine = 'sqlite'
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self.connection()
+        with conn:
+            columns = [r[1] for r in conn.execute("PRAGMA table_info(deals)")]
+            if columns and 'clientEntity' not in columns:
+                # Files from before the column; SQLiteBulkDealsDatabase fills it in
+                conn.execute("ALTER TABLE deals ADD COLUMN clientEntity TEXT NOT NULL DEFAULT ''")
+                conn.execute("DROP INDEX IF EXISTS idx_deals_client_date")
+            if columns and 'isoDate' not in columns:
+                conn.execute("ALTER TABLE deals ADD COLUMN isoDate TEXT")
+                for name in RAW_DATE_INDEXES:
+                    conn.execute(f"DROP INDEX IF EXISTS {name}")
+                self._fill_iso_dates(conn)
+            conn.executescript(SCHEMA)
+
+    @staticmethod
+    def _fill_iso_dates(conn: sqlite3.Connection):
+        """Set isoDate on every row, normalizing each distinct date once through a temporary table"""
+        dates = [r[0] for r in conn.execute("SELECT DISTINCT date FROM deals")]
+        conn.execute("CREATE TEMP TABLE iso_dates (date TEXT PRIMARY KEY, isoDate TEXT)")
+        conn.executemany("INSERT INTO iso_dates VALUES (?, ?)", [(d, iso_date(d)) for d in dates])
+        conn.execute("UPDATE deals SET isoDate = (SELECT isoDate FROM iso_dates WHERE iso_dates.date = deals.date)")
+        conn.execute("DROP TABLE iso_dates")
+
+    def connection(self) -> sqlite3.Connection:
+        """Per-thread connection (Flask serves requests on several threads)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _to_row(deal: Dict) -> Tuple:
+        quantity = deal.get('quantity', 0)
+        if not isinstance(quantity, int):
+            quantity = parse_number(quantity)
+        price = deal.get('price', 0)
+        if not isinstance(price, float):
+            price = parse_float(price)
+        extra = {k: v for k, v in deal.items() if k not in DEAL_FIELDS}
+        numbers = {'quantity': quantity, 'price': price}
+        fields = tuple(numbers[f] if f in numbers else '' if deal.get(f) is None else str(deal.get(f))
+                       for f in DEAL_FIELDS)
+        return (
+            *fields,
+            iso_date(fields[DEAL_FIELDS.index('date')]),
+            json.dumps(extra, default=str) if extra else None,
+        )
+
+    @staticmethod
+    def _to_deal(row: Tuple) -> Dict:
+        deal = dict(zip(DEAL_FIELDS, row[1:len(DEAL_FIELDS) + 1]))
+        if not deal['remarks']:
+            del deal['remarks']
+        extra = row[len(DEAL_FIELDS) + 1]
+        if extra:
+            deal.update(json.loads(extra))
+        return deal
+
+    def select(self, where: str = '1', params: Tuple = (), order: str = 'id',
+               limit: Optional[int] = None) -> List[Dict]:
+        sql = f"SELECT id, {COLUMNS}, extra FROM deals WHERE {where} ORDER BY {order}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        rows = self.connection().execute(sql, params).fetchall()
+        return [self._to_deal(r) for r in rows]
+
+    def __len__(self) -> int:
+        return self.connection().execute("SELECT COUNT(*) FROM deals").fetchone()[0]
+
+    def max_id(self) -> int:
+        return self.connection().execute("SELECT COALESCE(MAX(id), 0) FROM deals").fetchone()[0]
+
+    def insert_many(self, deals: List[Dict]) -> List[Dict]:
+        """INSERT OR IGNORE in one transaction; returns the deals that were new"""
+        added = []
+        conn = self.connection()
+        with conn:
+            for deal in deals:
+                if conn.execute(INSERT_SQL, self._to_row(deal)).rowcount:
+                    added.append(deal)
+        return added
+
+    def append(self, deal: Dict) -> int:
+        conn = self.connection()
+        with conn:
+            return conn.execute(INSERT_SQL, self._to_row(deal)).lastrowid
+
+    def get(self, offset: int) -> Dict:
+        return self.take([offset])[0]
+
+    def take(self, offsets: Iterable[int]) -> List[Dict]:
+        offsets = [int(o) for o in offsets]
+        by_id = {}
+        conn = self.connection()
+        for chunk in _chunks(offsets):
+            rows = conn.execute(
+                f"SELECT id, {COLUMNS}, extra FROM deals WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            for r in rows:
+                by_id[r[0]] = self._to_deal(r)
+        return [by_id[o] for o in offsets if o in by_id]
+
+    @staticmethod
+    def _check_fields(fields: Iterable[str]) -> List[str]:
+        fields = list(fields)
+        unknown = [f for f in fields if f not in DEAL_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return fields
+
+    def take_columns(self, offsets: Iterable[int], fields: Iterable[str]) -> Dict[str, List[Any]]:
+        """Only the requested columns for the rows at offsets"""
+        offsets = [int(o) for o in offsets]
+        fields = self._check_fields(fields)
+        by_id = {}
+        conn = self.connection()
+        for chunk in _chunks(offsets):
+            rows = conn.execute(
+                f"SELECT id, {', '.join(fields)} FROM deals WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            for r in rows:
+                by_id[r[0]] = r[1:]
+        rows = [by_id[o] for o in offsets if o in by_id]
+        return {f: [r[j] for r in rows] for j, f in enumerate(fields)}
+
+    def select_column(self, field: str, where: str = '1', params: Iterable[Any] = ()) -> List[Any]:
+        """One column of the matching rows in id order"""
+        self._check_fields([field])
+        return [r[0] for r in self.connection().execute(
+            f"SELECT {field} FROM deals WHERE {where} ORDER BY id", list(params))]
+
+    def to_dicts(self) -> List[Dict]:
+        return self.select()
+
+    def values(self, field: str, default: Any = '') -> List[Any]:
+        if field in DEAL_FIELDS:
+            return [r[0] for r in self.connection().execute(f"SELECT {field} FROM deals ORDER BY id")]
+        rows = self.connection().execute("SELECT extra FROM deals ORDER BY id")
+        return [json.loads(r[0]).get(field, default) if r[0] else default for r in rows]
+
+    def value_counts(self, field: str) -> Dict[str, int]:
+        if field not in DEAL_FIELDS:
+            counts: Dict[str, int] = {}
+            for v in self.values(field):
+                counts[v] = counts.get(v, 0) + 1
+            return counts
+        rows = self.connection().execute(f"SELECT {field}, COUNT(*) FROM deals GROUP BY {field}")
+        return {r[0]: r[1] for r in rows}
+
+    def date_bounds(self) -> Tuple[Optional[str], Optional[str]]:
+        return tuple(self.connection().execute("SELECT MIN(isoDate), MAX(isoDate) FROM deals").fetchone())
+
+    def total_value(self) -> float:
+        return self.connection().execute("SELECT TOTAL(quantity * price) FROM deals").fetchone()[0]
+
+    def date_ordinals(self) -> np.ndarray:
+        cache: Dict[str, int] = {}
+        ordinals = []
+        for (value,) in self.connection().execute("SELECT date FROM deals ORDER BY id"):
+            ordinal = cache.get(value)
+            if ordinal is None:
+                ordinal = cache[value] = date_to_ordinal(value)
+            ordinals.append(ordinal)
+        return np.asarray(ordinals, dtype=np.int32)
+
+    def deal_values(self) -> np.ndarray:
+        """Traded value per row, in row id order"""
+        rows = self.connection().execute("SELECT quantity * price FROM deals ORDER BY id")
+        return np.fromiter((r[0] or 0.0 for r in rows), dtype=np.float64)
+
+    def offsets_between(self, start_norm: str, end_norm: str) -> List[int]:
+        rows = self.connection().execute(
+            "SELECT id FROM deals WHERE isoDate BETWEEN ? AND ? ORDER BY id", (start_norm, end_norm)
+        )
+        return [r[0] for r in rows]
+
+    def offsets_matching(self, field: str, predicate: Callable[[str], bool]) -> List[int]:
+        """Evaluate predicate once per distinct value, then select rows by value"""
+        conn = self.connection()
+        if field not in DEAL_FIELDS:
+            rows = conn.execute("SELECT id, extra FROM deals WHERE extra IS NOT NULL ORDER BY id")
+            return [r[0] for r in rows if predicate(str(json.loads(r[1]).get(field, '') or ''))]
+        matching = [r[0] for r in conn.execute(f"SELECT DISTINCT {field} FROM deals") if predicate(str(r[0]))]
+        offsets = []
+        for chunk in _chunks(matching):
+            rows = conn.execute(
+                f"SELECT id FROM deals WHERE {field} IN ({','.join('?' * len(chunk))})", chunk
+            )
+            offsets.extend(r[0] for r in rows)
+        offsets.sort()
+        return offsets
+
+    def offsets_equal(self, field: str, value: str, ignore_case: bool = False,
+                      within: Optional[Iterable[int]] = None) -> List[int]:
+        """Row ids (of all rows, or of those in within) whose field equals value"""
+        if field not in DEAL_FIELDS:
+            fold = str.upper if ignore_case else str
+            wanted = fold(str(value or ''))
+            found = self.offsets_matching(field, lambda v: fold(v) == wanted)
+            return found if within is None else sorted(set(found).intersection(int(o) for o in within))
+        where = f"{field} = ?" + (" COLLATE NOCASE" if ignore_case else "")
+        conn = self.connection()
+        if within is None:
+            return [r[0] for r in conn.execute(f"SELECT id FROM deals WHERE {where} ORDER BY id", (value,))]
+        offsets = []
+        for chunk in _chunks([int(o) for o in within], MAX_PARAMS - 1):
+            rows = conn.execute(
+                f"SELECT id FROM deals WHERE {where} AND id IN ({','.join('?' * len(chunk))}) ORDER BY id",
+                [value, *chunk],
+            )
+            offsets.extend(r[0] for r in rows)
+        return offsets
+
+    def fill_client_entities(self, key: Callable[[str], str]) -> int:
+        """Set clientEntity to key(clientName) on rows stored without one; returns the names filled"""
+        conn = self.connection()
+        with conn:
+            names = [r[0] for r in conn.execute("SELECT DISTINCT clientName FROM deals WHERE clientEntity = ''")]
+            if not names:
+                return 0
+            # One pass over the rows, looking each name up in a temporary table
+            conn.execute("CREATE TEMP TABLE client_entities (name TEXT PRIMARY KEY, entity TEXT)")
+            conn.executemany("INSERT INTO client_entities VALUES (?, ?)", [(n, key(n)) for n in names])
+            conn.execute("UPDATE deals SET clientEntity = (SELECT entity FROM client_entities WHERE name = clientName) "
+                         "WHERE clientEntity = ''")
+            conn.execute("DROP TABLE client_entities")
+        return len(names)
+
+    def dedup_keys(self) -> Iterable[str]:
+        rows = self.connection().execute("SELECT date, scripCode, clientName, side, exchange FROM deals")
+        for date_, scrip, client, side, exchange in rows:
+            yield f"{date_}|{scrip}|{canonical_client_name(client)}|{side}|{exchange}"
+
+    def dedup_keys_on(self, dates: Iterable[str]) -> set:
+        """Dedup keys of the deals stored on the given dates"""
+        keys = set()
+        for chunk in _chunks(sorted(set(dates))):
+            rows = self.connection().execute(
+                f"SELECT date, scripCode, clientName, side, exchange FROM deals WHERE date IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            keys.update(f"{date_}|{scrip}|{canonical_client_name(client)}|{side}|{exchange}"
+                        for date_, scrip, client, side, exchange in rows)
+        return keys
+
+
+class SQLiteBulkDealsDatabase(BulkDealsDatabase):
+    """BulkDealsDatabase whose deals are queried from SQLite instead of held in memory"""
+
+    def __init__(self, engine: Optional[str] = None, data_dir: Optional[str] = None):
+        self.data_dir = data_dir or DATA_DIR
+        os.makedirs(self.data_dir, exist_ok=True)
+        self.metadata_file = os.path.join(self.data_dir, METADATA_FILENAME)
+        self.database_file = os.path.join(self.data_dir, SQLITE_FILENAME)
+        self.export_dir = os.path.join(self.data_dir, EXPORT_DIRNAME)
+        self.engine = 'sqlite'
+        self._write_lock = threading.Lock()
+        self._fuzzy_lock = threading.Lock()
+        self._fuzzy = None
+        self.store = SQLiteDealStore(self.database_file)
+        self.aggregates = DealAggregates.from_store(self.store)
+        # Rows stored before the clientEntity column resolve in id order, once
+        self.client_entities = ClientEntities.from_store(self.store)
+        self.store.fill_client_entities(self.client_entities.key)
+        self.rollups = DailyRollups.from_store(self.store)
+        self._last_id = self.store.max_id()
+        self.metadata = self._load_metadata()
+
+    def _insert(self, deals: List[Dict]) -> List[Dict]:
+        """Normalize deals and INSERT OR IGNORE the ones whose dedup key is new.
+
+        The unique index only catches exact repeats; client spelling variants are
+        caught against the keys already stored on the batch's dates.
+        """
+        for deal in deals:
+            deal['date'] = self._normalize_date(deal.get('date'))
+            deal['exchange'] = str(deal.get('exchange', '')).upper() or deal.get('exchange', '')
+            deal['side'] = str(deal.get('side', '')).upper() or deal.get('side', '')
+        seen = self.store.dedup_keys_on(deal['date'] for deal in deals)
+        # Resolve new spellings against every name stored so far, by any process
+        self._catch_up()
+        fresh = []
+        for deal in deals:
+            key = dedup_key(deal)
+            if key not in seen:
+                seen.add(key)
+                deal['clientEntity'] = self.client_entities.assign(deal.get('clientName'), deal.get('clientEntity'))
+                fresh.append(deal)
+        added = self.store.insert_many(fresh)
+        self._catch_up()
+        return added
+
+    def _catch_up(self) -> int:
+        """Fold rows inserted since _last_id (by any process) into the aggregates and rollups"""
+        last_id = self.store.max_id()
+        rows = self.store.select('id > ? AND id <= ?', (self._last_id, last_id))
+        self._last_id = last_id
+        for d in rows:
+            self.client_entities.assign(d['clientName'], d['clientEntity'])
+        self.aggregates.add(rows)
+        self.rollups.add(rows)
+        return len(rows)
+
+    def refresh(self) -> int:
+        """Other processes commit straight to the file; only the aggregates and rollups need catching up"""
+        if self.store.max_id() == self._last_id:
+            return 0
+        with self._write_lock:
+            added = self._catch_up()
+            if added:
+                self._update_metadata()
+        return added
+
+    @property
+    def generation(self) -> int:
+        return self._last_id
+
+    def add_deals(self, deals: List[Dict]):
+        """Add deals to database, avoiding duplicates"""
+        with self._write_lock:
+            added = self._insert(deals)
+            if added:
+                self._update_metadata(len(added))
+                self._save_metadata()
+                print(f"Added {len(added)} new deals to database")
+        return len(added)
+
+    def compact(self):
+        """Nothing to compact: SQLite commits each batch itself"""
+        return 0
+
+    def compact_in_background(self):
+        pass
+
+    def _date_clauses(self, lo: int, hi: int) -> Tuple[List[str], List[Any]]:
+        """isoDate clauses for the deals dated within ordinals [lo, hi]; undated deals never match"""
+        if hi < max(lo, 1):
+            return ['0'], []
+        start = date.fromordinal(max(lo, 1)).isoformat()
+        if hi > date.max.toordinal():
+            return ['isoDate >= ?'], [start]
+        return ['isoDate BETWEEN ? AND ?'], [start, date.fromordinal(hi).isoformat()]
+
+    def _range_clauses(self, start_date: str, end_date: str) -> Tuple[List[str], List[Any]]:
+        """isoDate clauses for a required date range, read like the in-memory DateIndex"""
+        return self._date_clauses(date_to_ordinal(self._normalize_date(start_date)),
+                                  date_to_ordinal(self._normalize_date(end_date)))
+
+    def get_deals_by_date_range(self, start_date: str, end_date: str,
+                                exchange: Optional[str] = None) -> List[Dict]:
+        """Get deals within a date range, optionally for one exchange"""
+        clauses, params = self._range_clauses(start_date, end_date)
+        if exchange:
+            clauses.append('exchange = ?')
+            params.append(exchange.upper())
+        return self.store.select(' AND '.join(clauses), tuple(params))
+
+    def count_deals(self, start_date: str, end_date: str, exchange: Optional[str] = None) -> int:
+        """Count deals within a date range without materializing them"""
+        clauses, params = self._range_clauses(start_date, end_date)
+        if exchange:
+            clauses.append('exchange = ?')
+            params.append(exchange.upper())
+        return self.store.connection().execute(
+            f"SELECT COUNT(*) FROM deals WHERE {' AND '.join(clauses)}", params).fetchone()[0]
+
+    def _stream_where(self, start_date: Optional[str], end_date: Optional[str]) -> Tuple[str, List[Any], int]:
+        """WHERE clause, params and row count for the rows present now in a date range (or all of them)"""
+        clauses, params = ['id <= ?'], [self.store.max_id()]
+        if start_date and end_date:
+            range_clauses, range_params = self._range_clauses(start_date, end_date)
+            clauses += range_clauses
+            params += range_params
+        where = ' AND '.join(clauses)
+        count = self.store.connection().execute(f"SELECT COUNT(*) FROM deals WHERE {where}", params).fetchone()[0]
+        return where, params, count
+
+    def iter_deals(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                   chunk_size: int = STREAM_CHUNK_SIZE,
+                   fields: Optional[Sequence[str]] = None) -> Tuple[int, Iterator[List[Dict]]]:
+        """(count, chunks of deals in id order), paging by id over the rows present when called"""
+        where, params, count = self._stream_where(start_date, end_date)
+
+        def chunks() -> Iterator[List[Dict]]:
+            last_id = 0
+            while True:
+                ids = [r[0] for r in self.store.connection().execute(
+                    f"SELECT id FROM deals WHERE {where} AND id > ? ORDER BY id LIMIT {int(chunk_size)}",
+                    [*params, last_id],
+                )]
+                if not ids:
+                    return
+                last_id = ids[-1]
+                yield self._take(ids, fields)
+
+        return count, chunks()
+
+    def iter_columns(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                     fields: Sequence[str] = DEAL_FIELDS) -> Tuple[int, Iterator[Tuple[str, List[Any]]]]:
+        """(count, (field, values) per field in id order), one SELECT per column"""
+        where, params, count = self._stream_where(start_date, end_date)
+
+        def columns() -> Iterator[Tuple[str, List[Any]]]:
+            for f in fields:
+                yield f, self.store.select_column(f, where, params)
+
+        return count, columns()
+
+    def get_deals_page(self, limit: int, cursor: Optional[str] = None, start_date: Optional[str] = None,
+                       end_date: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """A page of deals, newest first, and the cursor of the next page (None after the last).
+
+        Ordered by (isoDate desc, id desc), undated deals last; each page is a seek on the
+        isoDate index via a row-value comparison.
+        """
+        clauses, params = self._window_clauses(start_date, end_date, None, None)
+        if cursor:
+            # The row id is persisted and unique, so it names the same deal on every worker
+            deal_date, key, _ = decode_cursor(cursor)
+            if deal_date:
+                clauses.append('((isoDate, id) < (?, ?) OR isoDate IS NULL)')
+                params.extend((deal_date, int(key)))
+            else:
+                clauses.append('isoDate IS NULL AND id < ?')
+                params.append(int(key))
+        where = ' AND '.join(clauses) or '1'
+        rows = self.store.connection().execute(
+            f"SELECT id, isoDate FROM deals WHERE {where} ORDER BY isoDate DESC, id DESC LIMIT {int(limit) + 1}",
+            params,
+        ).fetchall()
+        deals = self.store.take(r[0] for r in rows[:limit])
+        next_cursor = None
+        if len(rows) > limit and deals:
+            last_id, last_date = rows[limit - 1]
+            next_cursor = encode_cursor(last_date or '', str(last_id))
+        return deals, next_cursor
+
+    def get_deals_by_scrip(self, scrip_code: str, start_date: Optional[str] = None,
+                           end_date: Optional[str] = None) -> List[Dict]:
+        """Get a security's deals (case-insensitive code match), newest first"""
+        return self._select_by('scripCode', [str(scrip_code or '').strip()], start_date, end_date)
+
+    def get_deals_by_client(self, client_name: str, start_date: Optional[str] = None,
+                            end_date: Optional[str] = None) -> List[Dict]:
+        """Get an investor's deals under any spelling of their name, newest first"""
+        return self._select_by('clientEntity', [self.client_entities.key(client_name)], start_date, end_date)
+
+    def search_deals(self, query: str, limit: int = 100) -> List[Dict]:
+        """Deals whose security or client name contains query (case-insensitive), newest and largest first"""
+        pattern = _like_pattern(query)
+        return self.store.select(f"({NAME_LIKE})", (pattern, pattern),
+                                 order='isoDate DESC, quantity * price DESC, id', limit=limit)
+
+    def _window_clauses(self, start_date: Optional[str], end_date: Optional[str], exchange: Optional[str],
+                        side: Optional[str]) -> Tuple[List[str], List[Any]]:
+        """WHERE clauses and params for optional date bounds (the in-memory ordinal window), exchange and side"""
+        clauses, params = [], []
+        lo, hi = self._ordinal_bounds(start_date, end_date)
+        if lo or hi < MAX_ORDINAL:
+            clauses, params = self._date_clauses(lo, hi)
+        if exchange:
+            clauses.append('UPPER(TRIM(exchange)) = ?')
+            params.append(exchange.upper())
+        if side:
+            sides = BUY_SIDES if side_class(side) == 1 else SELL_SIDES
+            clauses.append(f"UPPER(TRIM(side)) IN ({','.join('?' * len(sides))})")
+            params.extend(sides)
+        return clauses, params
+
+    def query(self, query: DealQuery) -> Tuple[List[Dict], int, Dict[str, Any]]:
+        """(requested page, total matches, plan) for a DealQuery as one WHERE clause; SQLite picks the index"""
+        clauses, params = self._window_clauses(query.start, query.end, query.exchange, query.side)
+        if query.deal_type:
+            clauses.append('LOWER(TRIM(type)) = ?')
+            params.append(type_key(query.deal_type))
+        if query.scrips:
+            clauses.append(f"scripCode COLLATE NOCASE IN ({','.join('?' * len(query.scrips))})")
+            params.extend(code.strip() for code in query.scrips)
+        if query.client:
+            clauses.append("clientEntity COLLATE NOCASE = ?")
+            params.append(self.client_entities.key(query.client))
+        if query.text:
+            clauses.append(f"({NAME_LIKE})")
+            params.extend([_like_pattern(query.text)] * 2)
+        if query.min_value is not None:
+            clauses.append('quantity * price >= ?')
+            params.append(query.min_value)
+        if query.max_value is not None:
+            clauses.append('quantity * price <= ?')
+            params.append(query.max_value)
+        where = ' AND '.join(clauses) or '1'
+
+        direction = 'DESC' if query.descending else 'ASC'
+        order = f"isoDate {direction}, id {direction}"
+        if query.sort_field == 'value':
+            order = f"quantity * price {direction}, " + order
+        sql = f"SELECT id FROM deals WHERE {where} ORDER BY {order} LIMIT {int(query.limit)} OFFSET {int(query.offset)}"
+
+        conn = self.store.connection()
+        total = conn.execute(f"SELECT COUNT(*) FROM deals WHERE {where}", params).fetchone()[0]
+        ids = [r[0] for r in conn.execute(sql, params)]
+        plan = {'driver': 'sqlite', 'sqlite': [r[3] for r in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]}
+        return self.store.take(ids), total, plan
+
+    def aggregate(self, query: AggregateQuery) -> Tuple[List[Dict[str, Any]], int]:
+        """(requested groups with their metrics, non-empty group count) as one GROUP BY; scrip and
+        client groups are named after their latest deal (the row MAX(id) picks)"""
+        clauses, params = self._window_clauses(query.start, query.end, query.exchange, query.side)
+        where = ' AND '.join(clauses) or '1'
+        buys, sells = ','.join('?' * len(BUY_SIDES)), ','.join('?' * len(SELL_SIDES))
+        sql = f"""
+            SELECT {GROUP_KEYS[query.group_by]} AS key, COUNT(*) AS count, SUM(quantity) AS qty,
+                   SUM(quantity * price) AS value,
+                   SUM(CASE WHEN UPPER(TRIM(side)) IN ({buys}) THEN quantity * price
+                            WHEN UPPER(TRIM(side)) IN ({sells}) THEN -quantity * price ELSE 0 END) AS net_value,
+                   MAX(id), {NAME_FIELDS.get(query.group_by, "''")} AS name
+            FROM deals WHERE {where} GROUP BY key"""
+        params = [*BUY_SIDES, *SELL_SIDES, *params]
+        direction = 'DESC' if query.descending else 'ASC'
+        order = f"key {direction}" if query.sort_field == 'key' else f"{query.sort_field} {direction}, key"
+
+        conn = self.store.connection()
+        total = conn.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
+        groups = []
+        for row in conn.execute(f"{sql} ORDER BY {order} LIMIT {int(query.limit)}", params):
+            group: Dict[str, Any] = {'key': row[0] or ''}
+            metrics = dict(zip(AGGREGATE_METRICS, row[1:5]))
+            for m in query.metrics:
+                group[m] = int(metrics[m] or 0) if m in ('count', 'qty') else round(float(metrics[m] or 0), 2)
+            if query.group_by in NAME_FIELDS:
+                group['name'] = row[6]
+            groups.append(group)
+        return groups, total
+
+    def get_top_deals(self, k: int, by: str = 'value', start_date: Optional[str] = None,
+                      end_date: Optional[str] = None, exchange: Optional[str] = None,
+                      side: Optional[str] = None) -> List[Dict]:
+        """The k largest deals by traded value or quantity in a date window, largest first (ties: newest first)"""
+        if by not in TOP_METRICS:
+            raise ValueError(f"by must be one of: {', '.join(TOP_METRICS)}")
+        clauses, params = self._window_clauses(start_date, end_date, exchange, side)
+        metric = 'quantity * price' if by == 'value' else 'quantity'
+        return self.store.select(' AND '.join(clauses) or '1', tuple(params),
+                                 order=f"{metric} DESC, isoDate DESC, id DESC", limit=k)
+
+    def _name_sources(self) -> Dict[str, Tuple[List[str], Sequence[int], Optional[List[str]]]]:
+        """Distinct names per kind with deal counts, grouped in SQL (clients by investor entity)"""
+        conn = self.store.connection()
+        clients = dict(conn.execute("SELECT clientEntity, COUNT(*) FROM deals GROUP BY clientEntity"))
+        # The bare scripCode comes from the MAX(id) row: the latest code under each name
+        securities = conn.execute(
+            "SELECT securityName, COUNT(*), MAX(id), scripCode FROM deals WHERE securityName != '' "
+            "GROUP BY securityName").fetchall()
+        return {
+            'client': (list(clients), list(clients.values()), None),
+            'security': ([r[0] for r in securities], [r[1] for r in securities], [r[3] for r in securities]),
+        }
+
+    def _select_by(self, field: str, values: Sequence[str], start_date: Optional[str],
+                   end_date: Optional[str]) -> List[Dict]:
+        clauses, params = self._window_clauses(start_date, end_date, None, None)
+        clauses.insert(0, f"{field} COLLATE NOCASE IN ({','.join('?' * len(values))})")
+        return self.store.select(' AND '.join(clauses), (*values, *params), order='isoDate DESC, id DESC')
+
+def migrate_json_to_sqlite(data_dir: Optional[str] = None) -> int:
+    """One-shot copy of the JSON snapshot + deal log into the SQLite file"""
+    source = BulkDealsDatabase(engine='dict', data_dir=data_dir)
+    target = SQLiteBulkDealsDatabase(data_dir=data_dir)
+    deals = source.get_all_deals()
+    print(f"📦 Migrating {len(deals):,} deals from {source.database_file}")
+    added = target.add_deals(deals)
+    print(f"✅ {added:,} deals written to {target.database_file} ({len(deals) - added:,} already present)")
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite backend for the bulk deals database")
+    parser.add_argument('command', choices=['migrate'], help="migrate: copy the JSON database into SQLite")
+    parser.add_argument('--data-dir', default=None, help="Database directory (default: data/bulk-deals)")
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        migrate_json_to_sqlite(args.data_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+"""Fixtures shared by the bulk deals unit tests (run with python -m pytest from python-services/)"""
+
+import json
+import os
+
+import pytest
+
+from benchmark_deal_store import synthetic_deals
+from bulk_deals_database import DATABASE_FILENAME
+
+
+@pytest.fixture
+def deals():
+    """1,500 synthetic deals over 2012-2025, in no particular date order"""
+    return synthetic_deals(1500, seed=7)
+
+
+@pytest.fixture
+def write_database(tmp_path):
+    """Write deals as the JSON database file in a fresh data directory; returns the directory"""
+    def write(deals):
+        with open(os.path.join(tmp_path, DATABASE_FILENAME), 'w', encoding='utf-8') as f:
+            json.dump({'deals': deals}, f)
+        return str(tmp_path)
+    return write
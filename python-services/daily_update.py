@@ -4,15 +4,11 @@ Run this script daily at 6:02 PM IST to fetch latest deals
 Can be scheduled via Windows Task Scheduler or cron
 """
 
-import os
-import json
 import requests
 from datetime import datetime, timedelta
 from typing import List, Dict
 
-DATA_DIR = os.path.join(os.path.dirname(__file__), 'data', 'bulk-deals')
-DATABASE_FILE = os.path.join(DATA_DIR, 'bulk_deals_database.json')
-METADATA_FILE = os.path.join(DATA_DIR, 'database_metadata.json')
+from bulk_deals_database import open_database
 
 def parse_number(value) -> int:
     try:
@@ -84,54 +80,15 @@ def fetch_nse_bulk_deals() -> List[Dict]:
         print(f"❌ Error fetching NSE deals: {e}")
         return []
 
-def load_database() -> Dict:
-    """Load existing database"""
-    if os.path.exists(DATABASE_FILE):
-        try:
-            with open(DATABASE_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            pass
-    return {"deals": [], "by_date": {}}
-
-def save_database(database: Dict, added_count: int):
-    """Save database and update metadata"""
-    # Save database
-    with open(DATABASE_FILE, 'w', encoding='utf-8') as f:
-        json.dump(database, f)
-    
-    # Update metadata
-    deals = database['deals']
-    dates = [d['date'] for d in deals if d.get('date')]
-    nse_count = sum(1 for d in deals if d.get('exchange') == 'NSE')
-    bse_count = sum(1 for d in deals if d.get('exchange') == 'BSE')
-    
-    metadata = {
-        "last_updated": datetime.now().isoformat(),
-        "total_deals": len(deals),
-        "date_range": {
-            "start": min(dates) if dates else None,
-            "end": max(dates) if dates else None
-        },
-        "exchanges": {"NSE": nse_count, "BSE": bse_count},
-        "unique_dates": len(database['by_date']),
-        "last_update_added": added_count
-    }
-    
-    with open(METADATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(metadata, f, indent=2)
-    
-    return metadata
-
 def update_database():
     """Main update function"""
     print(f"\n{'='*50}")
     print(f"🕕 Daily Update - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"{'='*50}")
     
-    # Load existing database
-    database = load_database()
-    existing_count = len(database['deals'])
+    # Load existing database (snapshot + deal log)
+    db = open_database()
+    existing_count = len(db.store)
     print(f"📊 Existing deals: {existing_count:,}")
     
     # Fetch new deals from NSE
@@ -139,31 +96,13 @@ def update_database():
     nse_deals = fetch_nse_bulk_deals()
     print(f"   Found {len(nse_deals)} deals from NSE")
     
-    # Create set of existing keys for deduplication
-    existing_keys = set(
-        f"{d['date']}|{d['scripCode']}|{d['clientName']}|{d['side']}|{d['exchange']}"
-        for d in database['deals']
-    )
-    
-    # Add new deals
-    added = 0
-    for deal in nse_deals:
-        key = f"{deal['date']}|{deal['scripCode']}|{deal['clientName']}|{deal['side']}|{deal['exchange']}"
-        if key not in existing_keys:
-            database['deals'].append(deal)
-            
-            # Index by date
-            date_key = deal['date']
-            if date_key not in database['by_date']:
-                database['by_date'][date_key] = []
-            database['by_date'][date_key].append(len(database['deals']) - 1)
-            
-            existing_keys.add(key)
-            added += 1
+    # Deduplicated append to the deal log; the snapshot is compacted separately
+    added = db.add_deals(nse_deals)
     
     if added > 0:
         print(f"✅ Added {added} new deals")
-        metadata = save_database(database, added)
+        # add_deals has saved the metadata, including last_update_added
+        metadata = db.metadata
         print(f"💾 Saved! Total: {metadata['total_deals']:,} deals")
         print(f"📅 Range: {metadata['date_range']['start']} to {metadata['date_range']['end']}")
     else:
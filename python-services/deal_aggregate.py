@@ -0,0 +1,170 @@
+"""
+Bulk Deals Group-By Aggregation
+Deal count, quantity, traded value and net (buy minus sell) value per scrip,
+client, month or exchange over a date window, optionally for one side and
+exchange. Every group key is a small integer per deal (the posting indexes'
+key ids, a month number, the exchange class), so one group-by is a mask over
+DealColumns plus one np.bincount per metric - a few milliseconds for the
+whole history - and only the returned groups are ever labelled.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from deal_indexes import DealColumns, PostingIndex, exchange_class, side_class
+from deal_query import MAX_ORDINAL, parse_exchange, parse_side
+from deal_snapshot import EPOCH_ORDINAL
+
+GROUP_BYS = ('scrip', 'client', 'month', 'exchange')
+AGGREGATE_METRICS = ('count', 'qty', 'value', 'net_value')
+
+# Leaderboards rank by value; calendars and venues read in key order
+DEFAULT_SORTS = {'scrip': '-value', 'client': '-value', 'month': 'key', 'exchange': 'key'}
+
+# Field of a group's latest deal shown as its display name
+NAME_FIELDS = {'scrip': 'securityName', 'client': 'clientName'}
+
+EXCHANGE_LABELS = ('', 'BSE', 'NSE')
+
+
+def parse_metrics(value: Optional[str]) -> Tuple[str, ...]:
+    """metrics request parameter (comma-separated, default all); raises ValueError naming unknown ones"""
+    if not value:
+        return AGGREGATE_METRICS
+    names = tuple(dict.fromkeys(m.strip().lower() for m in value.split(',') if m.strip()))
+    unknown = [m for m in names if m not in AGGREGATE_METRICS]
+    if unknown:
+        raise ValueError(f"Unknown metrics: {', '.join(unknown)} (expected {', '.join(AGGREGATE_METRICS)})")
+    return names or AGGREGATE_METRICS
+
+
+class AggregateQuery:
+    """Grouping, metrics, filters, sort and size of a group-by"""
+
+    def __init__(self, group_by: str, metrics: Sequence[str] = AGGREGATE_METRICS, start: Optional[str] = None,
+                 end: Optional[str] = None, exchange: Optional[str] = None, side: Optional[str] = None,
+                 sort: Optional[str] = None, limit: int = 100):
+        self.group_by = group_by
+        self.metrics = tuple(metrics)
+        self.start, self.end = start, end
+        self.exchange = exchange
+        self.side = side
+        sort = sort or DEFAULT_SORTS[group_by]
+        self.sort_field = sort.lstrip('-')
+        self.descending = sort.startswith('-')
+        self.limit = limit
+
+    @classmethod
+    def from_args(cls, args, limit: int) -> 'AggregateQuery':
+        """From request args, with the group count already clamped by the caller.
+
+        Raises ValueError describing the first invalid parameter.
+        """
+        group_by = (args.get('group_by') or '').strip().lower()
+        if group_by not in GROUP_BYS:
+            raise ValueError(f"group_by must be one of: {', '.join(GROUP_BYS)}")
+        metrics = parse_metrics(args.get('metrics'))
+        sort = (args.get('sort') or '').strip().lower() or None
+        if sort and sort.lstrip('-') not in ('key',) + AGGREGATE_METRICS:
+            raise ValueError(f"sort must be key or one of: {', '.join(AGGREGATE_METRICS)} (prefix '-' for descending)")
+        return cls(group_by, metrics, args.get('start') or None, args.get('end') or None,
+                   exchange=parse_exchange(args.get('exchange')), side=parse_side(args.get('side')),
+                   sort=sort, limit=limit)
+
+
+class Aggregator:
+    """Runs AggregateQuery group-bys over one database's DealColumns and posting indexes"""
+
+    def __init__(self, columns: DealColumns, scrip_index: PostingIndex, client_index: PostingIndex):
+        self.columns = columns
+        self.indexes = {'scrip': scrip_index, 'client': client_index}
+
+    def _rows(self, query: AggregateQuery, lo: int, hi: int, state) -> np.ndarray:
+        """Offsets of the deals in the window passing the side/exchange filters"""
+        ordinals, _, _, sides, exchanges, _, n = state
+        mask = None
+        if lo > 0 or hi < MAX_ORDINAL:
+            # Ordinal 0 (unparseable date) never matches a range, as in DateIndex
+            mask = (ordinals[:n] >= max(lo, 1)) & (ordinals[:n] <= hi)
+        for column, code in ((sides, side_class(query.side)), (exchanges, exchange_class(query.exchange))):
+            if code:
+                matched = column[:n] == code
+                mask = matched if mask is None else mask & matched
+        return np.arange(n, dtype=np.int64) if mask is None else np.flatnonzero(mask)
+
+    def _groups(self, group_by: str, rows: np.ndarray, state) -> Tuple[np.ndarray, int, Any]:
+        """(group id of each row, group count, labels by group id: a list or a function of ids)"""
+        ordinals, _, _, _, exchanges, _, _ = state
+        if group_by in self.indexes:
+            index = self.indexes[group_by]
+            ids = index.row_keys()[rows]
+            keys = index.keys()
+            return ids.astype(np.int64), len(keys), keys
+        if group_by == 'exchange':
+            return exchanges[rows].astype(np.int64), len(EXCHANGE_LABELS), EXCHANGE_LABELS
+        # month: months since 1970-01 from the ordinals, shifted to start at 1; 0 holds undated deals
+        days = ordinals[rows].astype(np.int64)
+        months = (days - EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        dated = days > 0
+        first = int(months[dated].min()) if dated.any() else 0
+        ids = np.where(dated, months - first + 1, 0)
+
+        def label(group: int) -> str:
+            return str(np.datetime64(first + group - 1, 'M')) if group else ''
+
+        return ids, (int(ids.max()) + 1) if ids.size else 0, label
+
+    def run(self, query: AggregateQuery, lo: int = 0, hi: int = MAX_ORDINAL
+            ) -> Tuple[List[Dict[str, Any]], int, Optional[np.ndarray]]:
+        """(requested groups in sort order as {'key', metrics...}, non-empty group count, offset of
+        each returned group's latest deal when the grouping has a display name, else None).
+
+        lo/hi are the window's date bounds as ordinals.
+        """
+        # DealColumns is updated after the posting indexes, so its rows have key ids there
+        state = self.columns.state()
+        _, values, quantities, sides, _, _, _ = state
+        rows = self._rows(query, lo, hi, state)
+        ids, size, labels = self._groups(query.group_by, rows, state)
+
+        totals = {'count': np.bincount(ids, minlength=size).astype(np.float64)}
+        if 'qty' in query.metrics or query.sort_field == 'qty':
+            totals['qty'] = np.bincount(ids, weights=quantities[rows], minlength=size)
+        if 'value' in query.metrics or query.sort_field == 'value':
+            totals['value'] = np.bincount(ids, weights=values[rows], minlength=size)
+        if 'net_value' in query.metrics or query.sort_field == 'net_value':
+            side = sides[rows]
+            signed = np.where(side == 1, values[rows], np.where(side == 2, -values[rows], 0.0))
+            totals['net_value'] = np.bincount(ids, weights=signed, minlength=size)
+
+        groups = np.flatnonzero(totals['count'])
+        sign = -1 if query.descending else 1
+        if query.sort_field == 'key':
+            if callable(labels):
+                # Month ids increase with the month itself
+                order = groups if sign > 0 else groups[::-1]
+            else:
+                keyed = np.asarray([labels[g] for g in groups.tolist()], dtype=object)
+                order = groups[np.argsort(keyed, kind='stable')]
+                order = order if sign > 0 else order[::-1]
+        else:
+            # Ties by group id, so equal totals list the same way every time
+            order = groups[np.lexsort((groups, sign * totals[query.sort_field][groups]))]
+        chosen = order[:query.limit]
+
+        results = []
+        for g in chosen.tolist():
+            group: Dict[str, Any] = {'key': labels(g) if callable(labels) else labels[g]}
+            for m in query.metrics:
+                group[m] = int(totals[m][g]) if m in ('count', 'qty') else round(float(totals[m][g]), 2)
+            results.append(group)
+
+        representatives = None
+        if query.group_by in NAME_FIELDS and chosen.size:
+            # The latest deal of each returned group (rows are in offset order)
+            picked = np.isin(ids, chosen)
+            picked_rows, picked_ids = rows[picked][::-1], ids[picked][::-1]
+            found, first = np.unique(picked_ids, return_index=True)
+            representatives = picked_rows[first][np.searchsorted(found, chosen)]
+        return results, int(groups.size), representatives
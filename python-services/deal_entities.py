@@ -0,0 +1,174 @@
+"""
+Bulk Deals Client Entities
+One investor turns up under several spellings: "ABC CAPITAL PVT. LTD.",
+"Abc Capital Private Limited", "ABC CAPITAL (P) LTD", "M/S ABC CAPITAL PVT LTD".
+canonical_client_name applies fixed normalization rules (case, punctuation,
+spacing, legal-suffix and HUF spellings) and is what the dedup key uses.
+ClientEntities goes one step further for the indexes: a canonical name that
+only differs from a known one in spacing, or by a one-character typo in a long
+name, joins that entity. Each raw spelling is resolved once, when its first
+deal is ingested, and the result is stored with the deal as clientEntity.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional
+
+import numpy as np
+
+# Whole-token rewrites applied after punctuation is stripped
+TOKEN_SYNONYMS = {
+    'PVT': 'PRIVATE', 'PVTLTD': 'PRIVATE LIMITED', 'PRIV': 'PRIVATE',
+    'LTD': 'LIMITED', 'LIMTED': 'LIMITED',
+    'CORP': 'CORPORATION', 'CORPN': 'CORPORATION',
+    'INTL': 'INTERNATIONAL',
+    'MGMT': 'MANAGEMENT',
+}
+
+_PREFIX = re.compile(r'^\s*M\s*/\s*S\.?\s+')
+_DROPPED = re.compile(r"[.']")
+_SEPARATORS = re.compile(r'[^A-Z0-9 ]+')
+_HUF = re.compile(r'\bH U F\b')
+# "(P) LTD" reads "P LIMITED" once parentheses are gone
+_PRIVATE_INITIAL = re.compile(r'\bP (?=LIMITED\b)')
+
+# Similarity merging: compact (space-free) names at least this long and free of
+# digits may absorb a one-edit variant; shorter names and numbered entities
+# ("FUND 1" / "FUND 2") differ too easily in one character to be merged safely
+FUZZY_MIN_LENGTH = 20
+# Blocks of known compact names by prefix and suffix: a single edit of a long
+# name leaves one of them intact
+BLOCK_LENGTH = 6
+
+
+@lru_cache(maxsize=65536)
+def canonical_client_name(name) -> str:
+    """Client name under the fixed normalization rules: upper case, no punctuation, single
+    spaces, legal suffixes and HUF spelled out one way"""
+    text = _PREFIX.sub('', str(name or '').upper())
+    text = _SEPARATORS.sub(' ', _DROPPED.sub('', text.replace('&', ' AND ')))
+    text = ' '.join(TOKEN_SYNONYMS.get(token, token) for token in text.split())
+    return _PRIVATE_INITIAL.sub('PRIVATE ', _HUF.sub('HUF', text))
+
+
+def _fuzzy(compact: str) -> bool:
+    """Whether a compact name takes part in similarity merging"""
+    # Canonical names are A-Z and 0-9 only, so "no digits" is isalpha()
+    return len(compact) >= FUZZY_MIN_LENGTH and compact.isalpha()
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """Levenshtein distance of at most 1 (one substitution, insertion or deletion)"""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    # Substitution skips one character in both, insertion one in the longer
+    return a[i + 1:] == b[i + 1:] if len(a) == len(b) else a[i:] == b[i + 1:]
+
+
+class ClientEntities:
+    """
+    Raw client name -> entity key (the canonical name of the first spelling seen
+    of that investor). Each deal stores the key it was given when first ingested
+    (its clientEntity field), and assign() takes that back as is on every reload,
+    log replay and worker, so a merged variant never changes entity with the
+    order in which a process happened to see the names. key() resolves any name,
+    registered or not, without changing the mapping, so lookups from requests
+    never create entities.
+    """
+
+    def __init__(self):
+        self._entities: Dict[str, str] = {}     # canonical name -> entity key
+        self._compact: Dict[str, str] = {}      # space-free canonical name -> entity key
+        # Prefix / suffix of a compact name -> compact names; replaced, never mutated, as readers don't lock
+        self._blocks: Dict[str, FrozenSet[str]] = {}
+        self._aliases: Dict[str, List[str]] = {}  # entity key -> raw spellings
+        self._raw: Dict[str, str] = {}          # raw spelling -> entity key (the cache)
+
+    @classmethod
+    def from_store(cls, store) -> 'ClientEntities':
+        """From the (clientName, clientEntity) pairs stored, in storage order; rows stored
+        without an entity (written before the column existed) resolve as they come"""
+        entities = cls()
+        if store.engine == 'columnar':
+            # Each distinct code pair once, in order of first occurrence
+            names, keys = store.column('clientName'), store.column('clientEntity')
+            _, first = np.unique((names.astype(np.int64) << 32) | keys, return_index=True)
+            first.sort()
+            name_values = store.dictionaries['clientName'].values
+            key_values = store.dictionaries['clientEntity'].values
+            pairs = ((name_values[names[i]], key_values[keys[i]]) for i in first.tolist())
+        else:
+            pairs = dict.fromkeys(zip(store.values('clientName'), store.values('clientEntity')))
+        for name, key in pairs:
+            entities.assign(name, key)
+        return entities
+
+    def __len__(self) -> int:
+        return len(self._aliases)
+
+    def _match(self, canonical: str) -> Optional[str]:
+        """Entity key an unseen canonical name belongs to, if any"""
+        found = self._entities.get(canonical)
+        if found is not None:
+            return found
+        compact = canonical.replace(' ', '')
+        found = self._compact.get(compact)
+        if found is not None or not _fuzzy(compact):
+            return found
+        candidates = self._blocks.get(compact[:BLOCK_LENGTH], frozenset()) | \
+            self._blocks.get(compact[-BLOCK_LENGTH:], frozenset())
+        # Sorted, so the same names always resolve to the same entity
+        for other in sorted(candidates):
+            if _within_one_edit(compact, other):
+                return self._compact[other]
+        return None
+
+    def assign(self, name, key: Optional[str] = None) -> str:
+        """Entity key to store a deal of this client under, registering the spelling.
+
+        key is the entity the deal was stored with, if any, and is kept; otherwise
+        a new spelling joins a known entity or starts its own.
+        """
+        raw = str(name or '')
+        known = self._raw.get(raw)
+        if not key:
+            if known is not None:
+                return known
+            canonical = canonical_client_name(raw)
+            key = self._match(canonical) or canonical
+        elif key == known:
+            return key
+        aliases = self._aliases.setdefault(key, [])
+        # Stored under two entities only if two writers resolved a new spelling at once
+        if known is None or raw not in aliases:
+            aliases.append(raw)
+        self._raw.setdefault(raw, key)
+        for canonical in (key, canonical_client_name(raw)):
+            if canonical not in self._entities:
+                self._entities[canonical] = key
+                compact = canonical.replace(' ', '')
+                self._compact.setdefault(compact, key)
+                if _fuzzy(compact):
+                    for block in (compact[:BLOCK_LENGTH], compact[-BLOCK_LENGTH:]):
+                        self._blocks[block] = self._blocks.get(block, frozenset()) | {compact}
+        return key
+
+    def key(self, name) -> str:
+        """Entity key of a client name; an unknown investor's own canonical name"""
+        raw = str(name or '')
+        found = self._raw.get(raw)
+        if found is not None:
+            return found
+        canonical = canonical_client_name(raw)
+        return self._match(canonical) or canonical
+
+    def aliases(self, name) -> List[str]:
+        """Every registered raw spelling of the entity a name resolves to"""
+        return list(self._aliases.get(self.key(name), ()))
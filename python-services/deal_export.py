@@ -0,0 +1,133 @@
+"""
+Bulk Deals Columnar Export
+Parquet and Arrow IPC files of the deals in a date range, built from the
+store's columns: on the columnar engines date ordinals become date32 and the
+dictionary codes of string fields become Arrow dictionary arrays directly,
+without materializing a deal dict. Files are written once per (database
+generation, range, format) into data/bulk-deals/exports/ and reused until
+the generation moves on.
+"""
+
+import os
+import re
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from deal_snapshot import EPOCH_ORDINAL
+from deal_store import DEAL_FIELDS, ENCODED_FIELDS, date_to_ordinal
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    EXPORT_AVAILABLE = True
+except ImportError:
+    pa = pq = None
+    EXPORT_AVAILABLE = False
+
+EXPORT_DIRNAME = 'exports'
+
+# format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.file', 'arrow'),
+}
+
+# zstd for both: far smaller than JSON and still fast to decode in pandas/polars
+PARQUET_COMPRESSION = 'zstd'
+ARROW_COMPRESSION = 'zstd'
+
+_EXPORT_NAME = re.compile(r'^bulk_deals_.+\.g(\d+)\.(parquet|arrow)$')
+
+
+def _require_pyarrow():
+    if not EXPORT_AVAILABLE:
+        raise RuntimeError("pyarrow not installed. Run: pip install pyarrow")
+
+
+def _schema():
+    types = {'date': pa.date32(), 'quantity': pa.int64(), 'price': pa.float64()}
+    return pa.schema([
+        pa.field(f, types.get(f, pa.dictionary(pa.int32(), pa.string()))) for f in DEAL_FIELDS
+    ])
+
+
+def table_from_store(store, offsets: np.ndarray):
+    """Arrow table of the rows at offsets of a columnar (or sharded) store, straight from its arrays"""
+    _require_pyarrow()
+    idx = np.asarray(offsets, dtype=np.int64)
+    arrays = []
+    for f in DEAL_FIELDS:
+        column = store.column(f)[idx]
+        if f == 'date':
+            # Ordinal 0 marks a date that could not be parsed
+            days = column.astype(np.int32) - np.int32(EPOCH_ORDINAL)
+            arrays.append(pa.array(days, pa.date32(), mask=column == 0))
+        elif f in ENCODED_FIELDS:
+            # Only the dictionary entries this range uses
+            used, codes = np.unique(column, return_inverse=True)
+            values = store.dictionaries[f].values
+            dictionary = pa.array([values[c] for c in used.tolist()], pa.string())
+            arrays.append(pa.DictionaryArray.from_arrays(pa.array(codes.astype(np.int32)), dictionary))
+        else:
+            arrays.append(pa.array(column))
+    return pa.Table.from_arrays(arrays, schema=_schema())
+
+
+def table_from_columns(columns: Iterable[Tuple[str, List]]):
+    """Arrow table from (field, values) pairs, as produced by iter_columns on any backend"""
+    _require_pyarrow()
+    schema = _schema()
+    arrays = []
+    for f, values in columns:
+        if f == 'date':
+            # As in table_from_store: a date that could not be parsed is null, not an error
+            ordinals = np.array([date_to_ordinal(v) for v in values], dtype=np.int32)
+            arrays.append(pa.array(ordinals - np.int32(EPOCH_ORDINAL), pa.date32(), mask=ordinals == 0))
+        elif f in ENCODED_FIELDS:
+            arrays.append(pa.array(['' if v is None else str(v) for v in values], pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(values, schema.field(f).type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def export_filename(fmt: str, generation: int, start: Optional[str], end: Optional[str]) -> str:
+    span = f"{start}_{end}" if start and end else 'all'
+    return f"bulk_deals_{span}.g{generation}.{EXPORT_FORMATS[fmt][1]}"
+
+
+def download_name(path: str) -> str:
+    """Export file name without its generation"""
+    return re.sub(r'\.g\d+\.', '.', os.path.basename(path))
+
+
+def write_table(table, path: str, fmt: str):
+    """Write atomically, so a concurrent reader never sees a partial file"""
+    _require_pyarrow()
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        if fmt == 'parquet':
+            pq.write_table(table, tmp_path, compression=PARQUET_COMPRESSION)
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=ARROW_COMPRESSION)
+            with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema, options=options) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def prune_exports(export_dir: str, generation: int) -> int:
+    """Delete exports of generations older than generation; returns how many were removed"""
+    removed = 0
+    for name in os.listdir(export_dir):
+        match = _EXPORT_NAME.match(name)
+        if match and int(match.group(1)) < generation:
+            try:
+                os.remove(os.path.join(export_dir, name))
+                removed += 1
+            except OSError:
+                pass
+    return removed
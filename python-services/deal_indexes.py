@@ -0,0 +1,1148 @@
+"""
+Bulk Deals Indexes
+In-memory secondary indexes kept alongside the deal store and updated
+incrementally by BulkDealsDatabase.add_deals
+"""
+
+import hashlib
+import heapq
+import re
+from collections import Counter
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from deal_store import date_to_ordinal, deal_value, parse_number
+
+
+def key_hash(key: str) -> int:
+    """Stable 64-bit hash of a dedup key (Python's hash() is salted per process)"""
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def key_hashes(keys: Iterable[str]) -> np.ndarray:
+    """key_hash of each dedup key, as a uint64 array in the same order"""
+    return np.fromiter((key_hash(k) for k in keys), dtype=np.uint64)
+
+
+class DedupIndex:
+    """
+    Set of hashed dedup keys: a sorted uint64 array holding the bulk of them
+    plus a small Python set of recent inserts, merged in once it grows.
+    Built once at load; each add_deals batch then costs O(batch) lookups.
+
+    One entry per key, not per deal: deals stored before the key was canonical
+    can share one (client spellings it now merges, old exact repeats). They are
+    all kept; the key just turns away any further deal under it, so len() can be
+    less than the row count.
+    """
+
+    MERGE_THRESHOLD = 4096
+
+    def __init__(self, keys: Iterable[str] = ()):
+        self._sorted = np.unique(key_hashes(keys))
+        self._recent = set()
+
+    @classmethod
+    def from_hashes(cls, hashes: np.ndarray) -> 'DedupIndex':
+        """Index from a sorted, duplicate-free uint64 array (hashes(), or np.unique of per-deal hashes)"""
+        index = cls()
+        index._sorted = np.asarray(hashes, dtype=np.uint64)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._sorted) + len(self._recent)
+
+    def hashes(self) -> np.ndarray:
+        """All key hashes as one sorted uint64 array (what the binary snapshot persists)"""
+        if not self._recent:
+            return self._sorted
+        recent = np.fromiter(self._recent, dtype=np.uint64, count=len(self._recent))
+        return np.union1d(self._sorted, recent)
+
+    def _contains_hash(self, h: int) -> bool:
+        if h in self._recent:
+            return True
+        h = np.uint64(h)
+        i = int(np.searchsorted(self._sorted, h))
+        return i < len(self._sorted) and self._sorted[i] == h
+
+    def __contains__(self, key: str) -> bool:
+        return self._contains_hash(key_hash(key))
+
+    def add(self, key: str) -> bool:
+        """Record a key; returns False if it was already present"""
+        return self.add_hash(key_hash(key))
+
+    def add_hash(self, h: int) -> bool:
+        """add() for a key already hashed with key_hash"""
+        if self._contains_hash(h):
+            return False
+        self._recent.add(h)
+        if len(self._recent) >= self.MERGE_THRESHOLD:
+            self._sorted = self.hashes()
+            self._recent = set()
+        return True
+
+
+class DealAggregates:
+    """
+    Running totals behind the database metadata: deal counts per exchange,
+    side and type, the set of distinct dates (giving bounds and unique count)
+    and total traded value. Seeded once from the store, then add() keeps them
+    current in O(batch) instead of a full pass per add_deals.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.exchanges: Counter = Counter()
+        self.sides: Counter = Counter()
+        self.types: Counter = Counter()
+        self.dates: set = set()
+        self.first = 0
+        self.last = 0
+        self.total_value = 0.0
+
+    @classmethod
+    def from_store(cls, store) -> 'DealAggregates':
+        aggregates = cls()
+        aggregates.total = len(store)
+        aggregates.exchanges.update(store.value_counts('exchange'))
+        aggregates.sides.update(store.value_counts('side'))
+        aggregates.types.update(store.value_counts('type'))
+        ordinals = (date_to_ordinal(d) for d in store.value_counts('date'))
+        aggregates._add_dates(o for o in ordinals if o)
+        aggregates.total_value = store.total_value()
+        return aggregates
+
+    def add(self, deals: Iterable[Dict]):
+        """Fold in newly inserted (normalized) deals"""
+        for deal in deals:
+            self.total += 1
+            self.exchanges[deal.get('exchange', '')] += 1
+            self.sides[deal.get('side', '')] += 1
+            self.types[deal.get('type', '')] += 1
+            ordinal = date_to_ordinal(deal.get('date', ''))
+            if ordinal:
+                self._add_dates((ordinal,))
+            self.total_value += deal_value(deal)
+
+    def _add_dates(self, ordinals: Iterable[int]):
+        for ordinal in ordinals:
+            self.dates.add(ordinal)
+            self.first = min(self.first, ordinal) if self.first else ordinal
+            self.last = max(self.last, ordinal)
+
+    def date_bounds(self) -> Tuple[Optional[str], Optional[str]]:
+        if not self.dates:
+            return None, None
+        return date.fromordinal(self.first).isoformat(), date.fromordinal(self.last).isoformat()
+
+
+class DateIndex:
+    """
+    Deal offsets sorted by (date ordinal, offset). A date-range query is two
+    bisects plus a slice instead of a scan over every deal.
+
+    The arrays carry spare capacity so the common case - deals for the newest
+    date - is an in-place append. Readers take one (ordinals, offsets, size)
+    snapshot, so a concurrent add never shows them a half-updated index.
+    """
+
+    def __init__(self, ordinals: Iterable[int] = ()):
+        ordinals = np.asarray(ordinals, dtype=np.int32)
+        order = np.argsort(ordinals, kind='stable').astype(np.int32)
+        self._state = (ordinals[order], order, len(order))
+
+    def __len__(self) -> int:
+        return self._state[2]
+
+    def add_many(self, ordinals: Iterable[int], offsets: Iterable[int]):
+        """Index newly appended deals (offsets larger than any already indexed)"""
+        new_ordinals = np.asarray(ordinals, dtype=np.int32)
+        new_offsets = np.asarray(offsets, dtype=np.int32)
+        if new_ordinals.size == 0:
+            return
+        current_ordinals, current_offsets, n = self._state
+
+        in_order = (n == 0 or new_ordinals[0] >= current_ordinals[n - 1]) and \
+            bool(np.all(new_ordinals[1:] >= new_ordinals[:-1]))
+        if in_order and n + new_ordinals.size <= len(current_ordinals):
+            # Slots past n are invisible to readers until the state swap below
+            current_ordinals[n:n + new_ordinals.size] = new_ordinals
+            current_offsets[n:n + new_ordinals.size] = new_offsets
+            self._state = (current_ordinals, current_offsets, n + new_ordinals.size)
+            return
+
+        merged_ordinals = np.concatenate([current_ordinals[:n], new_ordinals])
+        merged_offsets = np.concatenate([current_offsets[:n], new_offsets])
+        if not in_order:
+            order = np.lexsort((merged_offsets, merged_ordinals))
+            merged_ordinals = merged_ordinals[order]
+            merged_offsets = merged_offsets[order]
+
+        size = len(merged_ordinals)
+        capacity = max(size + 1024, size * 5 // 4)
+        ordinals_buf = np.zeros(capacity, dtype=np.int32)
+        offsets_buf = np.zeros(capacity, dtype=np.int32)
+        ordinals_buf[:size] = merged_ordinals
+        offsets_buf[:size] = merged_offsets
+        self._state = (ordinals_buf, offsets_buf, size)
+
+    def _bounds(self, lo: int, hi: int):
+        ordinals, offsets, n = self._state
+        # Ordinal 0 marks an unparseable date; such deals never match a range
+        # Bisect with int32 scalars: a Python int would make NumPy upcast the whole array
+        lo, hi = np.int32(max(lo, 1)), np.int32(hi)
+        i = int(np.searchsorted(ordinals[:n], lo, side='left'))
+        j = int(np.searchsorted(ordinals[:n], hi, side='right'))
+        return offsets, i, max(i, j)
+
+    def offsets_between(self, lo: int, hi: int) -> np.ndarray:
+        """Offsets of deals dated within [lo, hi] (ordinals), in (date, offset) order"""
+        offsets, i, j = self._bounds(lo, hi)
+        return offsets[i:j]
+
+    def count_between(self, lo: int, hi: int) -> int:
+        _, i, j = self._bounds(lo, hi)
+        return j - i
+
+    def sorted_offsets(self) -> np.ndarray:
+        """Every indexed offset in (date, offset) order"""
+        _, offsets, n = self._state
+        return offsets[:n]
+
+
+class KeysetIndex:
+    """
+    Deal offsets sorted by (date ordinal, dedup key hash, offset): the order
+    newest-first pages are cut in. The hash belongs to the deal, not to the
+    offset a store happens to give it, so a page cursor resumes at the same
+    place on every worker and after a reload. Rows stored before the dedup key
+    was canonical can share a (date, hash); the cursor then also carries the
+    deal's occurrence among them, which is the same everywhere since new deals
+    never join such a run (the dedup index turns them away). Readers take one
+    (ordinals, hashes, offsets) snapshot; add_many() swaps in a new one.
+    """
+
+    def __init__(self, ordinals: Iterable[int] = (), hashes: Iterable[int] = ()):
+        ordinals = np.asarray(ordinals, dtype=np.int32)
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        # Stable, so deals sharing a (date, hash) stay in offset order
+        order = np.lexsort((hashes, ordinals))
+        self._state = (ordinals[order], hashes[order], order.astype(np.int64))
+
+    def __len__(self) -> int:
+        return len(self._state[2])
+
+    def _seek(self, ordinals: np.ndarray, hashes: np.ndarray, ordinal: int, h: int, side: str = 'left') -> int:
+        """Position of the first entry at (side='left') or after (side='right') (ordinal, h)"""
+        a = int(np.searchsorted(ordinals, np.int32(ordinal), side='left'))
+        b = int(np.searchsorted(ordinals, np.int32(ordinal), side='right'))
+        return a + int(np.searchsorted(hashes[a:b], np.uint64(h), side=side))
+
+    def add_many(self, ordinals: Iterable[int], hashes: Iterable[int], offsets: Iterable[int]):
+        """Index newly appended deals (a batch is small: each is placed by bisection)"""
+        new_ordinals = np.asarray(ordinals, dtype=np.int32)
+        new_hashes = np.asarray(hashes, dtype=np.uint64)
+        new_offsets = np.asarray(offsets, dtype=np.int64)
+        if new_ordinals.size == 0:
+            return
+        current_ordinals, current_hashes, current_offsets = self._state
+        order = np.lexsort((new_hashes, new_ordinals))
+        new_ordinals, new_hashes, new_offsets = new_ordinals[order], new_hashes[order], new_offsets[order]
+        # After any entry they tie with, whose offset is lower; sorted, so deals
+        # landing at the same position are inserted in order
+        at = [self._seek(current_ordinals, current_hashes, o, h, side='right')
+              for o, h in zip(new_ordinals.tolist(), new_hashes.tolist())]
+        self._state = (np.insert(current_ordinals, at, new_ordinals), np.insert(current_hashes, at, new_hashes),
+                       np.insert(current_offsets, at, new_offsets))
+
+    def page(self, lo: int, hi: int, limit: int, before: Optional[Tuple[int, int, int]] = None
+             ) -> Tuple[np.ndarray, Optional[Tuple[int, int]], bool]:
+        """Up to limit offsets dated within [lo, hi], newest first (date desc, key hash desc, offset desc).
+
+        before is the (ordinal, key hash, occurrence) of the last deal of the previous page:
+        the page starts just below it, found by bisecting rather than skipping rows. Returns
+        the offsets, the (key hash, occurrence) of the last one (None if empty) and whether
+        more deals follow. Unlike the range queries, lo=0 includes deals with unparseable
+        dates (they sort oldest).
+        """
+        ordinals, hashes, offsets = self._state
+        i = int(np.searchsorted(ordinals, np.int32(lo), side='left'))
+        j = int(np.searchsorted(ordinals, np.int32(hi), side='right'))
+        if before is not None:
+            ordinal, h, occurrence = before
+            first = self._seek(ordinals, hashes, ordinal, h)
+            j = min(j, first + occurrence, self._seek(ordinals, hashes, ordinal, h, side='right'))
+        start = max(i, j - limit)
+        if start == j:
+            return offsets[start:j], None, False
+        last = (int(hashes[start]), start - self._seek(ordinals, hashes, int(ordinals[start]), int(hashes[start])))
+        return offsets[start:j][::-1], last, start > i
+
+
+def scrip_key(code) -> str:
+    """Form scrip codes are indexed and looked up in"""
+    return str(code or '').strip().upper()
+
+
+def mapped_column(store, field: str, fn: Callable[[Any], int], dtype=np.int32) -> np.ndarray:
+    """fn(value) of every row's field, calling fn once per distinct stored value"""
+    seen: Dict[Any, int] = {}
+
+    def mapped(value) -> int:
+        found = seen.get(value)
+        if found is None:
+            found = seen[value] = fn(value)
+        return found
+
+    if store.engine == 'columnar':
+        # Map each dictionary code once, then the whole code column in one gather
+        remap = np.fromiter((mapped(v) for v in store.dictionaries[field].values), dtype=dtype)
+        return remap[store.column(field)] if remap.size else np.zeros(len(store), dtype=dtype)
+    return np.fromiter((mapped(v) for v in store.values(field)), dtype=dtype)
+
+
+class PostingIndex:
+    """
+    Posting lists from a normalized field value (scrip code, client entity) to the
+    offsets of its deals in (date, offset) order, so a company or person view is
+    a dictionary lookup plus two bisects for the date bounds. Requested values go
+    through lookup, which defaults to normalize (a client name resolves to the
+    entity its deals are stored under).
+
+    The bulk lives in flat sorted arrays; deals added since the last rebuild sit
+    in per-key lists that are merged into query results and folded in once
+    MERGE_THRESHOLD of them accumulate.
+    """
+
+    MERGE_THRESHOLD = 4096
+
+    def __init__(self, field: str, normalize: Callable[[Any], str],
+                 lookup: Optional[Callable[[Any], str]] = None):
+        self.field = field
+        self.normalize = normalize
+        self.lookup = lookup or normalize
+        self.ids: Dict[str, int] = {}
+        self._keys: List[str] = []
+        # Per offset: key id and date ordinal, plus the row count
+        self._rows = (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32), 0)
+        # (starts per key id, ordinals, offsets, rows posted, {key id: [(ordinal, offset)]} added since)
+        self._postings = (np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32),
+                          np.zeros(0, dtype=np.int64), 0, {})
+
+    @classmethod
+    def from_store(cls, store, field: str, normalize: Callable[[Any], str],
+                   lookup: Optional[Callable[[Any], str]] = None) -> 'PostingIndex':
+        index = cls(field, normalize, lookup)
+        keys = mapped_column(store, field, index._key_id)
+        index._rows = (keys, np.asarray(store.date_ordinals(), dtype=np.int32), len(keys))
+        index._rebuild()
+        return index
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _key_id(self, value) -> int:
+        key = self.normalize(value)
+        key_id = self.ids.get(key)
+        if key_id is None:
+            key_id = self.ids[key] = len(self.ids)
+        return key_id
+
+    def add(self, deals: List[Dict], offsets: List[int]):
+        """Post newly appended deals (offsets continue from the last indexed one)"""
+        if not deals:
+            return
+        keys, ordinals, n = self._rows
+        end = max(offsets) + 1
+        if end > len(keys):
+            capacity = max(end + 1024, end * 5 // 4)
+            grown_keys = np.zeros(capacity, dtype=np.int32)
+            grown_ordinals = np.zeros(capacity, dtype=np.int32)
+            grown_keys[:n], grown_ordinals[:n] = keys[:n], ordinals[:n]
+            keys, ordinals = grown_keys, grown_ordinals
+        recent = self._postings[4]
+        for offset, deal in zip(offsets, deals):
+            key_id = self._key_id(deal.get(self.field))
+            ordinal = date_to_ordinal(deal.get('date', ''))
+            keys[offset] = key_id
+            ordinals[offset] = ordinal
+            recent.setdefault(key_id, []).append((ordinal, offset))
+        self._rows = (keys, ordinals, end)
+        if end - self._postings[3] >= self.MERGE_THRESHOLD:
+            self._rebuild()
+
+    def _rebuild(self):
+        keys, ordinals, n = self._rows
+        order = np.lexsort((np.arange(n), ordinals[:n], keys[:n]))
+        counts = np.bincount(keys[:n], minlength=len(self.ids))
+        starts = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=starts[1:])
+        self._postings = (starts, ordinals[:n][order], order.astype(np.int64), n, {})
+
+    def offsets(self, value, lo: int = 0, hi: int = 2 ** 31 - 1) -> np.ndarray:
+        """Offsets of value's deals dated within [lo, hi] (ordinals), in (date, offset) order"""
+        key_id = self.ids.get(self.lookup(value))
+        if key_id is None:
+            return np.zeros(0, dtype=np.int64)
+        starts, ordinals, offsets, _, recent = self._postings
+        i = j = 0
+        if key_id + 1 < len(starts):
+            a, b = int(starts[key_id]), int(starts[key_id + 1])
+            # Bisect with int32 scalars, as in DateIndex
+            i = a + int(np.searchsorted(ordinals[a:b], np.int32(lo), side='left'))
+            j = a + int(np.searchsorted(ordinals[a:b], np.int32(hi), side='right'))
+        pending = [(o, off) for o, off in recent.get(key_id, ()) if lo <= o <= hi]
+        if not pending:
+            return offsets[i:j]
+        merged_offsets = np.concatenate([offsets[i:j], np.asarray([off for _, off in pending], dtype=np.int64)])
+        merged_ordinals = np.concatenate([ordinals[i:j], np.asarray([o for o, _ in pending], dtype=np.int32)])
+        return merged_offsets[np.lexsort((merged_offsets, merged_ordinals))]
+
+    def row_keys(self) -> np.ndarray:
+        """Key id of every indexed row, by offset"""
+        keys, _, n = self._rows
+        return keys[:n]
+
+    def keys(self) -> List[str]:
+        """Normalized keys by key id"""
+        # Ids are handed out in insertion order, so the dict's order is id order
+        if len(self._keys) != len(self.ids):
+            self._keys = list(self.ids)
+        return self._keys
+
+    def matches(self, offsets: np.ndarray, values: Iterable) -> np.ndarray:
+        """Mask over offsets (all below len of the indexed rows): whose field is one of values"""
+        keys = self._rows[0]
+        ids = [self.ids[k] for k in map(self.lookup, values) if k in self.ids]
+        return np.isin(keys[offsets], np.asarray(ids, dtype=np.int32))
+
+
+BUY_SIDES = ('BUY', 'B', 'P')
+SELL_SIDES = ('SELL', 'S')
+
+# Per-day counters kept by DailyRollups, in column order
+ROLLUP_COUNTS = ('deals', 'buy_deals', 'sell_deals', 'bse_deals', 'nse_deals')
+# Per-day traded value: gross, and buys minus sells
+ROLLUP_VALUES = ('total_value', 'net_value')
+
+
+def side_class(side) -> int:
+    """1 for a buy, 2 for a sell, 0 if the side is missing"""
+    side = str(side or '').strip().upper()
+    return 1 if side in BUY_SIDES else 2 if side in SELL_SIDES else 0
+
+
+def exchange_class(exchange) -> int:
+    """1 for BSE, 2 for NSE, 0 otherwise"""
+    exchange = str(exchange or '').strip().upper()
+    return 1 if exchange == 'BSE' else 2 if exchange == 'NSE' else 0
+
+
+def _key_id(ids: Dict[str, int], key: str) -> int:
+    found = ids.get(key)
+    if found is None:
+        found = ids[key] = len(ids)
+    return found
+
+
+def _count_unique(arrays: List[np.ndarray]) -> int:
+    return int(_sorted_unique(np.concatenate(arrays)).size) if arrays else 0
+
+
+class DailyRollups:
+    """
+    One row per deal date: deal, side and exchange counts, gross and net traded
+    value, and the distinct scrips and clients dealt (as sorted key ids). Stats
+    for a date window sum the rows between two bisects - a few thousand rows for
+    the whole history - instead of passing over every deal.
+
+    add() folds a batch into the rows it touches on a copy of the table and swaps
+    it in, so readers always see a consistent snapshot.
+    """
+
+    def __init__(self):
+        self.scrip_ids: Dict[str, int] = {}
+        self.client_ids: Dict[str, int] = {}
+        # (date ordinals, counts per ROLLUP_COUNTS, values per ROLLUP_VALUES, scrip ids per row, client ids per row)
+        self._state = (np.zeros(0, dtype=np.int32), np.zeros((0, len(ROLLUP_COUNTS)), dtype=np.int64),
+                       np.zeros((0, len(ROLLUP_VALUES)), dtype=np.float64), [], [])
+
+    @classmethod
+    def from_store(cls, store) -> 'DailyRollups':
+        rollups = cls()
+        ordinals = np.asarray(store.date_ordinals(), dtype=np.int32)
+        sides = mapped_column(store, 'side', side_class, np.int8)
+        exchanges = mapped_column(store, 'exchange', exchange_class, np.int8)
+        values = np.asarray(store.deal_values(), dtype=np.float64)
+        scrips = mapped_column(store, 'scripCode', lambda v: _key_id(rollups.scrip_ids, scrip_key(v)))
+        clients = mapped_column(store, 'clientEntity', lambda v: _key_id(rollups.client_ids, v))
+
+        order = np.argsort(ordinals, kind='stable')
+        sorted_ordinals = ordinals[order]
+        first = np.concatenate(([True], sorted_ordinals[1:] != sorted_ordinals[:-1])) if order.size else \
+            np.zeros(0, dtype=bool)
+        days = sorted_ordinals[first]
+        rows = np.empty(order.size, dtype=np.int64)
+        rows[order] = np.cumsum(first) - 1
+        m = days.size
+
+        counts = np.zeros((m, len(ROLLUP_COUNTS)), dtype=np.int64)
+        counts[:, 0] = np.bincount(rows, minlength=m)
+        counts[:, 1] = np.bincount(rows[sides == 1], minlength=m)
+        counts[:, 2] = np.bincount(rows[sides == 2], minlength=m)
+        counts[:, 3] = np.bincount(rows[exchanges == 1], minlength=m)
+        counts[:, 4] = np.bincount(rows[exchanges == 2], minlength=m)
+        sums = np.zeros((m, len(ROLLUP_VALUES)), dtype=np.float64)
+        sums[:, 0] = np.bincount(rows, weights=values, minlength=m)
+        signed = np.where(sides == 1, values, np.where(sides == 2, -values, 0.0))
+        sums[:, 1] = np.bincount(rows, weights=signed, minlength=m)
+
+        rollups._state = (days, counts, sums, cls._ids_per_row(rows, scrips, m), cls._ids_per_row(rows, clients, m))
+        return rollups
+
+    @staticmethod
+    def _ids_per_row(rows: np.ndarray, ids: np.ndarray, m: int) -> List[np.ndarray]:
+        """Sorted distinct ids of each row, from one sort of (row, id) pairs"""
+        pairs = _sorted_unique((rows << 32) | ids.astype(np.int64))
+        bounds = np.searchsorted(pairs >> 32, np.arange(m + 1))
+        distinct = (pairs & 0xFFFFFFFF).astype(np.int32)
+        return [distinct[bounds[r]:bounds[r + 1]] for r in range(m)]
+
+    def __len__(self) -> int:
+        return len(self._state[0])
+
+    def add(self, deals: Iterable[Dict]):
+        """Fold in newly inserted (normalized) deals"""
+        batch: Dict[int, Tuple[List[int], List[float], set, set]] = {}
+        for deal in deals:
+            ordinal = date_to_ordinal(deal.get('date', ''))
+            day = batch.get(ordinal)
+            if day is None:
+                day = batch[ordinal] = ([0] * len(ROLLUP_COUNTS), [0.0] * len(ROLLUP_VALUES), set(), set())
+            counts, values, scrips, clients = day
+            side = side_class(deal.get('side'))
+            exchange = exchange_class(deal.get('exchange'))
+            value = deal_value(deal)
+            counts[0] += 1
+            if side:
+                counts[side] += 1
+                values[1] += value if side == 1 else -value
+            if exchange:
+                counts[2 + exchange] += 1
+            values[0] += value
+            scrips.add(_key_id(self.scrip_ids, scrip_key(deal.get('scripCode'))))
+            clients.add(_key_id(self.client_ids, deal.get('clientEntity', '')))
+        if not batch:
+            return
+
+        ordinals, counts, values, scrips, clients = self._state
+        scrips, clients = list(scrips), list(clients)
+        new_days = sorted(o for o in batch if not self._has_row(ordinals, o))
+        if new_days:
+            at = np.searchsorted(ordinals, np.asarray(new_days, dtype=np.int32))
+            ordinals = np.insert(ordinals, at, new_days)
+            counts = np.insert(counts, at, 0, axis=0)
+            values = np.insert(values, at, 0.0, axis=0)
+            # Back to front so earlier positions stay valid
+            for position in reversed(at.tolist()):
+                scrips.insert(position, np.zeros(0, dtype=np.int32))
+                clients.insert(position, np.zeros(0, dtype=np.int32))
+        else:
+            counts, values = counts.copy(), values.copy()
+
+        for ordinal, (day_counts, day_values, day_scrips, day_clients) in batch.items():
+            r = int(np.searchsorted(ordinals, np.int32(ordinal)))
+            counts[r] += day_counts
+            values[r] += day_values
+            scrips[r] = np.union1d(scrips[r], np.fromiter(day_scrips, dtype=np.int32)).astype(np.int32)
+            clients[r] = np.union1d(clients[r], np.fromiter(day_clients, dtype=np.int32)).astype(np.int32)
+        self._state = (ordinals, counts, values, scrips, clients)
+
+    @staticmethod
+    def _has_row(ordinals: np.ndarray, ordinal: int) -> bool:
+        i = int(np.searchsorted(ordinals, np.int32(ordinal)))
+        return i < len(ordinals) and ordinals[i] == ordinal
+
+    def _window(self, lo: int, hi: int):
+        state = self._state
+        ordinals = state[0]
+        # Bisect with int32 scalars, as in DateIndex
+        i = int(np.searchsorted(ordinals, np.int32(lo), side='left'))
+        j = int(np.searchsorted(ordinals, np.int32(hi), side='right'))
+        return state, i, j
+
+    def summary(self, lo: int = 0, hi: int = 2 ** 31 - 1) -> Dict[str, Any]:
+        """Totals over the days dated within [lo, hi] (ordinals)"""
+        (ordinals, counts, values, scrips, clients), i, j = self._window(lo, hi)
+        totals = counts[i:j].sum(axis=0)
+        sums = values[i:j].sum(axis=0)
+        days = ordinals[i:j]
+        dated = days[days > 0]
+        # Every id was dealt on some day, so the whole table needs no union
+        whole = i == 0 and j == len(ordinals)
+        return {
+            'total_deals': int(totals[0]),
+            'buy_deals': int(totals[1]),
+            'sell_deals': int(totals[2]),
+            'bse_deals': int(totals[3]),
+            'nse_deals': int(totals[4]),
+            'total_value': round(float(sums[0]), 2),
+            'net_value': round(float(sums[1]), 2),
+            'unique_scrips': len(self.scrip_ids) if whole else _count_unique(scrips[i:j]),
+            'unique_clients': len(self.client_ids) if whole else _count_unique(clients[i:j]),
+            'trading_days': int(dated.size),
+            'date_range': {
+                'earliest': date.fromordinal(int(dated[0])).isoformat() if dated.size else None,
+                'latest': date.fromordinal(int(dated[-1])).isoformat() if dated.size else None,
+            },
+        }
+
+    def daily(self, lo: int = 0, hi: int = 2 ** 31 - 1) -> List[Dict[str, Any]]:
+        """The rollup rows dated within [lo, hi], oldest first"""
+        (ordinals, counts, values, scrips, clients), i, j = self._window(lo, hi)
+        rows = []
+        for r in range(i, j):
+            row: Dict[str, Any] = {'date': date.fromordinal(int(ordinals[r])).isoformat() if ordinals[r] else ''}
+            row.update(zip(ROLLUP_COUNTS, counts[r].tolist()))
+            row.update((name, round(v, 2)) for name, v in zip(ROLLUP_VALUES, values[r].tolist()))
+            row['unique_scrips'] = int(scrips[r].size)
+            row['unique_clients'] = int(clients[r].size)
+            rows.append(row)
+        return rows
+
+
+def type_key(deal_type) -> str:
+    """Form deal types are matched in: lower-cased, trimmed"""
+    return str(deal_type or '').strip().lower()
+
+
+def _quantity(value) -> float:
+    return value if isinstance(value, (int, float)) else parse_number(value)
+
+
+def _quantities(store) -> np.ndarray:
+    if store.engine == 'columnar':
+        return store.column('quantity').astype(np.float64)
+    return np.fromiter((_quantity(q) for q in store.values('quantity', 0)), dtype=np.float64, count=len(store))
+
+
+class DealColumns:
+    """
+    Per-deal columns the query filters test: date ordinal, traded value and
+    quantity, and small class codes for side, exchange and deal type. A predicate over any set
+    of candidate offsets is then one gather and compare per column instead of a
+    pass over deal dicts. add() grows copies and swaps them in, like SearchIndex.
+    """
+
+    def __init__(self):
+        self.type_ids: Dict[str, int] = {}
+        # (ordinals, values, quantities, sides, exchanges, types, row count)
+        self._state = (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float64), np.zeros(0, dtype=np.float64),
+                       np.zeros(0, dtype=np.int8), np.zeros(0, dtype=np.int8), np.zeros(0, dtype=np.int16), 0)
+
+    @classmethod
+    def from_store(cls, store) -> 'DealColumns':
+        columns = cls()
+        types = mapped_column(store, 'type', lambda v: _key_id(columns.type_ids, type_key(v)), np.int16)
+        columns._state = (
+            np.asarray(store.date_ordinals(), dtype=np.int32),
+            np.asarray(store.deal_values(), dtype=np.float64),
+            _quantities(store),
+            mapped_column(store, 'side', side_class, np.int8),
+            mapped_column(store, 'exchange', exchange_class, np.int8),
+            types,
+            len(types),
+        )
+        return columns
+
+    def __len__(self) -> int:
+        return self._state[6]
+
+    def state(self):
+        """(ordinals, values, quantities, sides, exchanges, types, row count) as one consistent snapshot"""
+        return self._state
+
+    def add(self, deals: List[Dict], offsets: List[int]):
+        """Record newly appended deals (offsets continue from the last recorded one)"""
+        if not deals:
+            return
+        *arrays, n = self._state
+        end = max(offsets) + 1
+        if end > len(arrays[0]):
+            capacity = max(end + 1024, end * 5 // 4)
+            grown = []
+            for arr in arrays:
+                out = np.zeros(capacity, dtype=arr.dtype)
+                out[:n] = arr[:n]
+                grown.append(out)
+            arrays = grown
+        ordinals, values, quantities, sides, exchanges, types = arrays
+        for offset, deal in zip(offsets, deals):
+            ordinals[offset] = date_to_ordinal(deal.get('date', ''))
+            values[offset] = deal_value(deal)
+            quantities[offset] = _quantity(deal.get('quantity', 0))
+            sides[offset] = side_class(deal.get('side'))
+            exchanges[offset] = exchange_class(deal.get('exchange'))
+            types[offset] = _key_id(self.type_ids, type_key(deal.get('type')))
+        # Slots past n are invisible to readers until this swap
+        self._state = (ordinals, values, quantities, sides, exchanges, types, end)
+
+
+# Metrics a TopIndex can rank deals by: index into DealColumns.state()
+TOP_METRICS = {'value': 1, 'quantity': 2}
+
+
+class TopIndex:
+    """
+    Deals ranked by one metric (traded value or quantity) within runs of one date,
+    exchange and side, each run sorted largest first. The top K of any window
+    reads the head of every run in it, keeps only the runs whose head reaches
+    the K-th largest head (no other run can hold a top-K deal) and heap-merges
+    those: O(days + K log K) however many deals the window holds.
+
+    Deals added since the last rebuild are ranked by a direct scan and folded
+    in once MERGE_THRESHOLD of them accumulate.
+    """
+
+    MERGE_THRESHOLD = 4096
+
+    def __init__(self, columns: DealColumns, metric: str = 'value'):
+        self.columns = columns
+        self.metric = metric
+        self._column = TOP_METRICS[metric]
+        self._rebuild()
+
+    def _rebuild(self):
+        state = self.columns.state()
+        ordinals, exchanges, sides, n = state[0], state[4], state[3], state[-1]
+        metric = state[self._column][:n]
+        ordinals = ordinals[:n]
+        classes = exchanges[:n].astype(np.int16) * 3 + sides[:n]
+        # Run key, then largest first, ties newest (highest offset) first
+        order = np.lexsort((-np.arange(n), -metric, classes, ordinals))
+        run_ordinals, run_classes = ordinals[order], classes[order]
+        heads = np.flatnonzero(np.concatenate((
+            [True], (run_ordinals[1:] != run_ordinals[:-1]) | (run_classes[1:] != run_classes[:-1])
+        ))) if n else np.zeros(0, dtype=np.int64)
+        # (offsets in run order, their metric, run ordinals, run classes, run bounds, row count)
+        self._state = (order, metric[order], run_ordinals[heads], run_classes[heads],
+                       np.append(heads, n), n)
+
+    def refresh(self):
+        """Fold in the deals DealColumns gained once enough accumulate (call after DealColumns.add)"""
+        if len(self.columns) - self._state[5] >= self.MERGE_THRESHOLD:
+            self._rebuild()
+
+    def top(self, k: int, lo: int = 0, hi: int = 2 ** 31 - 1, exchange: int = 0, side: int = 0) -> np.ndarray:
+        """Offsets of the k largest deals dated within [lo, hi], largest first (ties: newest first).
+
+        exchange and side are class codes (exchange_class / side_class); 0 matches any.
+        """
+        order, ranked, run_ordinals, run_classes, bounds, indexed = self._state
+        state = self.columns.state()
+        ordinals, sides, exchanges, n = state[0], state[3], state[4], state[-1]
+        metric = state[self._column]
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        # Runs of the window that pass the class filters
+        i = int(np.searchsorted(run_ordinals, np.int32(lo), 'left'))
+        j = int(np.searchsorted(run_ordinals, np.int32(min(hi, 2 ** 31 - 1)), 'right'))
+        runs = np.arange(i, j)
+        if exchange:
+            runs = runs[run_classes[runs] // 3 == exchange]
+        if side:
+            runs = runs[run_classes[runs] % 3 == side]
+        starts = bounds[runs]
+        heads = ranked[starts]
+        if runs.size > k:
+            kth = np.partition(heads, runs.size - k)[runs.size - k]
+            keep = heads >= kth
+            runs, starts, heads = runs[keep], starts[keep], heads[keep]
+
+        # Merge the surviving runs, keyed like the final order: larger, newer, later offset first
+        heap = [(-head, -int(run_ordinals[run]), -int(order[start]), int(start), int(bounds[run + 1]))
+                for head, run, start in zip(heads.tolist(), runs.tolist(), starts.tolist())]
+        heapq.heapify(heap)
+        found = []
+        while heap and len(found) < k:
+            _, neg_ordinal, neg_offset, position, end = heapq.heappop(heap)
+            found.append(-neg_offset)
+            position += 1
+            if position < end:
+                heapq.heappush(heap, (-float(ranked[position]), neg_ordinal, -int(order[position]), position, end))
+        found = np.asarray(found, dtype=np.int64)
+
+        if n > indexed:
+            tail = np.arange(indexed, n)
+            keep = (ordinals[tail] >= lo) & (ordinals[tail] <= hi)
+            if exchange:
+                keep &= exchanges[tail] == exchange
+            if side:
+                keep &= sides[tail] == side
+            found = np.concatenate((found, tail[keep]))
+            ranking = np.lexsort((-found, -ordinals[found].astype(np.int64), -metric[found]))
+            found = found[ranking][:k]
+        return found
+
+
+# Deal fields /api/bulk-deals/search matches against
+SEARCH_FIELDS = ('securityName', 'clientName')
+
+
+def search_key(name) -> str:
+    """Form names are indexed and queried in: lower-cased, without NULs (the name separator)"""
+    return str(name or '').lower().replace('\0', '')
+
+
+def _sorted_unique(values: np.ndarray) -> np.ndarray:
+    """np.unique by sorting (NumPy's hash-based unique is slower on these int64 keys)"""
+    values = np.sort(values)
+    if values.size < 2:
+        return values
+    return values[np.concatenate(([True], values[1:] != values[:-1]))]
+
+
+def _trigram_codes(encoded: bytes) -> np.ndarray:
+    """Codes of the byte trigrams of a query (b0 << 16 | b1 << 8 | b2)"""
+    b = np.frombuffer(encoded, dtype=np.uint8).astype(np.int64)
+    return _sorted_unique((b[:-2] << 16) | (b[1:-1] << 8) | b[2:])
+
+
+class SearchIndex:
+    """
+    Substring search over security and client names, ranked by recency then deal value.
+
+    Distinct names are indexed by byte trigram: sorted trigram codes, each with the
+    sorted ids of the names containing it. A query intersects the posting lists of
+    its trigrams and only those candidate names get a real substring test. Deals are
+    reached through per-name offset posting lists; when the candidates cover a large
+    share of all deals, the date index is walked newest-first until a page is full.
+
+    Names and deals added since the last rebuild sit in small tails that queries
+    scan directly, folded into the sorted arrays once they pass MERGE_THRESHOLD.
+    """
+
+    MERGE_THRESHOLD = 4096
+    # Candidate deals beyond which walking newest-first beats gathering every posting
+    GATHER_LIMIT = 20000
+    MAX_BLOCK = 65536
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
+        # (trigram codes, starts into name ids, name ids, names indexed)
+        self._grams = (np.zeros(0, dtype=np.int64), np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32), 0)
+        # (security name id, client name id, date ordinal, value) per offset, and the row count
+        self._deals = (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32),
+                       np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float64), 0)
+        # (starts into offsets per name id, offsets, deals posted)
+        self._postings = (np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64), 0)
+
+    @classmethod
+    def from_store(cls, store) -> 'SearchIndex':
+        index = cls()
+        security = mapped_column(store, 'securityName', index._name_id)
+        client = mapped_column(store, 'clientName', index._name_id)
+        index._deals = (security, client, np.asarray(store.date_ordinals(), dtype=np.int32),
+                        np.asarray(store.deal_values(), dtype=np.float64), len(security))
+        index._rebuild_grams()
+        index._rebuild_postings()
+        return index
+
+    def __len__(self) -> int:
+        return self._deals[4]
+
+    def _name_id(self, name) -> int:
+        key = search_key(name)
+        name_id = self.ids.get(key)
+        if name_id is None:
+            name_id = self.ids[key] = len(self.names)
+            self.names.append(key)
+        return name_id
+
+    def add(self, deals: List[Dict], offsets: List[int]):
+        """Index newly appended deals (offsets continue from the last indexed one)"""
+        if not deals:
+            return
+        security, client, ordinals, values, n = self._deals
+        end = max(offsets) + 1
+        if end > len(security):
+            capacity = max(end + 1024, end * 5 // 4)
+
+            def grown(arr):
+                out = np.zeros(capacity, dtype=arr.dtype)
+                out[:n] = arr[:n]
+                return out
+
+            security, client, ordinals, values = grown(security), grown(client), grown(ordinals), grown(values)
+        for offset, deal in zip(offsets, deals):
+            security[offset] = self._name_id(deal.get('securityName'))
+            client[offset] = self._name_id(deal.get('clientName'))
+            ordinals[offset] = date_to_ordinal(deal.get('date', ''))
+            values[offset] = deal_value(deal)
+        # Slots past n are invisible to readers until this swap
+        self._deals = (security, client, ordinals, values, end)
+
+        if len(self.names) - self._grams[3] >= self.MERGE_THRESHOLD:
+            self._rebuild_grams()
+        if end - self._postings[2] >= self.MERGE_THRESHOLD:
+            self._rebuild_postings()
+
+    def _rebuild_grams(self):
+        """Trigram posting lists over every name, vectorized over one byte blob"""
+        count = len(self.names)
+        # Two NUL terminators per name: 1- and 2-byte suffixes still form a trigram
+        encoded = [name.encode('utf-8') + b'\0\0' for name in self.names[:count]]
+        if not encoded:
+            return
+        b = np.frombuffer(b''.join(encoded), dtype=np.uint8).astype(np.int64)
+        owner = np.repeat(np.arange(count, dtype=np.int64), [len(e) for e in encoded])
+        codes = (b[:-2] << 16) | (b[1:-1] << 8) | b[2:]
+        valid = b[:-2] != 0
+        keys = _sorted_unique((codes[valid] << 32) | owner[:-2][valid])
+        gram_of = keys >> 32
+        starts = np.flatnonzero(np.concatenate(([True], gram_of[1:] != gram_of[:-1])))
+        grams = gram_of[starts]
+        starts = np.append(starts, len(keys)).astype(np.int64)
+        self._grams = (grams, starts, (keys & 0xFFFFFFFF).astype(np.int32), count)
+
+    def _rebuild_postings(self):
+        """Offsets of every deal per name id (a deal is posted under both its names)"""
+        security, client, _, _, n = self._deals
+        name_ids = np.concatenate([security[:n], client[:n]]).astype(np.int64)
+        offsets = np.concatenate([np.arange(n, dtype=np.int64)] * 2)
+        order = np.lexsort((offsets, name_ids))
+        counts = np.bincount(name_ids, minlength=len(self.names))
+        starts = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=starts[1:])
+        self._postings = (starts, offsets[order], n)
+
+    def _candidate_mask(self, query: str) -> Tuple[np.ndarray, bool]:
+        """(mask over name ids that may contain query, whether the mask is exact)"""
+        grams, starts, gram_names, indexed = self._grams
+        mask = np.zeros(len(self.names), dtype=bool)
+        encoded = query.encode('utf-8')
+        if len(encoded) < 3:
+            # Every occurrence starts some trigram: take the whole code range with that prefix
+            shift = 8 * (3 - len(encoded))
+            lo = int.from_bytes(encoded, 'big') << shift
+            i = int(np.searchsorted(grams, lo, side='left'))
+            j = int(np.searchsorted(grams, lo + (1 << shift) - 1, side='right'))
+            mask[gram_names[starts[i]:starts[j]]] = True
+        else:
+            codes = _trigram_codes(encoded)
+            slots = np.searchsorted(grams, codes)
+            if np.all(slots < len(grams)) and np.array_equal(grams[np.minimum(slots, len(grams) - 1)], codes):
+                # Probe the shortest posting list into the others (all sorted by name id)
+                lists = sorted((gram_names[starts[k]:starts[k + 1]] for k in slots.tolist()), key=len)
+                found = lists[0]
+                for postings in lists[1:]:
+                    at = np.minimum(np.searchsorted(postings, found), len(postings) - 1)
+                    kept = found[postings[at] == found]
+                    # Candidates are verified anyway: stop once a probe barely prunes
+                    pruned = found.size - kept.size
+                    found = kept
+                    if found.size == 0 or pruned * 8 < found.size:
+                        break
+                mask[found] = True
+        # Names added since the last rebuild: tested directly
+        for name_id in range(indexed, len(self.names)):
+            mask[name_id] = query in self.names[name_id]
+        # A trigram hit for every trigram of a longer query doesn't make it a substring
+        return mask, len(encoded) <= 3
+
+    def _confirmer(self, query: str, security: np.ndarray,
+                   client: np.ndarray) -> Tuple[np.ndarray, Callable[[np.ndarray], np.ndarray]]:
+        """(candidate name mask, function keeping the offsets whose security or client name contains query)"""
+        mask, exact = self._candidate_mask(query)
+        names = self.names
+        checked = np.zeros(len(mask), dtype=bool) if not exact else None
+
+        def confirmed(offsets: np.ndarray) -> np.ndarray:
+            hits = offsets[mask[security[offsets]] | mask[client[offsets]]]
+            if exact or hits.size == 0:
+                return hits
+            # Substring-test each candidate name once per query, dropping the false ones
+            touched = np.concatenate([security[hits], client[hits]])
+            for name_id in np.unique(touched[~checked[touched]]).tolist():
+                mask[name_id] = query in names[name_id]
+                checked[name_id] = True
+            return hits[mask[security[hits]] | mask[client[hits]]]
+
+        return mask, confirmed
+
+    @staticmethod
+    def _candidate_postings(starts: np.ndarray, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray, int]:
+        """(posting slots of the candidate names, their lengths, total deals posted under them)"""
+        known = np.flatnonzero(mask[:len(starts) - 1])
+        lengths = starts[known + 1] - starts[known]
+        return known, lengths, int(lengths.sum())
+
+    def estimate(self, query: str) -> int:
+        """Upper bound on the deals whose names contain query, from the trigram postings alone"""
+        query = search_key(query)
+        if not query:
+            return len(self)
+        starts, _, posted_n = self._postings
+        mask, _ = self._candidate_mask(query)
+        return self._candidate_postings(starts, mask)[2] + len(self) - posted_n
+
+    def offsets(self, query: str) -> np.ndarray:
+        """Every offset whose security or client name contains query, ascending"""
+        starts, posted, posted_n = self._postings
+        security, client, _, _, n = self._deals
+        query = search_key(query)
+        if not query:
+            return np.arange(n, dtype=np.int64)
+        mask, confirmed = self._confirmer(query, security, client)
+        known, lengths, total = self._candidate_postings(starts, mask)
+        gather = np.repeat(starts[known] - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        found = np.concatenate([posted[gather], np.arange(posted_n, n, dtype=np.int64)])
+        return confirmed(_sorted_unique(found))
+
+    def filter(self, query: str, offsets: np.ndarray) -> np.ndarray:
+        """The offsets (all below len(self)) whose security or client name contains query"""
+        security, client, _, _, _ = self._deals
+        query = search_key(query)
+        if not query:
+            return offsets
+        return self._confirmer(query, security, client)[1](offsets)
+
+    def search(self, query: str, limit: int, date_index: 'DateIndex') -> List[int]:
+        """Offsets of up to limit deals whose security or client name contains query"""
+        query = search_key(query)
+        if not query or limit <= 0:
+            return []
+        # Capture order matters with a concurrent add(): postings, then deals, then names
+        starts, posted, posted_n = self._postings
+        security, client, ordinals, values, n = self._deals
+        mask, confirmed = self._confirmer(query, security, client)
+
+        def ranked(offsets: np.ndarray, k: int) -> np.ndarray:
+            """At least the top k of offsets by (date, value) descending, in that order"""
+            if offsets.size > k:
+                # Partition on date first; deals tied with the k-th date all stay in
+                dates = ordinals[offsets]
+                kth = np.partition(dates, dates.size - k)[dates.size - k]
+                offsets = offsets[dates >= kth]
+            offsets = _sorted_unique(offsets)
+            return offsets[np.lexsort((-values[offsets], -ordinals[offsets]))]
+
+        known, lengths, total = self._candidate_postings(starts, mask)
+
+        if total <= self.GATHER_LIMIT:
+            # Few candidates: gather their posting lists plus unposted deals, verify in rank order
+            gather = np.repeat(starts[known] - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+            tail = np.arange(posted_n, n, dtype=np.int64)
+            tail = tail[mask[security[posted_n:n]] | mask[client[posted_n:n]]]
+            found = np.concatenate([posted[gather], tail])
+            # A deal is posted under both names, so rank twice the page; widen if verification drops many
+            k = 2 * limit
+            while True:
+                top = ranked(found, k)
+                result = confirmed(top)
+                if result.size >= limit or k >= found.size:
+                    return result[:limit].tolist()
+                k *= 4
+
+        # Broad query: newest deals first, stopping once the page and its last date are complete
+        by_date = date_index.sorted_offsets()
+        pages: List[np.ndarray] = []
+        count = 0
+        kth = None
+        end = len(by_date)
+        block = max(4 * limit, 256)
+        while end > 0:
+            offsets = by_date[max(0, end - block):end][::-1]
+            end -= block
+            block = min(block * 2, self.MAX_BLOCK)
+            offsets = offsets[offsets < n]
+            if kth is not None and offsets.size and ordinals[offsets[0]] < kth:
+                break
+            hits = confirmed(offsets)
+            pages.append(hits)
+            count += hits.size
+            if kth is None and count >= limit:
+                kth = ordinals[np.concatenate(pages)[limit - 1]]
+        if not count:
+            return []
+        return ranked(np.concatenate(pages), limit)[:limit].tolist()
+
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def fuzzy_text(name) -> bytes:
+    """Name as matched by FuzzyNameIndex: lower-case words of letters and digits, each padded
+    with spaces so word starts and ends form trigrams of their own"""
+    words = _NON_WORD.sub(' ', str(name or '').lower()).split()
+    return (' ' + '  '.join(words) + ' ').encode('ascii') if words else b''
+
+
+class FuzzyNameIndex:
+    """
+    Typo-tolerant lookup over a set of distinct names (clients or securities: tens
+    of thousands, not one entry per deal). Names are indexed by the trigrams of
+    their space-padded words; a query counts, per name, how many of its own
+    trigrams the name shares with one np.bincount over the query's posting lists.
+    "jhunjunwala" still shares 9 of its 11 trigrams with "RAKESH JHUNJHUNWALA".
+
+    The score averages coverage (shared / query trigrams: is the query in the name)
+    and similarity (shared / union: is the name about as long as the query); equal
+    scores rank by deal count. Immutable: the database builds a new one when its
+    generation moves on.
+    """
+
+    def __init__(self, names: List[str], counts: Iterable[int]):
+        self.names = names
+        self.counts = np.asarray(list(counts), dtype=np.int64)
+        encoded = [fuzzy_text(name) for name in names]
+        lengths = np.fromiter((len(e) for e in encoded), dtype=np.int64, count=len(encoded))
+        if not lengths.sum():
+            self._grams = (np.zeros(0, dtype=np.int64), np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32))
+            self.sizes = np.zeros(len(names), dtype=np.int64)
+            return
+        b = np.frombuffer(b''.join(encoded), dtype=np.uint8).astype(np.int64)
+        owner = np.repeat(np.arange(len(names), dtype=np.int64), lengths)
+        codes = (b[:-2] << 16) | (b[1:-1] << 8) | b[2:]
+        # A trigram must not straddle two names
+        valid = owner[:-2] == owner[2:]
+        keys = _sorted_unique((codes[valid] << 32) | owner[:-2][valid])
+        gram_of = keys >> 32
+        name_of = (keys & 0xFFFFFFFF).astype(np.int32)
+        starts = np.flatnonzero(np.concatenate(([True], gram_of[1:] != gram_of[:-1])))
+        # (trigram codes, starts into name ids, name ids)
+        self._grams = (gram_of[starts], np.append(starts, len(keys)).astype(np.int64), name_of)
+        # Distinct trigrams per name
+        self.sizes = np.bincount(name_of, minlength=len(names))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def search(self, query: str, limit: int = 10, min_coverage: float = 0.3) -> List[Tuple[int, float]]:
+        """(name id, score in [0, 1]) of the best matches, best first, among names sharing at
+        least min_coverage of the query's trigrams"""
+        text = fuzzy_text(query)
+        if len(text) < 3 or not len(self.names):
+            return []
+        grams, starts, name_ids = self._grams
+        wanted = _trigram_codes(text)
+        at = np.searchsorted(grams, wanted)
+        found = at < grams.size
+        found[found] = grams[at[found]] == wanted[found]
+        at = at[found]
+        if not at.size:
+            return []
+        shared = np.bincount(np.concatenate([name_ids[starts[i]:starts[i + 1]] for i in at.tolist()]),
+                             minlength=len(self.names))
+        candidates = np.flatnonzero(shared >= max(min_coverage * wanted.size, 1))
+        if not candidates.size:
+            return []
+        hits = shared[candidates].astype(np.float64)
+        scores = (hits / wanted.size + hits / (wanted.size + self.sizes[candidates] - hits)) / 2
+        order = np.lexsort((-self.counts[candidates], -scores))[:limit]
+        return [(int(candidates[i]), round(float(scores[i]), 4)) for i in order.tolist()]
@@ -0,0 +1,134 @@
+"""
+Bulk Deals Day-File Ingestion
+Streams the per-day caches written by bulk_deals_backfill.py and scheduler.py
+(data/bulk-deals/bulk_deals_YYYY-MM-DD.json, scraper schema) into the main
+BulkDealsDatabase, so /api/bulk-deals?date= is answered from its date index.
+
+Usage (from python-services directory):
+
+    python deal_ingest.py            # ingest new or changed day files
+    python deal_ingest.py --force    # re-read every day file (dedup keeps it idempotent)
+"""
+
+import argparse
+import json
+import os
+import re
+from typing import Dict, List, Optional
+
+from deal_store import normalize_date, parse_float, parse_number
+
+DAY_FILE_PATTERN = re.compile(r'^bulk_deals_(\d{4}-\d{2}-\d{2})\.json$')
+
+# {filename: [size, mtime_ns]} of day files already ingested
+INGEST_STATE_FILENAME = 'ingested_day_files.json'
+
+BUY_CODES = ('BUY', 'B', 'P')
+
+
+def scraped_to_deal(row: Dict, day: str = '') -> Dict:
+    """Map a BulkDealsScraper row (scrip_code, trade_price, deal_type...) to the database schema"""
+    if 'scripCode' in row:
+        return dict(row)
+    side = str(row.get('deal_type', '') or '').strip().upper()
+    quantity = row.get('quantity', 0)
+    price = row.get('trade_price', row.get('price', 0))
+    return {
+        'date': normalize_date(row.get('deal_date') or row.get('date') or day),
+        'scripCode': str(row.get('scrip_code', '') or '').strip(),
+        'securityName': str(row.get('security_name', '') or '').strip(),
+        'clientName': str(row.get('client_name', '') or '').strip(),
+        'side': 'BUY' if side in BUY_CODES else 'SELL',
+        'quantity': quantity if isinstance(quantity, int) else parse_number(quantity),
+        'price': price if isinstance(price, float) else parse_float(price),
+        'type': 'bulk',
+        'exchange': str(row.get('exchange', '') or '').upper(),
+        'remarks': str(row.get('remarks', '') or ''),
+    }
+
+
+def deal_to_scraped(deal: Dict) -> Dict:
+    """Database deal in the scraper schema /api/bulk-deals has always returned"""
+    return {
+        'exchange': deal.get('exchange', ''),
+        'date': deal.get('date', ''),
+        'deal_date': deal.get('date', ''),
+        'scrip_code': deal.get('scripCode', ''),
+        'security_name': deal.get('securityName', ''),
+        'client_name': deal.get('clientName', ''),
+        'deal_type': deal.get('side', ''),
+        'quantity': deal.get('quantity', 0),
+        'trade_price': deal.get('price', 0),
+        'remarks': deal.get('remarks', ''),
+    }
+
+
+def read_day_file(path: str) -> List[Dict]:
+    """Deals of one day file in the database schema"""
+    match = DAY_FILE_PATTERN.match(os.path.basename(path))
+    day = match.group(1) if match else ''
+    with open(path, 'r', encoding='utf-8') as f:
+        payload = json.load(f)
+    rows = payload.get('deals', []) if isinstance(payload, dict) else payload
+    return [scraped_to_deal(row, day) for row in rows]
+
+
+def _load_state(path: str) -> Dict[str, List[int]]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(path: str, state: Dict[str, List[int]]):
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def ingest_day_files(db, data_dir: Optional[str] = None, force: bool = False) -> int:
+    """Add deals from day files that are new or changed since the last run; returns deals added"""
+    data_dir = data_dir or db.data_dir
+    state_path = os.path.join(data_dir, INGEST_STATE_FILENAME)
+    state = {} if force else _load_state(state_path)
+
+    added = 0
+    files = 0
+    for name in sorted(os.listdir(data_dir)):
+        if not DAY_FILE_PATTERN.match(name):
+            continue
+        path = os.path.join(data_dir, name)
+        st = os.stat(path)
+        signature = [st.st_size, st.st_mtime_ns]
+        if state.get(name) == signature:
+            continue
+        try:
+            deals = read_day_file(path)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Skipping unreadable day file {name}: {e}")
+            continue
+        # One file at a time keeps memory flat over a multi-year backfill
+        added += db.add_deals(deals) if deals else 0
+        state[name] = signature
+        files += 1
+
+    if files:
+        _save_state(state_path, state)
+        print(f"📥 Ingested {files} day files ({added} new deals)")
+    return added
+
+
+def main():
+    from bulk_deals_database import open_database
+
+    parser = argparse.ArgumentParser(description="Ingest per-day bulk deals caches into the database")
+    parser.add_argument('--data-dir', default=None, help="Day file directory (default: the database's)")
+    parser.add_argument('--force', action='store_true', help="Re-read every day file")
+    args = parser.parse_args()
+
+    ingest_day_files(open_database(), args.data_dir, force=args.force)
+
+
+if __name__ == '__main__':
+    main()
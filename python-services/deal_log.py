@@ -0,0 +1,150 @@
+"""
+Bulk Deals Append-Only Log
+New deals are appended as one JSON line each instead of rewriting the whole
+database file; compaction periodically folds the log into the JSON snapshot.
+
+The log doubles as the cross-process change feed. A small generation file
+next to it holds {"generation": n, "epoch": e}: every append bumps the
+generation, every compaction rotates the log to <log>.prev and bumps the
+epoch. A reader remembers (epoch, byte offset) and reads only what was
+appended since, so other workers, daily_update.py and the Next.js routes
+apply deltas instead of reloading the database.
+"""
+
+import json
+import os
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows (schedule_daily_update.bat) - single writer assumed
+    fcntl = None
+
+
+class DealLog:
+    """Append-only JSON-lines log of deals added since the last snapshot"""
+
+    def __init__(self, path: str, lock_path: str):
+        self.path = path
+        self.lock_path = lock_path
+        self.previous_path = path + '.prev'
+        self.generation_path = path + '.generation'
+
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        """Exclusive cross-process lock shared by appenders and compaction"""
+        with open(self.lock_path, 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def append(self, deals: List[Dict]):
+        """Append deals and fsync so they survive a worker crash"""
+        if not deals:
+            return
+        lines = ''.join(json.dumps(d, default=str, ensure_ascii=False) + '\n' for d in deals)
+        with self.lock():
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            state = self.position()
+            self._write_position(state['generation'] + 1, state['epoch'])
+
+    def position(self) -> Dict[str, int]:
+        """Current {"generation", "epoch"} of the feed"""
+        try:
+            with open(self.generation_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            return {'generation': int(state['generation']), 'epoch': int(state['epoch'])}
+        except (OSError, ValueError, KeyError, TypeError):
+            return {'generation': 0, 'epoch': 0}
+
+    def _write_position(self, generation: int, epoch: int):
+        tmp_path = self.generation_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'generation': generation, 'epoch': epoch}, f)
+        os.replace(tmp_path, self.generation_path)
+
+    def stamp(self) -> Optional[Tuple[int, int]]:
+        """Cheap change check: (mtime_ns, inode) of the generation file"""
+        try:
+            st = os.stat(self.generation_path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_ino
+
+    @staticmethod
+    def _read_lines(path: str, offset: int) -> Tuple[List[Dict], int]:
+        """Complete lines after byte offset, and the offset just past the last one"""
+        try:
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except OSError:
+            return [], offset
+        end = data.rfind(b'\n') + 1
+        deals = []
+        for line in data[:end].splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                deals.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        return deals, offset + end
+
+    def read_since(self, epoch: int, offset: int) -> Optional[Tuple[List[Dict], int, int]]:
+        """(deals, epoch, offset) appended after a reader's position; callers hold lock().
+
+        None if the reader missed more than one compaction and must reload.
+        """
+        current = self.position()['epoch']
+        if epoch == current:
+            deals, offset = self._read_lines(self.path, offset)
+            return deals, current, offset
+        if epoch == current - 1:
+            previous, _ = self._read_lines(self.previous_path, offset)
+            deals, offset = self._read_lines(self.path, 0)
+            return previous + deals, current, offset
+        return None
+
+    def read(self) -> List[Dict]:
+        """All logged deals in append order; a torn trailing line is ignored"""
+        if not os.path.exists(self.path):
+            return []
+        deals = []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    deals.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return deals
+
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def rotate(self):
+        """Start an empty log (the old one becomes <log>.prev) in a new epoch.
+
+        Callers must hold lock() and have snapshotted the log's contents.
+        """
+        if os.path.exists(self.path):
+            os.replace(self.path, self.previous_path)
+        with open(self.path, 'w', encoding='utf-8'):
+            pass
+        state = self.position()
+        self._write_position(state['generation'] + 1, state['epoch'] + 1)
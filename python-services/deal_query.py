@@ -0,0 +1,209 @@
+"""
+Bulk Deals Query Engine
+One filter API over the in-memory indexes: date bounds, exchange, side, deal
+type, scrip codes, client, name text, traded value bounds and a sort order.
+
+The planner sizes every index that can produce candidates (date range, scrip
+and client posting lists, name trigrams), drives the query from the smallest,
+intersects any other index list of comparable size, and applies the remaining
+conditions as vectorized predicates over DealColumns. Only the page of deals
+that is returned is ever materialized.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from deal_indexes import (
+    DateIndex, DealColumns, PostingIndex, SearchIndex, exchange_class, side_class, type_key,
+)
+
+MAX_ORDINAL = 2 ** 31 - 1
+
+# sort parameter: field, optionally prefixed with '-' for descending
+SORT_FIELDS = ('date', 'value')
+DEFAULT_SORT = '-date'
+
+# Another index list is intersected with the driver's candidates when it is at most
+# this many times larger; beyond that, testing its condition per candidate is cheaper
+INTERSECT_FACTOR = 4
+
+
+def parse_exchange(value: Optional[str]) -> Optional[str]:
+    """Exchange request parameter, upper-cased (None when absent); raises ValueError if unknown"""
+    exchange = (value or '').strip().upper() or None
+    if exchange and not exchange_class(exchange):
+        raise ValueError("exchange must be BSE or NSE")
+    return exchange
+
+
+def parse_side(value: Optional[str]) -> Optional[str]:
+    """Side request parameter, upper-cased (None when absent); raises ValueError if unknown"""
+    side = (value or '').strip().upper() or None
+    if side and not side_class(side):
+        raise ValueError("side must be BUY or SELL")
+    return side
+
+
+class DealQuery:
+    """Filters, sort and page of a deal query; every filter is optional"""
+
+    def __init__(self, start: Optional[str] = None, end: Optional[str] = None, exchange: Optional[str] = None,
+                 side: Optional[str] = None, deal_type: Optional[str] = None, scrips: Tuple[str, ...] = (),
+                 client: Optional[str] = None, text: Optional[str] = None, min_value: Optional[float] = None,
+                 max_value: Optional[float] = None, sort: str = DEFAULT_SORT, limit: int = 100, offset: int = 0):
+        self.start, self.end = start, end
+        self.exchange = exchange
+        self.side = side
+        self.deal_type = deal_type
+        self.scrips = scrips
+        self.client = client
+        self.text = text
+        self.min_value = min_value
+        self.max_value = max_value
+        self.sort_field = sort.lstrip('-')
+        self.descending = sort.startswith('-')
+        self.limit = limit
+        self.offset = offset
+
+    @classmethod
+    def from_args(cls, args, limit: int) -> 'DealQuery':
+        """From request args (a MultiDict), with the page size already clamped by the caller.
+
+        Raises ValueError describing the first invalid parameter.
+        """
+        exchange = parse_exchange(args.get('exchange'))
+        side = parse_side(args.get('side'))
+        sort = (args.get('sort') or DEFAULT_SORT).strip()
+        if sort.lstrip('-') not in SORT_FIELDS:
+            raise ValueError(f"sort must be one of: {', '.join(SORT_FIELDS)} (prefix '-' for descending)")
+        scrips = tuple(code.strip() for value in args.getlist('scrip') for code in value.split(',') if code.strip())
+        try:
+            offset = int(args.get('offset') or 0)
+            min_value = float(args['min_value']) if args.get('min_value') else None
+            max_value = float(args['max_value']) if args.get('max_value') else None
+        except ValueError:
+            raise ValueError("offset, min_value and max_value must be numbers")
+        return cls(args.get('start') or None, args.get('end') or None, exchange=exchange, side=side,
+                   deal_type=(args.get('type') or '').strip() or None, scrips=scrips,
+                   client=(args.get('client') or '').strip() or None,
+                   text=(args.get('q') or '').strip() or None, min_value=min_value, max_value=max_value,
+                   sort=sort, limit=limit, offset=max(offset, 0))
+
+
+class QueryPlanner:
+    """Plans and runs a DealQuery over one database's indexes"""
+
+    def __init__(self, date_index: DateIndex, scrip_index: PostingIndex, client_index: PostingIndex,
+                 search_index: SearchIndex, columns: DealColumns):
+        self.date_index = date_index
+        self.scrip_index = scrip_index
+        self.client_index = client_index
+        self.search_index = search_index
+        self.columns = columns
+
+    def _access_paths(self, query: DealQuery, lo: int, hi: int, n: int) -> List[Tuple[str, int, Any, bool]]:
+        """(index, candidate estimate, list or loader of sorted offsets, whether the list is date-bounded)"""
+        paths = []
+        if lo > 0 or hi < MAX_ORDINAL:
+            paths.append(('date', self.date_index.count_between(lo, hi),
+                          lambda: np.sort(self.date_index.offsets_between(lo, hi)), True))
+        if query.scrips:
+            # Posting lists are cheap to cut to the date range, so they are sized exactly
+            # (a code listed twice, or in two spellings, must not repeat its deals)
+            offsets = np.unique(np.concatenate([self.scrip_index.offsets(code, lo, hi) for code in query.scrips]))
+            paths.append(('scrip', offsets.size, offsets, True))
+        if query.client:
+            offsets = np.sort(self.client_index.offsets(query.client, lo, hi))
+            paths.append(('client', offsets.size, offsets, True))
+        if query.text:
+            paths.append(('trigram', self.search_index.estimate(query.text),
+                          lambda: self.search_index.offsets(query.text), False))
+        paths.append(('scan', n, lambda: np.arange(n, dtype=np.int64), False))
+        return paths
+
+    def run(self, query: DealQuery, lo: int = 0, hi: int = MAX_ORDINAL) -> Tuple[np.ndarray, int, Dict[str, Any]]:
+        """(offsets of the requested page in sort order, total matches, plan description).
+
+        lo/hi are the query's date bounds as ordinals.
+        """
+        # DealColumns is updated after every other index, so its rows are indexed everywhere
+        ordinals, values, _, sides, exchanges, types, n = self.columns.state()
+
+        def load(source) -> np.ndarray:
+            offsets = source() if callable(source) else source
+            return offsets[offsets < n]
+
+        paths = sorted(self._access_paths(query, lo, hi, n), key=lambda path: path[1])
+        driver, _, source, date_bounded = paths[0]
+        candidates = load(source)
+        plan: Dict[str, Any] = {
+            'driver': driver,
+            'estimates': {name: size for name, size, _, _ in paths if name != 'scan'},
+            'intersected': [],
+            'filters': [],
+        }
+
+        applied = {driver}
+        for name, size, source, bounded in paths[1:]:
+            if name == 'scan' or size > INTERSECT_FACTOR * max(candidates.size, 1):
+                continue
+            # Both lists are sorted and duplicate-free
+            candidates = np.intersect1d(candidates, load(source), assume_unique=True)
+            date_bounded = date_bounded or bounded
+            applied.add(name)
+            plan['intersected'].append(name)
+
+        # Remaining conditions: one vectorized mask per condition over the surviving candidates
+        conditions = []
+        if (lo > 0 or hi < MAX_ORDINAL) and not date_bounded:
+            # Ordinal 0 (unparseable date) never matches a range, as in DateIndex
+            conditions.append(('date', lambda c: (ordinals[c] >= max(lo, 1)) & (ordinals[c] <= hi)))
+        if query.exchange:
+            exchange = exchange_class(query.exchange)
+            conditions.append(('exchange', lambda c: exchanges[c] == exchange))
+        if query.side:
+            side = side_class(query.side)
+            conditions.append(('side', lambda c: sides[c] == side))
+        if query.deal_type:
+            type_id = self.columns.type_ids.get(type_key(query.deal_type), -1)
+            conditions.append(('type', lambda c: types[c] == type_id))
+        if query.min_value is not None:
+            conditions.append(('min_value', lambda c: values[c] >= query.min_value))
+        if query.max_value is not None:
+            conditions.append(('max_value', lambda c: values[c] <= query.max_value))
+        if query.scrips and 'scrip' not in applied:
+            conditions.append(('scrip', lambda c: self.scrip_index.matches(c, query.scrips)))
+        if query.client and 'client' not in applied:
+            conditions.append(('client', lambda c: self.client_index.matches(c, [query.client])))
+        for name, condition in conditions:
+            candidates = candidates[condition(candidates)] if candidates.size else candidates
+            plan['filters'].append(name)
+        # Name text last: it may substring-test candidate names
+        if query.text and 'trigram' not in applied:
+            candidates = self.search_index.filter(query.text, candidates)
+            plan['filters'].append('trigram')
+
+        plan['candidates'] = int(candidates.size)
+        page = self._page(candidates, ordinals, values, query)
+        return page, int(candidates.size), plan
+
+    @staticmethod
+    def _page(offsets: np.ndarray, ordinals: np.ndarray, values: np.ndarray, query: DealQuery) -> np.ndarray:
+        """offsets[offset:offset + limit] in sort order, ties broken by date then insertion order"""
+        k = query.offset + query.limit
+        if offsets.size == 0 or query.offset >= offsets.size:
+            return offsets[:0]
+        sign = -1 if query.descending else 1
+        primary = ordinals[offsets] if query.sort_field == 'date' else values[offsets]
+        if offsets.size > 4 * k:
+            # Only the top k can be on the page: partition on the sort key, keeping ties with the k-th
+            keyed = primary * sign
+            kth = np.partition(keyed, k - 1)[k - 1]
+            keep = keyed <= kth
+            offsets, primary = offsets[keep], primary[keep]
+        if query.sort_field == 'date':
+            order = np.lexsort((sign * offsets, sign * primary.astype(np.int64)))
+        else:
+            order = np.lexsort((sign * offsets, sign * ordinals[offsets].astype(np.int64), sign * primary))
+        return offsets[order][query.offset:k]
@@ -0,0 +1,139 @@
+"""
+Bulk Deals Response Cache
+Serialized bulk deals responses kept together with their gzip and brotli
+encodings, keyed by (request key, database generation). A repeated request
+is answered with the stored bytes in the best encoding the client accepts;
+entries of an older generation are dropped as soon as a newer one is seen.
+Bounded by the bytes held across all encodings, least recently used first out.
+"""
+
+import gzip
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bytes held across every entry and encoding (BULK_DEALS_RESPONSE_CACHE_MB overrides)
+DEFAULT_MAX_BYTES = int(os.environ.get('BULK_DEALS_RESPONSE_CACHE_MB', '128')) * 1024 * 1024
+
+GZIP_LEVEL = 6
+# Brotli's top qualities take minutes on a full-history body
+BROTLI_QUALITY = 5
+
+# Smaller bodies are stored and served as they are
+MIN_COMPRESS_BYTES = 1024
+
+
+class CachedBody:
+    """One response body in every encoding the cache serves"""
+
+    def __init__(self, body: bytes, mimetype: str, headers: Dict[str, str]):
+        self.mimetype = mimetype
+        self.headers = headers
+        self.encodings = {'identity': body}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            if brotli:
+                self.encodings['br'] = brotli.compress(body, quality=BROTLI_QUALITY)
+            self.encodings['gzip'] = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        self.size = sum(len(b) for b in self.encodings.values())
+
+    def negotiate(self, quality: Callable[[str], float]) -> str:
+        """Smallest stored encoding the client accepts, given its Accept-Encoding quality lookup"""
+        for encoding in ('br', 'gzip'):
+            if encoding in self.encodings and quality(encoding) > 0:
+                return encoding
+        return 'identity'
+
+
+class ResponseCache:
+    """Byte-bounded LRU of CachedBody entries for the current database generation"""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        # Largest uncompressed body worth keeping
+        self.max_body_bytes = max_bytes // 2
+        self._entries: 'OrderedDict[str, CachedBody]' = OrderedDict()
+        self._bytes = 0
+        self._generation: Optional[int] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _sync(self, generation: int) -> bool:
+        """Drop everything cached for an older generation; False if generation itself is stale"""
+        if self._generation is not None and generation < self._generation:
+            return False
+        if generation != self._generation:
+            self._entries.clear()
+            self._bytes = 0
+            self._generation = generation
+        return True
+
+    def get(self, key: str, generation: int) -> Optional[CachedBody]:
+        with self._lock:
+            entry = self._entries.get(key) if self._sync(generation) else None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, generation: int, body: bytes, mimetype: str,
+            headers: Optional[Dict[str, str]] = None) -> Optional[CachedBody]:
+        """Compress and store a body; returns the entry, or None if it is too large to keep"""
+        if len(body) > self.max_body_bytes:
+            return None
+        # Compress outside the lock; concurrent requests for other keys keep being served
+        entry = CachedBody(body, mimetype, headers or {})
+        with self._lock:
+            if not self._sync(generation) or entry.size > self.max_bytes:
+                return entry
+            previous = self._entries.pop(key, None)
+            if previous:
+                self._bytes -= previous.size
+            while self._entries and self._bytes + entry.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+            self._entries[key] = entry
+            self._bytes += entry.size
+        return entry
+
+    def tee(self, key: str, generation: int, chunks: Iterable, mimetype: str,
+            headers: Optional[Dict[str, str]] = None) -> Iterator:
+        """Pass a streamed body through unchanged, storing it once the stream completes.
+
+        Bodies larger than max_body_bytes stop being collected and are not stored.
+        """
+        collected = []
+        size = 0
+        for chunk in chunks:
+            if collected is not None:
+                data = chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+                size += len(data)
+                if size > self.max_body_bytes:
+                    collected = None
+                else:
+                    collected.append(data)
+            yield chunk
+        if collected is not None:
+            self.put(key, generation, b''.join(collected), mimetype, headers)
+
+    def stats(self) -> Dict:
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'generation': self._generation,
+            'hits': self.hits,
+            'misses': self.misses,
+            'brotli': brotli is not None,
+        }
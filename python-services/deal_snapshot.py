@@ -0,0 +1,212 @@
+"""
+Bulk Deals Binary Snapshot
+Versioned column-file copy of the deals database. Workers boot from it with
+np.load instead of json.load + per-deal normalization; the JSON file remains
+the export read by the Next.js routes and is rewritten alongside it.
+
+Deals are partitioned by year. Every year but the latest is memory-mapped
+read-only, so gunicorn workers share those pages through the OS page cache;
+the latest year is loaded into memory as the mutable tail new deals go to.
+Each row keeps its original offset, so the loaded store orders deals exactly
+like the JSON file (offsets, and with them every tie-break, agree across
+workers whichever way they booted).
+
+Layout (inside data/bulk-deals/snapshot/):
+
+    manifest.json          format version, schema, generation, shards, source signature
+    gen-000042/            one directory per generation, never modified in place
+        dictionaries.json  {field: [values]} shared by every shard
+        keys.npy           uint64 dedup key hash of every deal, by offset (DedupIndex, KeysetIndex)
+        shards/2012/       one directory per year (0000: unparseable dates)
+            offset.npy     int64 offset of each row in the store the snapshot was written from
+            date.npy       int32 date ordinals
+            quantity.npy   int64
+            price.npy      float64
+            <field>.npy    int32 dictionary codes for each encoded string field
+            extras.json    {shard offset: {non-schema keys}}
+
+The manifest is replaced atomically last, so readers see either the old or
+the new generation; the previous generation directory is kept for readers
+that picked up the old manifest.
+"""
+
+import json
+import os
+import shutil
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from deal_indexes import DedupIndex, key_hashes
+from deal_store import DEAL_FIELDS, ENCODED_FIELDS, ColumnarDealStore, ShardedDealStore, StringDictionary
+
+SNAPSHOT_DIRNAME = 'snapshot'
+MANIFEST_FILENAME = 'manifest.json'
+
+# Bump when the column layout or the dedup key changes; older snapshots are then ignored and rebuilt from JSON
+FORMAT_VERSION = 5
+
+NUMERIC_COLUMNS = ('date', 'quantity', 'price')
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def ordinal_years(ordinals: np.ndarray) -> np.ndarray:
+    """Calendar year of each date ordinal (0 for the unparseable ordinal 0)"""
+    years = np.zeros(len(ordinals), dtype=np.int32)
+    valid = ordinals > 0
+    days = (ordinals[valid].astype(np.int64) - EPOCH_ORDINAL).astype('datetime64[D]')
+    years[valid] = days.astype('datetime64[Y]').astype(np.int64) + 1970
+    return years
+
+
+def source_signature(path: str) -> Optional[Dict]:
+    """Size and mtime of the JSON file a snapshot was written alongside"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def read_manifest(snapshot_dir: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_current(manifest: Optional[Dict], source: Optional[Dict]) -> bool:
+    """True if the manifest is readable by this version and matches the JSON file"""
+    return bool(
+        manifest
+        and manifest.get('format_version') == FORMAT_VERSION
+        and manifest.get('schema') == list(DEAL_FIELDS)
+        and manifest.get('normalized')
+        and source is not None
+        and manifest.get('source') == source
+    )
+
+
+def write_snapshot(snapshot_dir: str, store: ColumnarDealStore, source: Optional[Dict],
+                   hashes: Optional[np.ndarray] = None) -> Dict:
+    """Write the store as a new generation and point the manifest at it.
+
+    hashes: the store's dedup key hashes by offset, if the caller has them already.
+    Callers hold the deal log lock so concurrent writers can't race on the generation.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    previous = read_manifest(snapshot_dir) or {}
+    generation = int(previous.get('generation', 0)) + 1
+    name = f"gen-{generation:06d}"
+    gen_dir = os.path.join(snapshot_dir, name)
+    tmp_dir = gen_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    with open(os.path.join(tmp_dir, 'dictionaries.json'), 'w', encoding='utf-8') as f:
+        json.dump({field: store.dictionaries[field].values for field in ENCODED_FIELDS}, f, ensure_ascii=False)
+    np.save(os.path.join(tmp_dir, 'keys.npy'), key_hashes(store.dedup_keys()) if hashes is None else hashes)
+    shards = _write_shards(os.path.join(tmp_dir, 'shards'), store)
+    shutil.rmtree(gen_dir, ignore_errors=True)
+    os.rename(tmp_dir, gen_dir)
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'schema': list(DEAL_FIELDS),
+        'normalized': True,
+        'generation': generation,
+        'directory': name,
+        'rows': len(store),
+        'shards': shards,
+        'source': source,
+        'created': datetime.now().isoformat(),
+    }
+    manifest_path = os.path.join(snapshot_dir, MANIFEST_FILENAME)
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    # Keep the previous generation for readers that loaded the old manifest
+    keep = {name, previous.get('directory')}
+    for entry in os.listdir(snapshot_dir):
+        if entry.startswith('gen-') and entry not in keep:
+            shutil.rmtree(os.path.join(snapshot_dir, entry), ignore_errors=True)
+    return manifest
+
+
+def _write_shards(shards_dir: str, store: ColumnarDealStore) -> List[Dict]:
+    """Stable-partition rows by year into one column directory per year"""
+    years = ordinal_years(store.column('date'))
+    order = np.argsort(years, kind='stable')
+    shard_years, starts, counts = np.unique(years[order], return_index=True, return_counts=True)
+
+    # Extras are keyed by offset; map each to its shard-local position
+    position = np.empty(len(order), dtype=np.int64)
+    position[order] = np.arange(len(order))
+    shard_extras: List[Dict[str, Dict]] = [{} for _ in shard_years]
+    for offset, extra in store.extras().items():
+        pos = int(position[offset])
+        i = int(np.searchsorted(starts, pos, side='right')) - 1
+        shard_extras[i][str(pos - int(starts[i]))] = extra
+
+    columns = {field: store.column(field) for field in NUMERIC_COLUMNS + ENCODED_FIELDS}
+    shards = []
+    for i, (year, start, count) in enumerate(zip(shard_years.tolist(), starts.tolist(), counts.tolist())):
+        name = f"{year:04d}"
+        shard_dir = os.path.join(shards_dir, name)
+        os.makedirs(shard_dir)
+        rows = order[start:start + count]
+        np.save(os.path.join(shard_dir, 'offset.npy'), rows.astype(np.int64))
+        for field, column in columns.items():
+            np.save(os.path.join(shard_dir, f"{field}.npy"), column[rows])
+        with open(os.path.join(shard_dir, 'extras.json'), 'w', encoding='utf-8') as f:
+            json.dump(shard_extras[i], f, default=str, ensure_ascii=False)
+        shards.append({'year': year, 'directory': f"shards/{name}", 'rows': count})
+    return shards
+
+
+def _load_shard(shard_dir: str, dictionaries: Dict[str, StringDictionary], mmap: bool) -> ColumnarDealStore:
+    columns = {
+        field: np.load(os.path.join(shard_dir, f"{field}.npy"), mmap_mode='r' if mmap else None, allow_pickle=False)
+        for field in NUMERIC_COLUMNS + ENCODED_FIELDS
+    }
+    with open(os.path.join(shard_dir, 'extras.json'), 'r', encoding='utf-8') as f:
+        extras = {int(k): v for k, v in json.load(f).items()}
+    return ColumnarDealStore.from_columns(columns, dictionaries, extras)
+
+
+def load_snapshot(snapshot_dir: str, source: Optional[Dict]
+                  ) -> Optional[Tuple[ShardedDealStore, DedupIndex, np.ndarray]]:
+    """(sharded store, dedup index, dedup key hash by offset) from the current generation, or None
+    if missing or stale"""
+    manifest = read_manifest(snapshot_dir)
+    if not is_current(manifest, source):
+        return None
+    gen_dir = os.path.join(snapshot_dir, manifest['directory'])
+    try:
+        with open(os.path.join(gen_dir, 'dictionaries.json'), 'r', encoding='utf-8') as f:
+            dictionaries = {field: StringDictionary.from_values(values) for field, values in json.load(f).items()}
+        hashes = np.load(os.path.join(gen_dir, 'keys.npy'), allow_pickle=False)
+        *history, latest = manifest['shards'] or [None]
+        shards = [(shard['year'], _load_shard(os.path.join(gen_dir, shard['directory']), dictionaries, mmap=True))
+                  for shard in history]
+        # Offset of every stored row, in storage order (shards, then the tail)
+        offsets = [np.load(os.path.join(gen_dir, shard['directory'], 'offset.npy'), allow_pickle=False)
+                   for shard in manifest['shards']]
+        if latest:
+            tail = _load_shard(os.path.join(gen_dir, latest['directory']), dictionaries, mmap=False)
+        else:
+            tail = ColumnarDealStore()
+            tail.dictionaries = dictionaries
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️ Ignoring unreadable snapshot {gen_dir}: {e}")
+        return None
+    store = ShardedDealStore(shards, tail, np.concatenate(offsets) if offsets else None)
+    if len(store) != manifest['rows'] or len(hashes) != len(store):
+        return None
+    return store, DedupIndex.from_hashes(np.unique(hashes)), hashes
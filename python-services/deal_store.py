@@ -0,0 +1,771 @@
+"""
+Bulk Deals Storage Engines
+In-memory stores used by BulkDealsDatabase: the legacy list of deal dicts,
+and a columnar engine backed by typed NumPy arrays and dictionary-encoded strings
+"""
+
+import re
+from collections import Counter
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from deal_entities import canonical_client_name
+
+# Fields every stored deal carries, in output order
+DEAL_FIELDS = (
+    'date', 'scripCode', 'securityName', 'clientName', 'clientEntity', 'side',
+    'quantity', 'price', 'type', 'exchange', 'remarks',
+)
+
+# String fields kept once per distinct value: integer codes in the columnar engine, interned strings in the dict engine
+ENCODED_FIELDS = ('scripCode', 'securityName', 'clientName', 'clientEntity', 'side', 'type', 'exchange', 'remarks')
+
+ENGINES = ('dict', 'columnar')
+
+
+def normalize_date(date_value: Any) -> str:
+    """Normalize the date formats seen in NSE/BSE files to YYYY-MM-DD"""
+    s = str(date_value or "").strip()
+    if not s:
+        return ""
+
+    if re.match(r"^\d{4}-\d{2}-\d{2}$", s):
+        return s
+
+    # Try common formats seen in NSE/BSE files
+    for fmt in (
+        "%d/%m/%Y",
+        "%d-%m-%Y",
+        "%d-%b-%Y",
+        "%d-%B-%Y",
+        "%Y/%m/%d",
+        "%Y-%m-%d",
+    ):
+        try:
+            return datetime.strptime(s, fmt).strftime("%Y-%m-%d")
+        except Exception:
+            pass
+
+    # Fallback: handle D/M/YYYY variants
+    m = re.match(r"^(\d{1,2})[/-](\d{1,2})[/-](\d{4})$", s)
+    if m:
+        dd, mm, yyyy = m.group(1), m.group(2), m.group(3)
+        try:
+            return datetime(int(yyyy), int(mm), int(dd)).strftime("%Y-%m-%d")
+        except Exception:
+            return s
+
+    return s
+
+
+def parse_number(value) -> int:
+    try:
+        return int(str(value).replace(',', '').replace(' ', ''))
+    except:
+        return 0
+
+
+def parse_float(value) -> float:
+    try:
+        return float(str(value).replace(',', '').replace(' ', ''))
+    except:
+        return 0.0
+
+
+def date_to_ordinal(value: str) -> int:
+    """Proleptic ordinal of a normalized YYYY-MM-DD date, 0 if it doesn't parse"""
+    try:
+        return date.fromisoformat(value).toordinal()
+    except (TypeError, ValueError):
+        return 0
+
+
+def deal_value(deal: Dict) -> float:
+    """Traded value (quantity x price) of a deal dict"""
+    quantity = deal.get('quantity', 0)
+    if not isinstance(quantity, (int, float)):
+        quantity = parse_number(quantity)
+    price = deal.get('price', 0)
+    if not isinstance(price, (int, float)):
+        price = parse_float(price)
+    return quantity * price
+
+
+def dedup_key(deal: Dict) -> str:
+    """Key add_deals uses to recognise a deal it already has (client spelling variants match)"""
+    return f"{deal.get('date','')}|{deal.get('scripCode','')}|{canonical_client_name(deal.get('clientName',''))}|{deal.get('side','')}|{deal.get('exchange','')}"
+
+
+class ListDealStore:
+    """
+    Row store holding one dict per deal (the original database layout).
+
+    String fields are interned through per-field dictionaries, so the thousands
+    of deals of one client or security all point at a single string object.
+    """
+
+    engine = 'dict'
+
+    def __init__(self, deals: Optional[List[Dict]] = None,
+                 dictionaries: Optional[Dict[str, 'StringDictionary']] = None):
+        self.deals = deals if deals is not None else []
+        if dictionaries is not None:
+            # Deals decoded from these dictionaries already share their strings
+            self.dictionaries = dictionaries
+        else:
+            self.dictionaries = {f: StringDictionary() for f in ENCODED_FIELDS}
+            self._intern_all()
+
+    def _intern_all(self):
+        """Bulk _intern: one field at a time with the lookups bound locally"""
+        for f, dictionary in self.dictionaries.items():
+            codes, values = dictionary.codes, dictionary.values
+            for deal in self.deals:
+                value = deal.get(f)
+                if isinstance(value, str):
+                    code = codes.get(value)
+                    deal[f] = values[dictionary.encode(value) if code is None else code]
+
+    def _intern(self, deal: Dict):
+        for f, dictionary in self.dictionaries.items():
+            value = deal.get(f)
+            if isinstance(value, str):
+                deal[f] = dictionary.intern(value)
+
+    def __len__(self) -> int:
+        return len(self.deals)
+
+    def append(self, deal: Dict) -> int:
+        self._intern(deal)
+        self.deals.append(deal)
+        return len(self.deals) - 1
+
+    def get(self, offset: int) -> Dict:
+        return self.deals[offset]
+
+    def take(self, offsets: Iterable[int]) -> List[Dict]:
+        deals = self.deals
+        return [deals[i] for i in offsets]
+
+    def take_columns(self, offsets: Iterable[int], fields: Iterable[str]) -> Dict[str, List[Any]]:
+        rows = self.take(offsets)
+        return {f: [d.get(f, '') for d in rows] for f in fields}
+
+    def to_dicts(self) -> List[Dict]:
+        return self.deals
+
+    def values(self, field: str, default: Any = '') -> List[Any]:
+        return [d.get(field, default) for d in self.deals]
+
+    def value_counts(self, field: str) -> Dict[str, int]:
+        return dict(Counter(d.get(field, '') for d in self.deals))
+
+    def date_ordinals(self) -> np.ndarray:
+        cache: Dict[str, int] = {}
+        ordinals = np.zeros(len(self.deals), dtype=np.int32)
+        for i, d in enumerate(self.deals):
+            value = d.get('date', '')
+            ordinal = cache.get(value)
+            if ordinal is None:
+                ordinal = cache[value] = date_to_ordinal(value)
+            ordinals[i] = ordinal
+        return ordinals
+
+    def total_value(self) -> float:
+        return float(sum(deal_value(d) for d in self.deals))
+
+    def deal_values(self) -> np.ndarray:
+        """Traded value per offset"""
+        return np.fromiter((deal_value(d) for d in self.deals), dtype=np.float64, count=len(self.deals))
+
+    def date_bounds(self) -> Tuple[Optional[str], Optional[str]]:
+        dates = [normalize_date(d.get('date')) for d in self.deals if d.get('date')]
+        dates = [d for d in dates if d]
+        return (min(dates), max(dates)) if dates else (None, None)
+
+    def offsets_between(self, start_norm: str, end_norm: str) -> List[int]:
+        result = []
+        for i, deal in enumerate(self.deals):
+            deal_date = normalize_date(deal.get('date', ''))
+            if start_norm <= deal_date <= end_norm:
+                result.append(i)
+        return result
+
+    def offsets_matching(self, field: str, predicate: Callable[[str], bool]) -> List[int]:
+        return [i for i, d in enumerate(self.deals) if predicate(str(d.get(field, '') or ''))]
+
+    def offsets_equal(self, field: str, value: str, ignore_case: bool = False,
+                      within: Optional[Iterable[int]] = None) -> List[int]:
+        """Offsets (of all deals, or of those in within) whose field equals value"""
+        deals = self.deals
+        candidates = range(len(deals)) if within is None else within
+        dictionary = self.dictionaries.get(field)
+        if dictionary is None:
+            fold = str.upper if ignore_case else str
+            wanted = fold(str(value or ''))
+            return [i for i in candidates if fold(str(deals[i].get(field, '') or '')) == wanted]
+        # Interned values: a set of the stored strings, compared by hash and identity
+        wanted = {dictionary.values[code] for code in dictionary.lookup_codes(value, ignore_case)}
+        if not wanted:
+            return []
+        return [i for i in candidates if deals[i].get(field) in wanted]
+
+    def dedup_keys(self) -> Iterable[str]:
+        for d in self.deals:
+            yield f"{normalize_date(d.get('date'))}|{d.get('scripCode','')}|{canonical_client_name(d.get('clientName',''))}|{d.get('side','')}|{d.get('exchange','')}"
+
+
+class StringDictionary:
+    """Dictionary encoding: each distinct string is kept once and referenced by an int code"""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+        # Upper-cased value -> codes, built on the first case-insensitive lookup
+        self._folded: Optional[Dict[str, List[int]]] = None
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def encode(self, value: Any) -> int:
+        s = '' if value is None else str(value)
+        code = self.codes.get(s)
+        if code is None:
+            code = len(self.values)
+            self.values.append(s)
+            self.codes[s] = code
+            if self._folded is not None:
+                self._folded.setdefault(s.upper(), []).append(code)
+        return code
+
+    def intern(self, value: str) -> str:
+        """The one stored copy of value"""
+        return self.values[self.encode(value)]
+
+    def lookup(self, value: Any) -> int:
+        """Code for an existing value, -1 if it was never stored"""
+        return self.codes.get('' if value is None else str(value), -1)
+
+    def lookup_codes(self, value: Any, ignore_case: bool = False) -> List[int]:
+        """Codes of the stored values equal to value (all case variants with ignore_case)"""
+        if not ignore_case:
+            code = self.lookup(value)
+            return [code] if code >= 0 else []
+        if self._folded is None:
+            folded: Dict[str, List[int]] = {}
+            for code, s in enumerate(self.values):
+                folded.setdefault(s.upper(), []).append(code)
+            self._folded = folded
+        return self._folded.get(('' if value is None else str(value)).upper(), [])
+
+    def decode(self, code: int) -> str:
+        return self.values[code]
+
+    @classmethod
+    def from_values(cls, values: List[str]) -> 'StringDictionary':
+        dictionary = cls()
+        dictionary.values = list(values)
+        dictionary.codes = {v: i for i, v in enumerate(dictionary.values)}
+        return dictionary
+
+
+class ColumnarDealStore:
+    """
+    Column store: date ordinals, quantities and prices live in typed NumPy arrays,
+    string fields are dictionary-encoded int32 codes. Rows only become dicts in get/take.
+    """
+
+    engine = 'columnar'
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        capacity = max(capacity, 1)
+        self._size = 0
+        self._date = np.zeros(capacity, dtype=np.int32)
+        self._quantity = np.zeros(capacity, dtype=np.int64)
+        self._price = np.zeros(capacity, dtype=np.float64)
+        self._codes = {f: np.zeros(capacity, dtype=np.int32) for f in ENCODED_FIELDS}
+        self.dictionaries = {f: StringDictionary() for f in ENCODED_FIELDS}
+        # Keys outside DEAL_FIELDS (and unparseable raw dates) per offset
+        self._extras: Dict[int, Dict] = {}
+        self._date_strings: Dict[int, str] = {}
+
+    @classmethod
+    def from_dicts(cls, deals: List[Dict]) -> 'ColumnarDealStore':
+        store = cls(capacity=len(deals))
+        store.extend(deals)
+        return store
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, np.ndarray], dictionaries: Dict[str, StringDictionary],
+                     extras: Dict[int, Dict]) -> 'ColumnarDealStore':
+        """Rebuild a store from the arrays column() returns (see deal_snapshot.py).
+
+        Arrays are used as given, so read-only memory maps work: the first
+        append grows the store into fresh in-memory arrays.
+        """
+        store = cls(capacity=0)
+        store._size = len(columns['date'])
+        store._date = np.asarray(columns['date'], dtype=np.int32)
+        store._quantity = np.asarray(columns['quantity'], dtype=np.int64)
+        store._price = np.asarray(columns['price'], dtype=np.float64)
+        store._codes = {f: np.asarray(columns[f], dtype=np.int32) for f in ENCODED_FIELDS}
+        store.dictionaries = dictionaries
+        store._extras = dict(extras)
+        if store._size == 0:
+            store._grow(cls.INITIAL_CAPACITY)
+        return store
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _grow(self, needed: int):
+        capacity = len(self._date)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+
+        def grown(arr):
+            out = np.zeros(new_capacity, dtype=arr.dtype)
+            out[:self._size] = arr[:self._size]
+            return out
+
+        self._date = grown(self._date)
+        self._quantity = grown(self._quantity)
+        self._price = grown(self._price)
+        self._codes = {f: grown(a) for f, a in self._codes.items()}
+
+    def _encode_row(self, deal: Dict, offset: int) -> Tuple[int, int, float, List[int]]:
+        raw_date = deal.get('date', '')
+        ordinal = date_to_ordinal(raw_date)
+        extras = {k: v for k, v in deal.items() if k not in DEAL_FIELDS}
+        if not ordinal and raw_date:
+            extras['date'] = raw_date
+        if extras:
+            self._extras[offset] = extras
+
+        quantity = deal.get('quantity', 0)
+        if isinstance(quantity, float):
+            quantity = int(quantity)
+        elif not isinstance(quantity, int):
+            quantity = parse_number(quantity)
+        price = deal.get('price', 0)
+        if not isinstance(price, float):
+            price = parse_float(price)
+        codes = [self.dictionaries[f].encode(deal.get(f, '')) for f in ENCODED_FIELDS]
+        return ordinal, quantity, price, codes
+
+    def append(self, deal: Dict) -> int:
+        offset = self._size
+        self._grow(offset + 1)
+        ordinal, quantity, price, codes = self._encode_row(deal, offset)
+        self._date[offset] = ordinal
+        self._quantity[offset] = quantity
+        self._price[offset] = price
+        for f, code in zip(ENCODED_FIELDS, codes):
+            self._codes[f][offset] = code
+        self._size += 1
+        return offset
+
+    def extend(self, deals: List[Dict]):
+        """Bulk append; encodes into Python lists first and copies into the arrays once"""
+        start = self._size
+        self._grow(start + len(deals))
+        rows = [self._encode_row(deal, start + i) for i, deal in enumerate(deals)]
+        if not rows:
+            return
+        end = start + len(rows)
+        ordinals, quantities, prices, codes = zip(*rows)
+        self._date[start:end] = ordinals
+        self._quantity[start:end] = quantities
+        self._price[start:end] = prices
+        for j, f in enumerate(ENCODED_FIELDS):
+            self._codes[f][start:end] = [c[j] for c in codes]
+        self._size = end
+
+    def _date_string(self, ordinal: int) -> str:
+        s = self._date_strings.get(ordinal)
+        if s is None:
+            s = date.fromordinal(ordinal).isoformat() if ordinal else ''
+            self._date_strings[ordinal] = s
+        return s
+
+    def get(self, offset: int) -> Dict:
+        return self.take([offset])[0]
+
+    def take(self, offsets: Iterable[int]) -> List[Dict]:
+        if isinstance(offsets, range):
+            idx = np.arange(offsets.start, offsets.stop, offsets.step, dtype=np.int64)
+        else:
+            idx = np.asarray(offsets, dtype=np.int64)
+        if idx.size == 0:
+            return []
+        dates = [self._date_string(o) for o in self._date[idx].tolist()]
+        quantities = self._quantity[idx].tolist()
+        prices = self._price[idx].tolist()
+        strings = {}
+        for f in ENCODED_FIELDS:
+            values = self.dictionaries[f].values
+            strings[f] = [values[c] for c in self._codes[f][idx].tolist()]
+
+        result = []
+        extras = self._extras
+        for j, offset in enumerate(idx.tolist()):
+            deal = {
+                'date': dates[j],
+                'scripCode': strings['scripCode'][j],
+                'securityName': strings['securityName'][j],
+                'clientName': strings['clientName'][j],
+                'clientEntity': strings['clientEntity'][j],
+                'side': strings['side'][j],
+                'quantity': quantities[j],
+                'price': prices[j],
+                'type': strings['type'][j],
+                'exchange': strings['exchange'][j],
+            }
+            if strings['remarks'][j]:
+                deal['remarks'] = strings['remarks'][j]
+            if offset in extras:
+                deal.update(extras[offset])
+            result.append(deal)
+        return result
+
+    def take_columns(self, offsets: Iterable[int], fields: Iterable[str]) -> Dict[str, List[Any]]:
+        """Values of each field at offsets, decoded column by column without building deals"""
+        if isinstance(offsets, range):
+            idx = np.arange(offsets.start, offsets.stop, offsets.step, dtype=np.int64)
+        else:
+            idx = np.asarray(offsets, dtype=np.int64)
+        columns = {}
+        for f in fields:
+            if f == 'date':
+                columns[f] = [self._date_string(o) for o in self._date[idx].tolist()]
+            elif f in ('quantity', 'price'):
+                columns[f] = self.column(f)[idx].tolist()
+            elif f in self._codes:
+                decoded = self.dictionaries[f].values
+                columns[f] = [decoded[c] for c in self._codes[f][idx].tolist()]
+            else:
+                columns[f] = [''] * idx.size
+        if self._extras and idx.size:
+            # Extras (raw dates, non-standard keys) override the columns, as in take()
+            extra_offsets = np.fromiter(self._extras.keys(), dtype=np.int64, count=len(self._extras))
+            for j in np.flatnonzero(np.isin(idx, extra_offsets)).tolist():
+                extra = self._extras[int(idx[j])]
+                for f in columns:
+                    if f in extra:
+                        columns[f][j] = extra[f]
+        return columns
+
+    def to_dicts(self) -> List[Dict]:
+        return self.take(range(self._size))
+
+    def column(self, field: str) -> np.ndarray:
+        """Raw column view: date ordinals, quantity, price, or dictionary codes"""
+        n = self._size
+        if field == 'date':
+            return self._date[:n]
+        if field == 'quantity':
+            return self._quantity[:n]
+        if field == 'price':
+            return self._price[:n]
+        return self._codes[field][:n]
+
+    def values(self, field: str, default: Any = '') -> List[Any]:
+        n = self._size
+        if field == 'date':
+            values = [self._date_string(o) for o in self._date[:n].tolist()]
+        elif field in ('quantity', 'price'):
+            values = self.column(field).tolist()
+        elif field in self._codes:
+            decoded = self.dictionaries[field].values
+            values = [decoded[c] for c in self._codes[field][:n].tolist()]
+        else:
+            return [self._extras.get(i, {}).get(field, default) for i in range(n)]
+        for offset, extra in self._extras.items():
+            if field in extra:
+                values[offset] = extra[field]
+        return values
+
+    def value_counts(self, field: str) -> Dict[str, int]:
+        if field not in self._codes:
+            return dict(Counter(self.values(field)))
+        counts = np.bincount(self._codes[field][:self._size], minlength=len(self.dictionaries[field]))
+        decoded = self.dictionaries[field].values
+        return {decoded[code]: int(counts[code]) for code in np.flatnonzero(counts).tolist()}
+
+    def date_ordinals(self) -> np.ndarray:
+        return self._date[:self._size]
+
+    def total_value(self) -> float:
+        n = self._size
+        return float(np.dot(self._quantity[:n].astype(np.float64), self._price[:n]))
+
+    def deal_values(self) -> np.ndarray:
+        """Traded value per offset"""
+        n = self._size
+        return self._quantity[:n] * self._price[:n]
+
+    def date_bounds(self) -> Tuple[Optional[str], Optional[str]]:
+        ordinals = self._date[:self._size]
+        ordinals = ordinals[ordinals > 0]
+        if ordinals.size == 0:
+            return None, None
+        return self._date_string(int(ordinals.min())), self._date_string(int(ordinals.max()))
+
+    def offsets_between(self, start_norm: str, end_norm: str) -> np.ndarray:
+        lo, hi = date_to_ordinal(start_norm), date_to_ordinal(end_norm)
+        ordinals = self._date[:self._size]
+        return np.flatnonzero((ordinals >= lo) & (ordinals <= hi) & (ordinals > 0))
+
+    def offsets_matching(self, field: str, predicate: Callable[[str], bool]) -> np.ndarray:
+        """Evaluate predicate once per distinct value, then select rows by code"""
+        if field not in self._codes:
+            return np.array([i for i, v in self._extras.items() if predicate(str(v.get(field, '') or ''))],
+                            dtype=np.int64)
+        return self.offsets_with_codes(field, self.matching_codes(field, predicate))
+
+    def matching_codes(self, field: str, predicate: Callable[[str], bool]) -> List[int]:
+        return [code for code, value in enumerate(self.dictionaries[field].values) if predicate(value)]
+
+    def offsets_with_codes(self, field: str, codes: List[int], within: Optional[np.ndarray] = None) -> np.ndarray:
+        """Offsets (of all rows, or of those in within) whose code is one of codes"""
+        if not codes:
+            return np.array([], dtype=np.int64)
+        column = self._codes[field][:self._size]
+        if within is not None:
+            within = np.asarray(within, dtype=np.int64)
+            column = column[within]
+        # One int32 comparison per row; isin only when a value has several case variants
+        mask = column == codes[0] if len(codes) == 1 else np.isin(column, codes)
+        return within[mask] if within is not None else np.flatnonzero(mask)
+
+    def offsets_equal(self, field: str, value: str, ignore_case: bool = False,
+                      within: Optional[Iterable[int]] = None) -> np.ndarray:
+        """Offsets (of all rows, or of those in within) whose field equals value"""
+        if field not in self._codes:
+            fold = str.upper if ignore_case else str
+            wanted = fold(str(value or ''))
+            found = self.offsets_matching(field, lambda v: fold(v) == wanted)
+            return found if within is None else np.intersect1d(found, within)
+        codes = self.dictionaries[field].lookup_codes(value, ignore_case)
+        return self.offsets_with_codes(field, codes, within)
+
+    def dedup_keys(self) -> Iterable[str]:
+        columns = [self.values(f) for f in ('date', 'scripCode', 'clientName', 'side', 'exchange')]
+        for date_, scrip, client, side, exchange in zip(*columns):
+            yield f"{date_}|{scrip}|{canonical_client_name(client)}|{side}|{exchange}"
+
+    def extras(self) -> Dict[int, Dict]:
+        """Non-schema keys (and unparseable raw dates) by offset"""
+        return self._extras
+
+    def nbytes(self) -> int:
+        """Bytes held by the column arrays (excluding dictionary strings)"""
+        return sum(a.nbytes for a in (self._date, self._quantity, self._price, *self._codes.values()))
+
+
+class ShardedDealStore:
+    """
+    Columnar store split into read-only per-year shards, memory-mapped from the
+    binary snapshot so every gunicorn worker shares one copy through the page
+    cache, plus an in-memory tail: the latest year and every deal appended since.
+
+    Offsets are global and all parts share one set of string dictionaries, so
+    codes mean the same everywhere. Rows are stored grouped by year (shard rows
+    in shard order, then the tail: its "position"), but offsets keep the order
+    the deals had when the snapshot was written, so a worker booted from the
+    snapshot numbers and returns deals exactly like one that loaded the JSON
+    file. Deals appended since sit at the same offset and position.
+    """
+
+    engine = 'columnar'
+
+    def __init__(self, shards: List[Tuple[int, ColumnarDealStore]], tail: ColumnarDealStore,
+                 offsets: Optional[np.ndarray] = None):
+        """offsets: the offset of each stored snapshot row, by position (None: stored in offset order)"""
+        self.shards = shards
+        self.tail = tail
+        self.dictionaries = tail.dictionaries
+        self._parts = [store for _, store in shards] + [tail]
+        # _starts[i] is the first position of part i; the last entry is the tail's
+        self._starts = np.zeros(len(shards) + 1, dtype=np.int64)
+        self._starts[1:] = np.cumsum([len(store) for _, store in shards], dtype=np.int64)
+        self._offsets = self._positions = None
+        if offsets is not None and not np.array_equal(offsets, np.arange(len(offsets))):
+            self._offsets = np.asarray(offsets, dtype=np.int64)
+            self._positions = np.empty_like(self._offsets)
+            self._positions[self._offsets] = np.arange(len(self._offsets), dtype=np.int64)
+
+    def __len__(self) -> int:
+        return int(self._starts[-1]) + len(self.tail)
+
+    def append(self, deal: Dict) -> int:
+        return int(self._starts[-1]) + self.tail.append(deal)
+
+    @staticmethod
+    def _map(mapping: Optional[np.ndarray], idx: np.ndarray) -> np.ndarray:
+        """idx through an offset <-> position mapping of the snapshot rows (later rows map to themselves)"""
+        if mapping is None:
+            return idx
+        mapped = idx.copy()
+        snapshot = idx < mapping.size
+        mapped[snapshot] = mapping[idx[snapshot]]
+        return mapped
+
+    def _found(self, positions: List[np.ndarray]) -> np.ndarray:
+        """Ascending offsets of the rows found at positions, as every store returns them"""
+        found = np.concatenate(positions) if positions else np.array([], dtype=np.int64)
+        return found if self._offsets is None else np.sort(self._map(self._offsets, found))
+
+    def _in_order(self, by_position):
+        """Per-row values in offset order, from values in position order (an array or a list)"""
+        if self._positions is None:
+            return by_position
+        order = self._map(self._positions, np.arange(len(self), dtype=np.int64))
+        if isinstance(by_position, np.ndarray):
+            return by_position[order]
+        return [by_position[i] for i in order.tolist()]
+
+    def _split(self, idx: np.ndarray) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+        """(part, indices into idx, part-local rows) for each part the deals at offsets idx are stored in"""
+        idx = self._map(self._positions, idx)
+        parts = np.searchsorted(self._starts, idx, side='right') - 1
+        for part in np.unique(parts).tolist():
+            positions = np.flatnonzero(parts == part)
+            yield part, positions, idx[positions] - self._starts[part]
+
+    def _overlapping(self, lo: int, hi: int) -> Iterator[Tuple[int, Any]]:
+        """(start position, part) for the shards whose year overlaps [lo, hi], then the tail"""
+        lo_year = date.fromordinal(lo).year if lo > 0 else 1
+        hi_year = date.fromordinal(hi).year if hi > 0 else 0
+        for i, (year, store) in enumerate(self.shards):
+            if lo_year <= year <= hi_year:
+                yield int(self._starts[i]), store
+        yield int(self._starts[-1]), self.tail
+
+    def get(self, offset: int) -> Dict:
+        return self.take([offset])[0]
+
+    def take(self, offsets: Iterable[int]) -> List[Dict]:
+        if isinstance(offsets, range):
+            idx = np.arange(offsets.start, offsets.stop, offsets.step, dtype=np.int64)
+        else:
+            idx = np.asarray(offsets, dtype=np.int64)
+        result: List[Optional[Dict]] = [None] * idx.size
+        for part, positions, local in self._split(idx):
+            for position, deal in zip(positions.tolist(), self._parts[part].take(local)):
+                result[position] = deal
+        return result
+
+    def take_columns(self, offsets: Iterable[int], fields: Iterable[str]) -> Dict[str, List[Any]]:
+        if isinstance(offsets, range):
+            idx = np.arange(offsets.start, offsets.stop, offsets.step, dtype=np.int64)
+        else:
+            idx = np.asarray(offsets, dtype=np.int64)
+        fields = list(fields)
+        columns: Dict[str, List[Any]] = {f: [None] * idx.size for f in fields}
+        for part, positions, local in self._split(idx):
+            part_columns = self._parts[part].take_columns(local, fields)
+            first, last = int(positions[0]), int(positions[-1])
+            contiguous = last - first + 1 == positions.size
+            for f in fields:
+                if contiguous:
+                    # Sorted offsets: each part fills one slice
+                    columns[f][first:last + 1] = part_columns[f]
+                else:
+                    column = columns[f]
+                    for position, value in zip(positions.tolist(), part_columns[f]):
+                        column[position] = value
+        return columns
+
+    def to_dicts(self) -> List[Dict]:
+        return self._in_order([deal for part in self._parts for deal in part.to_dicts()])
+
+    def column(self, field: str) -> np.ndarray:
+        return self._in_order(np.concatenate([part.column(field) for part in self._parts]))
+
+    def values(self, field: str, default: Any = '') -> List[Any]:
+        return self._in_order([v for part in self._parts for v in part.values(field, default)])
+
+    def value_counts(self, field: str) -> Dict[str, int]:
+        counts: Counter = Counter()
+        for part in self._parts:
+            counts.update(part.value_counts(field))
+        return dict(counts)
+
+    def date_ordinals(self) -> np.ndarray:
+        return self.column('date')
+
+    def total_value(self) -> float:
+        return sum(part.total_value() for part in self._parts)
+
+    def deal_values(self) -> np.ndarray:
+        return self._in_order(np.concatenate([part.deal_values() for part in self._parts]))
+
+    def date_bounds(self) -> Tuple[Optional[str], Optional[str]]:
+        bounds = [b for b in (part.date_bounds() for part in self._parts) if b[0]]
+        if not bounds:
+            return None, None
+        return min(b[0] for b in bounds), max(b[1] for b in bounds)
+
+    def offsets_between(self, start_norm: str, end_norm: str) -> np.ndarray:
+        """Scan only the shards whose year overlaps the range, plus the tail"""
+        lo, hi = date_to_ordinal(start_norm), date_to_ordinal(end_norm)
+        found = [start + part.offsets_between(start_norm, end_norm) for start, part in self._overlapping(lo, hi)]
+        return self._found(found)
+
+    def offsets_matching(self, field: str, predicate: Callable[[str], bool]) -> np.ndarray:
+        if field in self.dictionaries:
+            # Shared dictionaries: evaluate the predicate once for all parts
+            codes = self.tail.matching_codes(field, predicate)
+            found = [start + part.offsets_with_codes(field, codes) for start, part in zip(self._starts.tolist(), self._parts)]
+        else:
+            found = [start + part.offsets_matching(field, predicate) for start, part in zip(self._starts.tolist(), self._parts)]
+        return self._found(found)
+
+    def offsets_equal(self, field: str, value: str, ignore_case: bool = False,
+                      within: Optional[Iterable[int]] = None) -> np.ndarray:
+        if field not in self.dictionaries:
+            found = [start + part.offsets_equal(field, value, ignore_case)
+                     for start, part in zip(self._starts.tolist(), self._parts)]
+            found = self._found(found)
+            return found if within is None else np.intersect1d(found, within)
+        codes = self.dictionaries[field].lookup_codes(value, ignore_case)
+        if within is None:
+            found = [start + part.offsets_with_codes(field, codes)
+                     for start, part in zip(self._starts.tolist(), self._parts)]
+            return self._found(found)
+        idx = np.asarray(within, dtype=np.int64)
+        found = [int(self._starts[part]) + self._parts[part].offsets_with_codes(field, codes, local)
+                 for part, _, local in self._split(idx)]
+        return self._found(found)
+
+    def dedup_keys(self) -> Iterable[str]:
+        return iter(self._in_order([key for part in self._parts for key in part.dedup_keys()]))
+
+    def extras(self) -> Dict[int, Dict]:
+        by_position = {start + offset: extra for start, part in zip(self._starts.tolist(), self._parts)
+                       for offset, extra in part.extras().items()}
+        if self._offsets is None:
+            return by_position
+        positions = np.fromiter(by_position, dtype=np.int64, count=len(by_position))
+        return dict(zip(self._map(self._offsets, positions).tolist(), by_position.values()))
+
+    def nbytes(self) -> int:
+        """Bytes held in process memory by the tail's column arrays (shards are mapped)"""
+        return self.tail.nbytes()
+
+
+def create_store(engine: str, deals: List[Dict], dictionaries: Optional[Dict[str, StringDictionary]] = None):
+    """Build the in-memory store for an engine name from a list of deal dicts.
+
+    dictionaries: the ones deals were decoded from, if any (their strings are already interned)
+    """
+    if engine == 'columnar':
+        return ColumnarDealStore.from_dicts(deals)
+    if engine == 'dict':
+        return ListDealStore(deals, dictionaries)
+    raise ValueError(f"Unknown bulk deals engine: {engine} (expected one of {', '.join(ENGINES)})")
@@ -0,0 +1,98 @@
+"""
+Bulk Deals Streaming Responses
+Encoders that emit large deal results a chunk at a time: the JSON envelope
+goes out first, then the deals, each chunk serialized with one json.dumps.
+A response for the whole database never exists as a single string, so peak
+worker memory is one chunk and the client gets its first bytes immediately.
+
+Deal queries can also be narrowed to a few fields (?fields=date,clientName)
+and returned column-wise (?format=columnar): one array per field instead of
+an array of objects, so key names are not repeated on every deal.
+"""
+
+import json
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from deal_store import DEAL_FIELDS
+
+# Deals serialized per yielded piece
+STREAM_CHUNK_SIZE = 2000
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+COLUMNAR_FORMAT = 'columnar'
+
+
+def _dumps(value) -> str:
+    # Compact, like Flask's jsonify outside debug mode
+    return json.dumps(value, separators=(',', ':'), default=str)
+
+
+def wants_ndjson(format_param: Optional[str], accept: Optional[str]) -> bool:
+    """True for ?format=ndjson or an Accept header asking for newline-delimited JSON"""
+    if format_param:
+        return format_param.lower() == 'ndjson'
+    return NDJSON_MIMETYPE in (accept or '')
+
+
+def wants_columnar(format_param: Optional[str]) -> bool:
+    return (format_param or '').lower() == COLUMNAR_FORMAT
+
+
+def parse_fields(fields_param: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Fields named in a comma-separated ?fields= value, in the order given; None when absent.
+
+    Raises ValueError naming any field deals do not have.
+    """
+    if not fields_param:
+        return None
+    fields = tuple(dict.fromkeys(f.strip() for f in fields_param.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in DEAL_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields or None
+
+
+def project(deals: List[Dict], fields: Sequence[str]) -> List[Dict]:
+    """Deals with only the given fields (missing ones as '')"""
+    return [{f: deal.get(f, '') for f in fields} for deal in deals]
+
+
+def to_columns(deals: List[Dict], fields: Sequence[str]) -> Dict[str, List]:
+    """One list per field, aligned by position"""
+    return {f: [deal.get(f, '') for deal in deals] for f in fields}
+
+
+def rows_from_columns(columns: Dict[str, List], fields: Sequence[str]) -> List[Dict]:
+    """Projected deals from aligned columns"""
+    return [dict(zip(fields, row)) for row in zip(*(columns[f] for f in fields))]
+
+
+def iter_json(envelope: Dict, chunks: Iterable[List[Dict]], key: str = 'data') -> Iterator[str]:
+    """The document jsonify({**envelope, key: deals}) would build, produced chunk by chunk"""
+    head = _dumps(envelope)[:-1]
+    yield head + (',' if envelope else '') + _dumps(key) + ':['
+    first = True
+    for chunk in chunks:
+        if not chunk:
+            continue
+        body = _dumps(chunk)[1:-1]
+        yield body if first else ',' + body
+        first = False
+    yield ']}'
+
+
+def iter_ndjson(chunks: Iterable[List[Dict]]) -> Iterator[str]:
+    """One deal per line"""
+    for chunk in chunks:
+        if chunk:
+            yield '\n'.join(_dumps(deal) for deal in chunk) + '\n'
+
+
+def iter_columnar(envelope: Dict, columns: Iterable[Tuple[str, List]], key: str = 'data') -> Iterator[str]:
+    """{**envelope, key: {field: [values...]}}, one field's array at a time"""
+    head = _dumps(envelope)[:-1]
+    yield head + (',' if envelope else '') + _dumps(key) + ':{'
+    for i, (field, values) in enumerate(columns):
+        yield (',' if i else '') + _dumps(field) + ':' + _dumps(values)
+    yield '}}'
@@ -0,0 +1,42 @@
+"""
+Export Bulk Deals to Parquet / Arrow
+Writes the same files /api/bulk-deals/export serves, for offline analysis:
+
+    python export_bulk_deals.py --format parquet --start 2024-01-01 --end 2024-12-31
+    python export_bulk_deals.py --format arrow --output deals.arrow
+
+    import pandas as pd
+    deals = pd.read_parquet('data/bulk-deals/exports/bulk_deals_all.g42.parquet')
+"""
+
+import argparse
+import os
+import shutil
+
+from bulk_deals_database import open_database
+from deal_export import EXPORT_FORMATS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export bulk deals as Parquet or Arrow IPC")
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='parquet')
+    parser.add_argument('--start', default=None, help="First deal date (with --end; default: all deals)")
+    parser.add_argument('--end', default=None, help="Last deal date (with --start)")
+    parser.add_argument('--output', default=None, help="Copy the file here (default: leave it in the exports cache)")
+    parser.add_argument('--backend', default=None, help="json or sqlite (default: BULK_DEALS_BACKEND)")
+    parser.add_argument('--data-dir', default=None, help="Database directory (default: data/bulk-deals)")
+    args = parser.parse_args()
+
+    if bool(args.start) != bool(args.end):
+        parser.error("--start and --end go together")
+
+    db = open_database(args.backend, data_dir=args.data_dir)
+    path = db.export(args.format, args.start, args.end)
+    if args.output:
+        shutil.copyfile(path, args.output)
+        path = args.output
+    print(f"✅ {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
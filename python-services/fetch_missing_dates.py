@@ -6,12 +6,13 @@ Uses Selenium to download CSV from BSE website
 import os
 import sys
 import csv
-import json
 import tempfile
 import shutil
 import time
 from datetime import datetime, timedelta
 
+from bulk_deals_database import open_database
+
 def fetch_bse_bulk_deals_range(start_date: str, end_date: str, output_dir: str = None):
     """
     Fetch BSE bulk deals for a date range and save to CSV
@@ -156,28 +157,12 @@ def load_csv_to_database(csv_path: str, database_path: str = None):
         csv_path: Path to CSV file
         database_path: Path to database JSON (defaults to standard location)
     """
-    if database_path is None:
-        database_path = os.path.join(os.path.dirname(__file__), 'data', 'bulk-deals', 'bulk_deals_database.json')
-    
     if not os.path.exists(csv_path):
         print(f"[ERROR] CSV file not found: {csv_path}")
         return 0
     
-    # Load existing database
-    if os.path.exists(database_path):
-        with open(database_path, 'r', encoding='utf-8') as f:
-            database = json.load(f)
-    else:
-        database = {'deals': [], 'by_date': {}}
-    
-    # Create set of existing deal keys for deduplication
-    existing_keys = set()
-    for deal in database.get('deals', []):
-        key = f"{deal.get('date')}|{deal.get('scripCode')}|{deal.get('clientName')}|{deal.get('side')}|{deal.get('exchange')}"
-        existing_keys.add(key)
-    
     # Parse CSV
-    added = 0
+    deals = []
     with open(csv_path, 'r', encoding='utf-8') as f:
         reader = csv.DictReader(f)
         for row in reader:
@@ -193,7 +178,7 @@ def load_csv_to_database(csv_path: str, database_path: str = None):
             deal_type = row.get('Deal Type', '').strip().upper()
             side = 'BUY' if deal_type in ['BUY', 'B', 'P'] else 'SELL'
             
-            deal = {
+            deals.append({
                 'date': deal_date,
                 'scripCode': row.get('Security Code', '').strip(),
                 'securityName': row.get('Company', '').strip(),
@@ -203,30 +188,13 @@ def load_csv_to_database(csv_path: str, database_path: str = None):
                 'price': parse_float(row.get('Price', '0')),
                 'type': 'bulk',
                 'exchange': 'BSE'
-            }
-            
-            # Check for duplicates
-            key = f"{deal['date']}|{deal['scripCode']}|{deal['clientName']}|{deal['side']}|{deal['exchange']}"
-            if key in existing_keys:
-                continue
-            
-            database['deals'].append(deal)
-            existing_keys.add(key)
-            
-            # Update by_date index
-            if deal_date not in database['by_date']:
-                database['by_date'][deal_date] = []
-            database['by_date'][deal_date].append(len(database['deals']) - 1)
-            
-            added += 1
+            })
+    
+    # Deduplicated append to the deal log (no full rewrite of the database file)
+    db = open_database(data_dir=os.path.dirname(database_path) if database_path else None)
+    added = db.add_deals(deals)
     
-    # Save database
     if added > 0:
-        with open(database_path, 'w', encoding='utf-8') as f:
-            json.dump(database, f, indent=2, default=str)
-        
-        # Update metadata
-        update_metadata(database_path)
         print(f"[OK] Added {added} new deals to database")
     else:
         print("[INFO] No new deals to add (all already in database)")
@@ -234,34 +202,6 @@ def load_csv_to_database(csv_path: str, database_path: str = None):
     return added
 
 
-def update_metadata(database_path: str):
-    """Update metadata file after database changes"""
-    metadata_path = database_path.replace('bulk_deals_database.json', 'database_metadata.json')
-    
-    with open(database_path, 'r', encoding='utf-8') as f:
-        database = json.load(f)
-    
-    deals = database.get('deals', [])
-    dates = [d.get('date') for d in deals if d.get('date')]
-    
-    metadata = {
-        "last_updated": datetime.now().isoformat(),
-        "total_deals": len(deals),
-        "date_range": {
-            "start": min(dates) if dates else None,
-            "end": max(dates) if dates else None
-        },
-        "exchanges": {
-            "NSE": sum(1 for d in deals if d.get('exchange') == 'NSE'),
-            "BSE": sum(1 for d in deals if d.get('exchange') == 'BSE')
-        },
-        "unique_dates": len(database.get('by_date', {}))
-    }
-    
-    with open(metadata_path, 'w', encoding='utf-8') as f:
-        json.dump(metadata, f, indent=2, default=str)
-
-
 def parse_number(value) -> int:
     try:
         return int(str(value).replace(',', '').replace(' ', ''))
@@ -1,7 +1,7 @@
 
 import os
 import csv
-from bulk_deals_database import BulkDealsDatabase
+from bulk_deals_database import BulkDealsDatabase, open_database
 
 def load_downloaded_csv():
     # Path to the downloaded CSV
@@ -11,7 +11,7 @@ def load_downloaded_csv():
         print(f"CSV file not found: {csv_path}")
         return
     
-    db = BulkDealsDatabase()
+    db = open_database()
     print(f"Loading deals from {os.path.basename(csv_path)}")
     
     deals = []
@@ -8,6 +8,8 @@ import time
 from datetime import datetime, timedelta
 import logging
 from bulk_deals_scraper import scrape_bulk_deals
+from bulk_deals_database import open_database
+from deal_ingest import ingest_day_files
 import os
 import json
 
@@ -56,6 +58,9 @@ def download_bulk_deals():
                 'downloaded_at': datetime.now().isoformat(),
                 'deals': deals
             }, f, indent=2, ensure_ascii=False)
+
+        # Fold the new day file into the main database
+        ingest_day_files(open_database(), DATA_DIR)
         
     except Exception as e:
         logger.error(f"❌ Error downloading bulk deals: {e}", exc_info=True)
@@ -0,0 +1,124 @@
+"""BulkDealsDatabase across processes: every worker opens the same data directory"""
+
+import base64
+
+import pytest
+
+from bulk_deals_database import BulkDealsDatabase, decode_cursor, encode_cursor
+from deal_indexes import key_hash
+from deal_store import ShardedDealStore, dedup_key
+
+
+def newest_first(deals, start='', end='9999-12-31'):
+    """Paging order of the in-memory backends: date desc, dedup key hash desc, then storage order desc"""
+    window = [(i, d) for i, d in enumerate(deals) if start <= d['date'] <= end]
+    return [d for _, d in sorted(window, key=lambda p: (p[1]['date'], key_hash(dedup_key(p[1])), p[0]), reverse=True)]
+
+
+def walk(databases, limit, start=None, end=None):
+    """Every page from the first cursor to the last, asking the databases in turn"""
+    seen, cursor, n = [], None, 0
+    while True:
+        page, cursor = databases[n % len(databases)].get_deals_page(limit, cursor, start, end)
+        seen.extend(page)
+        n += 1
+        if cursor is None:
+            return seen
+
+
+def keys(deals):
+    return [dedup_key(d) for d in deals]
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor('2024-03-01', '00ff00ff00ff00ff')) == ('2024-03-01', '00ff00ff00ff00ff', 0)
+    assert decode_cursor(encode_cursor('2024-03-01', '00ff00ff00ff00ff', 2)) == ('2024-03-01', '00ff00ff00ff00ff', 2)
+    # Tokens from before the occurrence was added
+    legacy = base64.urlsafe_b64encode(b'["2024-03-01","00ff"]').decode('ascii').rstrip('=')
+    assert decode_cursor(legacy) == ('2024-03-01', '00ff', 0)
+    for bad in ('', 'not-a-cursor', encode_cursor('2024-03-01', '1')[:-2], encode_cursor('2024-03-01', '1', -1),
+                base64.urlsafe_b64encode(b'["2024-03-01","1",1,2]').decode('ascii')):
+        with pytest.raises(ValueError):
+            decode_cursor(bad)
+
+
+@pytest.mark.parametrize('engine', ['columnar', 'dict'])
+def test_pages_continue_on_another_worker(deals, write_database, engine):
+    data_dir = write_database(deals)
+    first = BulkDealsDatabase(engine=engine, data_dir=data_dir)   # from JSON; writes the snapshot
+    second = BulkDealsDatabase(engine=engine, data_dir=data_dir)  # from the binary snapshot
+    if engine == 'columnar':
+        assert isinstance(second.store, ShardedDealStore)
+
+    expected = keys(newest_first(deals))
+    assert keys(walk([first], 100)) == expected
+    assert keys(walk([first, second], 100)) == expected
+    assert keys(walk([second, first], 37, '2015-01-01', '2019-06-30')) == \
+        keys(newest_first(deals, '2015-01-01', '2019-06-30'))
+
+
+@pytest.mark.parametrize('engine', ['columnar', 'dict'])
+def test_pages_serve_every_deal_sharing_a_dedup_key(deals, write_database, engine):
+    # Stored before the dedup key was canonical: an exact repeat and spellings it now merges
+    clients = ['ABC PVT LTD', 'ABC PRIVATE LIMITED', 'ABC LTD.', 'Q', 'R', 'S', 'ABC PVT LTD', 'abc private limited']
+    tied = [dict(deals[0], date='2024-03-01', clientName=client) for client in clients]
+    stored = deals[:300] + tied[:4] + deals[300:600] + tied[4:]
+    data_dir = write_database([dict(d) for d in stored])
+    first = BulkDealsDatabase(engine=engine, data_dir=data_dir)
+    second = BulkDealsDatabase(engine=engine, data_dir=data_dir)
+    first.add_deals([dict(d) for d in deals[600:700]])
+    second.add_deals([dict(d) for d in deals[700:800]])
+    first.refresh()
+    second.refresh()
+
+    expected = [d['clientName'] for d in newest_first(stored + deals[600:800])]
+    for limit in (1, 2, 3, 50):
+        assert [d['clientName'] for d in walk([first, second], limit)] == expected, limit
+    assert [d['clientName'] for d in walk([second, first], 1, '2024-03-01', '2024-03-01')] == \
+        [d['clientName'] for d in newest_first(stored + deals[600:800], '2024-03-01', '2024-03-01')]
+
+
+def test_pages_agree_between_workers_that_ingested_in_different_orders(deals, write_database):
+    data_dir = write_database(deals[:500])
+    first = BulkDealsDatabase(engine='columnar', data_dir=data_dir)
+    second = BulkDealsDatabase(engine='columnar', data_dir=data_dir)
+    # Each worker stores its own batch first and the other's on refresh, so their offsets differ
+    first.add_deals([dict(d) for d in deals[500:1000]])
+    second.add_deals([dict(d) for d in deals[1000:]])
+    first.refresh()
+    second.refresh()
+    assert first.store.get(600) != second.store.get(600)
+
+    assert keys(walk([first, second], 64)) == keys(newest_first(deals))
+
+
+def test_cursor_survives_reload_and_new_deals(deals, write_database):
+    data_dir = write_database(deals[:1000])
+    worker = BulkDealsDatabase(engine='columnar', data_dir=data_dir)
+    page, cursor = worker.get_deals_page(50)
+
+    # Another process adds deals and compacts, renumbering rows for every fresh load
+    writer = BulkDealsDatabase(engine='columnar', data_dir=data_dir)
+    writer.add_deals([dict(d) for d in deals[1000:]])
+    writer.compact()
+    worker.refresh()
+    reloaded = BulkDealsDatabase(engine='columnar', data_dir=data_dir)
+
+    rest = [d for d in newest_first(deals) if dedup_key(d) not in set(keys(page))]
+    boundary = (page[-1]['date'], key_hash(dedup_key(page[-1])))
+    below = [d for d in rest if (d['date'], key_hash(dedup_key(d))) < boundary]
+    for database in (worker, reloaded):
+        next_page, _ = database.get_deals_page(len(below), cursor)
+        assert keys(next_page) == keys(below)
+
+
+def test_sqlite_pages_continue_on_another_worker(deals, tmp_path):
+    from bulk_deals_sqlite import SQLiteBulkDealsDatabase
+    first = SQLiteBulkDealsDatabase(data_dir=str(tmp_path))
+    first.add_deals([dict(d) for d in deals])
+    second = SQLiteBulkDealsDatabase(data_dir=str(tmp_path))
+
+    single = walk([first], 100)
+    assert len(single) == len(deals)
+    assert keys(walk([first, second], 100)) == keys(single)
+    assert [d['date'] for d in single] == sorted((d['date'] for d in deals), reverse=True)
@@ -0,0 +1,171 @@
+"""The SQLite backend answers like the in-memory one over the same deals"""
+
+import os
+import random
+import sqlite3
+from collections import Counter
+
+import pytest
+
+from bulk_deals_database import BulkDealsDatabase
+from bulk_deals_sqlite import SQLITE_FILENAME, SQLiteBulkDealsDatabase, migrate_json_to_sqlite
+from deal_aggregate import AggregateQuery
+from deal_query import DealQuery
+from deal_store import dedup_key
+
+
+def keys(deals):
+    return [dedup_key(d) for d in deals]
+
+
+@pytest.fixture
+def pair(deals, write_database):
+    """(in-memory database, SQLite database migrated from its JSON file), both after the same add_deals"""
+    deals = [dict(d) for d in deals]
+    undated = dict(deals[0], date='', scripCode='599999', clientName='UNDATED HOLDER')
+    data_dir = write_database(deals[:1200] + [undated])
+    assert migrate_json_to_sqlite(data_dir) == 1201
+    memory = BulkDealsDatabase(engine='columnar', data_dir=data_dir)
+    sqlite = SQLiteBulkDealsDatabase(data_dir=data_dir)
+    # The in-memory add also logs them, so check SQLite dedups its own copy
+    assert sqlite.add_deals([dict(d) for d in deals[1200:]] + [dict(d) for d in deals[1100:1300]]) == 300
+    memory.add_deals([dict(d) for d in deals[1200:]])
+    return memory, sqlite
+
+
+def test_rows_and_dedup(pair, deals):
+    memory, sqlite = pair
+    assert keys(sqlite.get_all_deals()) == keys(memory.get_all_deals())
+    variants = [dict(d, clientName=' ' + d['clientName'].title()) for d in deals[:40]]
+    assert sqlite.add_deals(variants) == 0
+    assert sqlite.get_stats() == memory.get_stats()
+    assert SQLiteBulkDealsDatabase(data_dir=sqlite.data_dir).get_stats()['total_deals'] == len(deals) + 1
+
+
+def test_lookups(pair, deals):
+    memory, sqlite = pair
+    for d in deals[::150]:
+        for start, end in ((None, None), ('2015-01-01', '2019-12-31')):
+            assert keys(sqlite.get_deals_by_scrip(d['scripCode'].lower(), start, end)) == \
+                keys(memory.get_deals_by_scrip(d['scripCode'], start, end))
+            assert keys(sqlite.get_deals_by_client(d['clientName'].lower(), start, end)) == \
+                keys(memory.get_deals_by_client(d['clientName'], start, end))
+    assert keys(sqlite.get_deals_by_date_range('2016-01-01', '2016-12-31', 'NSE')) == \
+        keys(memory.get_deals_by_date_range('2016-01-01', '2016-12-31', 'NSE'))
+    assert sqlite.count_deals('2013-01-01', '2014-06-30') == memory.count_deals('2013-01-01', '2014-06-30')
+
+
+def test_queries_and_top_deals(pair):
+    memory, sqlite = pair
+    rng = random.Random(5)
+    all_deals = memory.get_all_deals()
+    for _ in range(150):
+        picked = rng.choice(all_deals)
+        query = DealQuery(start=rng.choice([None, '2014-01-01', '2019-07-01']),
+                          end=rng.choice([None, '2021-12-31']),
+                          side=rng.choice([None, 'BUY', 'SELL']),
+                          exchange=rng.choice([None, 'NSE']),
+                          scrips=rng.choice([None, [picked['scripCode']]]),
+                          client=rng.choice([None, None, picked['clientName'].lower()]),
+                          text=rng.choice([None, 'company 4', 'huf']),
+                          min_value=rng.choice([None, 1e8]),
+                          sort=rng.choice(['-date', 'date', '-value', 'value']),
+                          limit=rng.choice([5, 50]), offset=rng.choice([0, 10]))
+        page, total, _ = sqlite.query(query)
+        expected, expected_total, _ = memory.query(query)
+        assert (total, keys(page)) == (expected_total, keys(expected)), vars(query)
+
+    for by in ('value', 'quantity'):
+        for window in ((None, None, None, None), ('2016-01-01', '2020-12-31', 'BSE', 'BUY')):
+            assert keys(sqlite.get_top_deals(25, by, *window)) == keys(memory.get_top_deals(25, by, *window))
+
+
+def test_aggregates(pair):
+    memory, sqlite = pair
+    for group_by in ('scrip', 'client', 'month', 'exchange'):
+        for start, end, side in ((None, None, None), ('2016-01-01', '2018-12-31', 'BUY'), (None, '2014-12-31', None)):
+            query = AggregateQuery(group_by, start=start, end=end, side=side, limit=100000)
+            groups, total = sqlite.aggregate(query)
+            expected, expected_total = memory.aggregate(query)
+            assert total == expected_total, (group_by, start, end)
+            by_key = {g['key']: g for g in expected}
+            for group in groups:
+                want = by_key[group['key']]
+                assert group['count'] == want['count'] and group['qty'] == want['qty']
+                assert group['value'] == pytest.approx(want['value'], abs=0.02)
+                assert group.get('name') == want.get('name')
+
+
+def walk(db, limit, start=None, end=None):
+    seen, cursor = [], None
+    while True:
+        page, cursor = db.get_deals_page(limit, cursor, start, end)
+        seen.extend(page)
+        if cursor is None:
+            return seen
+
+
+@pytest.mark.parametrize('engine', ['columnar', 'dict'])
+def test_undated_deals_sort_oldest_and_fall_in_no_window(deals, write_database, engine):
+    deals = [dict(d) for d in deals[:400]]
+    for i, raw in ((3, 'garbage'), (50, 'zz-unknown'), (51, ''), (52, '31/02/2020')):
+        deals[i]['date'] = raw
+    deals[53] = dict(deals[3], clientName='OTHER HOLDER', date='')
+    undated = set(keys([deals[i] for i in (3, 50, 51, 52, 53)]))
+    data_dir = write_database(deals)
+    migrate_json_to_sqlite(data_dir)
+    memory = BulkDealsDatabase(engine=engine, data_dir=data_dir)
+    sqlite = SQLiteBulkDealsDatabase(data_dir=data_dir)
+
+    for window in ((None, None), (None, '2020-12-31'), ('2015-01-01', None), ('bad', None), ('bad', 'worse'),
+                   ('2015-01-01', '2016-12-31'), ('bad', '2016-12-31')):
+        paged = [walk(db, 7, *window) for db in (memory, sqlite)]
+        assert Counter(keys(paged[0])) == Counter(keys(paged[1])), window
+        if window in ((None, None), ('bad', None)):
+            # Oldest of all: the last page ends with them
+            assert set(keys(paged[1][-len(undated):])) == undated
+        else:
+            assert not undated & set(keys(paged[1])), window
+        for db in (memory, sqlite):
+            assert keys(db.get_deals_by_scrip(deals[3]['scripCode'], *window)) == \
+                keys(memory.get_deals_by_scrip(deals[3]['scripCode'], *window)), window
+        assert keys(sqlite.get_top_deals(500, 'value', *window)) == keys(memory.get_top_deals(500, 'value', *window))
+        for sort in ('date', '-date'):
+            query = DealQuery(start=window[0], end=window[1], sort=sort, limit=500)
+            assert keys(sqlite.query(query)[0]) == keys(memory.query(query)[0]), (window, sort)
+        month = AggregateQuery('month', start=window[0], end=window[1], limit=500)
+        assert [(g['key'], g['count']) for g in sqlite.aggregate(month)[0]] == \
+            [(g['key'], g['count']) for g in memory.aggregate(month)[0]], window
+        assert sqlite.get_stats(*window) == memory.get_stats(*window), window
+        if all(window):
+            assert keys(sqlite.get_deals_by_date_range(*window)) == keys(memory.get_deals_by_date_range(*window))
+            assert sqlite.count_deals(*window) == memory.count_deals(*window)
+    assert keys(sqlite.search_deals('ltd', 400)) == keys(memory.search_deals('ltd', 400))
+    assert sqlite.store.date_bounds() == (min(d['date'] for d in memory.get_all_deals() if d['date'][:2] == '20'),
+                                          max(d['date'] for d in memory.get_all_deals() if d['date'][:2] == '20'))
+
+
+def test_older_files_get_the_iso_date_column(tmp_path):
+    path = os.path.join(tmp_path, SQLITE_FILENAME)
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("CREATE TABLE deals (id INTEGER PRIMARY KEY, date TEXT NOT NULL DEFAULT '', "
+                     "scripCode TEXT NOT NULL DEFAULT '', securityName TEXT NOT NULL DEFAULT '', "
+                     "clientName TEXT NOT NULL DEFAULT '', clientEntity TEXT NOT NULL DEFAULT '', "
+                     "side TEXT NOT NULL DEFAULT '', quantity INTEGER NOT NULL DEFAULT 0, "
+                     "price REAL NOT NULL DEFAULT 0, type TEXT NOT NULL DEFAULT '', "
+                     "exchange TEXT NOT NULL DEFAULT '', remarks TEXT NOT NULL DEFAULT '', extra TEXT)")
+        conn.execute("CREATE INDEX idx_deals_date ON deals(date)")
+        conn.executemany("INSERT INTO deals (date, scripCode, clientName, side, exchange) VALUES (?, ?, ?, ?, ?)",
+                         [('garbage', '500001', 'A', 'BUY', 'BSE'), ('2024-03-01', '500001', 'B', 'BUY', 'BSE'),
+                          ('', '500001', 'C', 'BUY', 'BSE'), ('2023-01-05', '500001', 'D', 'BUY', 'BSE')])
+    conn.close()
+
+    db = SQLiteBulkDealsDatabase(data_dir=str(tmp_path))
+    conn = db.store.connection()
+    assert [r[0] for r in conn.execute("SELECT isoDate FROM deals ORDER BY id")] == \
+        [None, '2024-03-01', None, '2023-01-05']
+    indexes = {r[1] for r in conn.execute("PRAGMA index_list(deals)")}
+    assert 'idx_deals_iso_date' in indexes and 'idx_deals_date' not in indexes
+    assert [d['clientName'] for d in walk(db, 1)] == ['B', 'D', 'C', 'A']
+    assert [d['clientName'] for d in db.query(DealQuery(start='bad', end='worse'))[0]] == []
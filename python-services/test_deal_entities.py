@@ -0,0 +1,190 @@
+"""Client name normalization, investor entities and the clientEntity stored with each deal"""
+
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+
+import pytest
+
+from bulk_deals_database import BulkDealsDatabase
+from deal_aggregate import AggregateQuery
+from deal_entities import ClientEntities, canonical_client_name
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(HERE)
+FIXTURES = os.path.join(HERE, 'testdata', 'client_names.json')
+TS_MODULE = os.path.join(REPO_ROOT, 'src', 'lib', 'bulk-deals', 'clientNames.ts')
+
+# Transpiles clientNames.ts with the app's typescript and prints canonicalClientName of every fixture
+TS_SCRIPT = r"""
+const fs = require("fs")
+let ts
+try {
+  ts = require("typescript")
+} catch {
+  process.exit(3)
+}
+const [source, fixtures] = process.argv.slice(1)
+const { outputText } = ts.transpileModule(fs.readFileSync(source, "utf-8"), {
+  compilerOptions: { module: ts.ModuleKind.CommonJS },
+})
+const module_ = { exports: {} }
+new Function("module", "exports", outputText)(module_, module_.exports)
+const names = JSON.parse(fs.readFileSync(fixtures, "utf-8")).map(([raw]) => raw)
+process.stdout.write(JSON.stringify(names.map(module_.exports.canonicalClientName)))
+"""
+
+LONG_NAME = 'GOLDMAN SACHS INVESTMENTS MAURITIUS LTD'
+LONG_TYPO = 'GOLDMAN SACHS INVESTMENT MAURITIUS LTD'
+
+
+def fixtures():
+    with open(FIXTURES, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def deal(client, day=1, scrip='500001'):
+    return {'date': f'2024-03-{day:02d}', 'scripCode': scrip, 'securityName': 'COMPANY 1 LTD',
+            'clientName': client, 'side': 'BUY', 'quantity': 1000, 'price': 10.0, 'type': 'bulk',
+            'exchange': 'BSE'}
+
+
+def entities_by_client(db):
+    return {d['clientName']: d['clientEntity'] for d in db.get_all_deals()}
+
+
+def test_canonical_client_names():
+    cases = fixtures()
+    assert [canonical_client_name(raw) for raw, _ in cases] == [canonical for _, canonical in cases]
+
+
+def test_typescript_canonical_client_names_match():
+    node = shutil.which('node')
+    if not node:
+        pytest.skip('node not installed')
+    result = subprocess.run([node, '-e', TS_SCRIPT, TS_MODULE, FIXTURES], cwd=REPO_ROOT,
+                            capture_output=True, text=True, timeout=60)
+    if result.returncode == 3:
+        pytest.skip('typescript not installed (npm install)')
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout) == [canonical for _, canonical in fixtures()]
+
+
+def test_spellings_merge_into_one_entity():
+    entities = ClientEntities()
+    key = entities.assign('ABC CAPITAL PVT. LTD.')
+    assert key == 'ABC CAPITAL PRIVATE LIMITED'
+    for spelling in ('Abc Capital Private Limited', 'M/S ABC CAPITAL (P) LTD', 'ABCCAPITAL PRIVATE LIMITED'):
+        assert entities.assign(spelling) == key
+    # One edit in a long name joins it; short or numbered names never merge on a typo
+    assert entities.assign(LONG_NAME) != key
+    assert entities.assign(LONG_TYPO) == canonical_client_name(LONG_NAME)
+    assert entities.assign('FUND 1') != entities.assign('FUND 2')
+    assert entities.assign('SHAH NIKHIL') != entities.assign('SHAH NIKHL')
+    assert sorted(entities.aliases('abc capital pvt ltd')) == sorted(
+        ['ABC CAPITAL PVT. LTD.', 'Abc Capital Private Limited', 'M/S ABC CAPITAL (P) LTD', 'ABCCAPITAL PRIVATE LIMITED'])
+
+
+def test_stored_entity_wins_and_lookups_register_nothing():
+    entities = ClientEntities()
+    assert entities.assign(LONG_TYPO, 'SOME OTHER INVESTOR') == 'SOME OTHER INVESTOR'
+    assert entities.key(LONG_TYPO) == 'SOME OTHER INVESTOR'
+    # A new spelling of it resolves there too, but only assign() records it
+    assert entities.key(LONG_NAME) == 'SOME OTHER INVESTOR'
+    assert len(entities) == 1 and entities.aliases(LONG_NAME) == [LONG_TYPO]
+
+
+@pytest.mark.parametrize('engine', ['columnar', 'dict'])
+def test_workers_agree_on_entities_whatever_order_they_saw_names(write_database, engine):
+    data_dir = write_database([deal('ABC CAPITAL PVT LTD')])
+    first = BulkDealsDatabase(engine=engine, data_dir=data_dir)
+    second = BulkDealsDatabase(engine=engine, data_dir=data_dir)
+    # Each worker stores one spelling before seeing the other's: recomputing in
+    # first-seen order would file the pair under a different entity on each
+    first.add_deals([deal(LONG_NAME, 2)])
+    second.add_deals([deal(LONG_TYPO, 3)])
+    first.refresh()
+    second.refresh()
+    reloaded = BulkDealsDatabase(engine=engine, data_dir=data_dir)
+    first.compact()
+    compacted = BulkDealsDatabase(engine=engine, data_dir=data_dir)
+
+    expected = entities_by_client(first)
+    for db in (second, reloaded, compacted):
+        assert entities_by_client(db) == expected
+        for name in (LONG_NAME, LONG_TYPO):
+            assert db.get_deals_by_client(name) == first.get_deals_by_client(name)
+
+    # A worker that already knows the long name merges the typo into it, for everyone
+    first.add_deals([deal(LONG_NAME.replace('INVESTMENTS', 'INVESTMENTSS'), 4)])
+    second.refresh()
+    assert entities_by_client(second) == entities_by_client(first)
+    assert len(second.get_deals_by_client(LONG_NAME)) == 2
+
+
+def test_deals_stored_without_entities_get_them_once(write_database):
+    data_dir = write_database([deal('ABC CAPITAL PVT LTD', 1), deal('abc capital private limited', 2)])
+    BulkDealsDatabase(engine='columnar', data_dir=data_dir)
+    with open(os.path.join(data_dir, 'bulk_deals_database.json'), encoding='utf-8') as f:
+        stored = json.load(f)['deals']
+    assert [d['clientEntity'] for d in stored] == ['ABC CAPITAL PRIVATE LIMITED'] * 2
+
+    db = BulkDealsDatabase(engine='columnar', data_dir=data_dir)
+    assert len(db.get_deals_by_client('Abc Capital (P) Ltd')) == 2
+    assert db.get_stats()['unique_clients'] == 1
+
+
+def test_sqlite_fills_the_entity_column_of_older_files(tmp_path):
+    from bulk_deals_sqlite import SQLITE_FILENAME, SQLiteBulkDealsDatabase
+    conn = sqlite3.connect(os.path.join(tmp_path, SQLITE_FILENAME))
+    with conn:
+        conn.execute("CREATE TABLE deals (id INTEGER PRIMARY KEY, date TEXT NOT NULL DEFAULT '', "
+                     "scripCode TEXT NOT NULL DEFAULT '', securityName TEXT NOT NULL DEFAULT '', "
+                     "clientName TEXT NOT NULL DEFAULT '', side TEXT NOT NULL DEFAULT '', "
+                     "quantity INTEGER NOT NULL DEFAULT 0, price REAL NOT NULL DEFAULT 0, "
+                     "type TEXT NOT NULL DEFAULT '', exchange TEXT NOT NULL DEFAULT '', "
+                     "remarks TEXT NOT NULL DEFAULT '', extra TEXT)")
+        conn.executemany("INSERT INTO deals (date, scripCode, clientName, side, exchange) VALUES (?, ?, ?, ?, ?)",
+                         [('2024-03-01', '500001', LONG_NAME, 'BUY', 'BSE'),
+                          ('2024-03-02', '500001', LONG_TYPO, 'BUY', 'BSE')])
+    conn.close()
+
+    db = SQLiteBulkDealsDatabase(data_dir=str(tmp_path))
+    entity = canonical_client_name(LONG_NAME)
+    assert [d['clientEntity'] for d in db.get_all_deals()] == [entity, entity]
+    db.add_deals([deal(LONG_TYPO.lower(), 3)])
+    assert len(db.get_deals_by_client(LONG_TYPO)) == 3
+    groups, total = db.aggregate(AggregateQuery('client'))
+    assert total == 1 and groups[0]['key'] == entity and groups[0]['count'] == 3
+    assert SQLiteBulkDealsDatabase(data_dir=str(tmp_path)).get_stats()['unique_clients'] == 1
+
+
+@pytest.mark.parametrize('engine', ['columnar', 'dict'])
+def test_deals_that_now_share_a_dedup_key_are_all_kept(write_database, engine):
+    # A file from before keys were canonical: spellings of one investor's deal and an old exact repeat
+    spellings = ['ABC PVT LTD', 'ABC PRIVATE LIMITED', 'M/S ABC Pvt. Ltd.', 'ABC PVT LTD']
+    stored = [deal(client) for client in spellings] + [deal('XYZ HOLDINGS', day) for day in range(2, 6)]
+    data_dir = write_database(stored)
+    upgraded = BulkDealsDatabase(engine=engine, data_dir=data_dir)
+    rebooted = BulkDealsDatabase(engine=engine, data_dir=data_dir)
+
+    for db in (upgraded, rebooted):
+        assert [d['clientName'] for d in db.get_all_deals()] == [d['clientName'] for d in stored]
+        assert db.get_stats()['total_deals'] == len(stored)
+        assert len(db.get_deals_by_client('abc private limited')) == len(spellings)
+        # Each shared key still turns away a further spelling
+        assert db.add_deals([deal('Abc (P) Ltd')]) == 0
+        served, cursor = [], None
+        while True:
+            page, cursor = db.get_deals_page(1, cursor)
+            served += page
+            if cursor is None:
+                break
+        assert len(served) == len(stored)
+
+    upgraded.compact()
+    with open(os.path.join(data_dir, 'bulk_deals_database.json'), encoding='utf-8') as f:
+        assert len(json.load(f)['deals']) == len(stored)
+    assert len(BulkDealsDatabase(engine=engine, data_dir=data_dir).get_all_deals()) == len(stored)
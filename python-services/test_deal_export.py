@@ -0,0 +1,63 @@
+"""Parquet / Arrow exports read back as the deals they were written from"""
+
+import os
+
+import pytest
+
+from bulk_deals_database import BulkDealsDatabase
+from bulk_deals_sqlite import SQLiteBulkDealsDatabase
+from deal_store import DEAL_FIELDS, date_to_ordinal
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+
+def read_back(path, fmt):
+    if fmt == 'parquet':
+        table = pq.read_table(path)
+    else:
+        with pa.memory_map(path) as source:
+            table = pa.ipc.open_file(source).read_all()
+    columns = {f: table.column(f).to_pylist() for f in DEAL_FIELDS}
+    columns['date'] = [d.isoformat() if d else '' for d in columns['date']]
+    return [dict(zip(DEAL_FIELDS, row)) for row in zip(*(columns[f] for f in DEAL_FIELDS))]
+
+
+def expected_rows(db, start=None, end=None):
+    _, chunks = db.iter_deals(start, end)
+    # Dates that do not parse are exported as null
+    return [dict({f: d.get(f, '') for f in DEAL_FIELDS}, date=d['date'] if date_to_ordinal(d['date']) else '')
+            for chunk in chunks for d in chunk]
+
+
+@pytest.mark.parametrize('backend', ['columnar', 'dict', 'sqlite'])
+def test_exports_round_trip(deals, write_database, backend):
+    deals = [dict(d) for d in deals]
+    deals[9]['date'] = 'sometime in May'
+    data_dir = write_database(deals[:1200])
+    if backend == 'sqlite':
+        db = SQLiteBulkDealsDatabase(data_dir=data_dir)
+        db.add_deals(deals[:1200])
+    else:
+        BulkDealsDatabase(engine=backend, data_dir=data_dir)
+        # Booted from the snapshot the first worker wrote, when columnar
+        db = BulkDealsDatabase(engine=backend, data_dir=data_dir)
+    db.add_deals(deals[1200:])
+    # As the server does before each request
+    db.refresh()
+
+    for fmt in ('parquet', 'arrow'):
+        for start, end in ((None, None), ('2016-01-01', '2019-06-30')):
+            path = db.export(fmt, start, end)
+            assert db.export(fmt, start, end) == path
+            rows = read_back(path, fmt)
+            assert len(rows) == (len(deals) if start is None else db.count_deals(start, end))
+            assert rows == expected_rows(db, start, end), (fmt, start)
+
+    # A new generation writes a new file and prunes the old ones
+    old = db.export('parquet')
+    db.add_deals([dict(deals[0], date='2025-12-31', scripCode='500999')])
+    db.refresh()
+    new = db.export('parquet')
+    assert new != old and not os.path.exists(old)
+    assert len(read_back(new, 'parquet')) == len(deals) + 1
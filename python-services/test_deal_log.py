@@ -0,0 +1,100 @@
+"""Deal log change feed, dedup on insert, replay on other workers and compaction"""
+
+import json
+import os
+
+import pytest
+
+from bulk_deals_database import BulkDealsDatabase, DATABASE_FILENAME, LOG_FILENAME
+from deal_log import DealLog
+from deal_store import dedup_key
+
+
+def keys(deals):
+    return sorted(dedup_key(d) for d in deals)
+
+
+@pytest.fixture
+def log(tmp_path):
+    return DealLog(str(tmp_path / 'deals.jsonl'), str(tmp_path / 'deals.lock'))
+
+
+def test_readers_follow_appends_and_one_rotation(log):
+    assert log.position() == {'generation': 0, 'epoch': 0}
+    log.append([{'n': 1}, {'n': 2}])
+    deals, epoch, offset = log.read_since(0, 0)
+    assert deals == [{'n': 1}, {'n': 2}] and epoch == 0
+
+    log.append([{'n': 3}])
+    assert log.read_since(epoch, offset)[0] == [{'n': 3}]
+    # A torn trailing line is not returned until it is complete
+    with open(log.path, 'a', encoding='utf-8') as f:
+        f.write('{"n": 4')
+    _, _, offset = log.read_since(0, 0)
+    with open(log.path, 'a', encoding='utf-8') as f:
+        f.write('}\n')
+    log.append([{'n': 5}])
+    assert log.read_since(0, offset)[0] == [{'n': 4}, {'n': 5}]
+    assert log.position()['generation'] == 3
+
+    log.rotate()
+    log.append([{'n': 6}])
+    # One compaction behind: the rest of the rotated log, then the new one
+    assert log.read_since(0, offset)[0] == [{'n': 4}, {'n': 5}, {'n': 6}]
+    assert log.read() == [{'n': 6}]
+    log.rotate()
+    assert log.read_since(0, offset) is None
+
+
+def test_duplicates_are_skipped_in_any_spelling(deals, write_database):
+    db = BulkDealsDatabase(engine='columnar', data_dir=write_database([dict(d) for d in deals[:1000]]))
+    variants = [dict(d, clientName=d['clientName'].lower() + ' ') for d in deals[900:1000]]
+    assert db.add_deals(variants + [dict(d) for d in deals[:50]]) == 0
+    assert db.add_deals([dict(d) for d in deals[1000:]] + [dict(d) for d in deals[1000:1100]]) == 500
+    assert len(db.store) == len(deals) == db.metadata['total_deals']
+    assert db.metadata['last_update_added'] == 500
+    assert len(DealLog(os.path.join(db.data_dir, LOG_FILENAME), db.log.lock_path).read()) == 500
+
+
+def test_other_workers_replay_the_log(deals, write_database):
+    data_dir = write_database([dict(d) for d in deals[:1000]])
+    writer = BulkDealsDatabase(engine='columnar', data_dir=data_dir)
+    reader = BulkDealsDatabase(engine='dict', data_dir=data_dir)
+    writer.add_deals([dict(d) for d in deals[1000:1200]])
+    assert reader.refresh() == 200
+    assert reader.refresh() == 0
+    assert reader.generation == writer.log.position()['generation']
+    # Its own appends come back through the feed and are skipped
+    reader.add_deals([dict(d) for d in deals[1200:]])
+    assert reader.refresh() == 0
+    assert writer.refresh() == 300
+
+    booted = BulkDealsDatabase(engine='columnar', data_dir=data_dir)
+    for db in (writer, reader, booted):
+        assert keys(db.get_all_deals()) == keys(deals)
+        assert db.get_stats()['total_deals'] == len(deals)
+
+
+def test_compaction_folds_the_log_into_the_snapshot(deals, write_database):
+    data_dir = write_database([dict(d) for d in deals[:1000]])
+    writer = BulkDealsDatabase(engine='columnar', data_dir=data_dir)
+    behind = BulkDealsDatabase(engine='columnar', data_dir=data_dir)
+    writer.add_deals([dict(d) for d in deals[1000:1250]])
+    # Another process logs a duplicate spelling meanwhile; compaction must not store it twice
+    DealLog(os.path.join(data_dir, LOG_FILENAME), writer.log.lock_path).append(
+        [dict(deals[1100], clientName=deals[1100]['clientName'].lower())])
+    assert writer.compact() == 250
+    assert writer.log.read() == []
+    with open(os.path.join(data_dir, DATABASE_FILENAME), encoding='utf-8') as f:
+        assert keys(json.load(f)['deals']) == keys(deals[:1250])
+
+    # One compaction behind: catches up through the rotated log
+    assert behind.refresh() == 250
+    writer.add_deals([dict(d) for d in deals[1250:1300]])
+    writer.compact()
+    writer.add_deals([dict(d) for d in deals[1300:]])
+    writer.compact()
+    # Two behind: falls back to a full reload
+    behind.refresh()
+    assert keys(behind.get_all_deals()) == keys(deals)
+    assert keys(BulkDealsDatabase(engine='dict', data_dir=data_dir).get_all_deals()) == keys(deals)
@@ -0,0 +1,177 @@
+"""Query planner, top-K and group-by results against brute-force scans of every deal"""
+
+import random
+from collections import defaultdict
+from datetime import date
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from bulk_deals_database import BulkDealsDatabase
+from deal_aggregate import AGGREGATE_METRICS, AggregateQuery
+from deal_indexes import TOP_METRICS, exchange_class, scrip_key, search_key, side_class, type_key
+from deal_query import DealQuery
+from deal_store import date_to_ordinal, dedup_key
+
+
+@pytest.fixture(params=['columnar', 'dict'])
+def db(request, deals, write_database):
+    """A database booted from 1,200 deals (plus an undated one) that then ingested the rest"""
+    deals = [dict(d) for d in deals]
+    for d in deals[::7]:
+        d['type'] = 'Block'
+    for d in deals[::11]:
+        d['side'] = 'B'
+    undated = dict(deals[0], date='', scripCode='599999', clientName='UNDATED HOLDER')
+    database = BulkDealsDatabase(engine=request.param, data_dir=write_database(deals[:1200] + [undated]))
+    database.add_deals(deals[1200:])
+    return database
+
+
+def ordinal(deal):
+    return date_to_ordinal(deal['date'])
+
+
+def value(deal):
+    return deal['quantity'] * deal['price']
+
+
+def matches(db, query, deal):
+    """Whether a deal passes every filter of query, tested field by field"""
+    lo = date_to_ordinal(query.start) if query.start else 0
+    hi = date_to_ordinal(query.end) if query.end else 2 ** 31 - 1
+    if (query.start or query.end) and not (max(lo, 1) <= ordinal(deal) <= hi):
+        return False
+    if query.exchange and exchange_class(deal['exchange']) != exchange_class(query.exchange):
+        return False
+    if query.side and side_class(deal['side']) != side_class(query.side):
+        return False
+    if query.deal_type and type_key(deal['type']) != type_key(query.deal_type):
+        return False
+    if query.scrips and scrip_key(deal['scripCode']) not in {scrip_key(s) for s in query.scrips}:
+        return False
+    if query.client and deal['clientEntity'] != db.client_entities.key(query.client):
+        return False
+    text = search_key(query.text)
+    if text and text not in search_key(deal['securityName']) and text not in search_key(deal['clientName']):
+        return False
+    if query.min_value is not None and value(deal) < query.min_value:
+        return False
+    return query.max_value is None or value(deal) <= query.max_value
+
+
+def brute_query(db, query):
+    all_deals = db.get_all_deals()
+    found = [i for i, d in enumerate(all_deals) if matches(db, query, d)]
+    sign = -1 if query.descending else 1
+    if query.sort_field == 'date':
+        found.sort(key=lambda i: (sign * ordinal(all_deals[i]), sign * i))
+    else:
+        found.sort(key=lambda i: (sign * value(all_deals[i]), sign * ordinal(all_deals[i]), sign * i))
+    return [all_deals[i] for i in found[query.offset:query.offset + query.limit]], len(found)
+
+
+def random_query(rng, all_deals):
+    picked = rng.choice(all_deals)
+    args = {}
+    if rng.random() < 0.6:
+        start = date(rng.randint(2012, 2025), rng.randint(1, 12), 1)
+        args['start'] = start.isoformat()
+        args['end'] = date(min(start.year + rng.choice([0, 1, 4]), 2025), 12, 31).isoformat()
+    if rng.random() < 0.3:
+        args['exchange'] = rng.choice(['BSE', 'nse'])
+    if rng.random() < 0.4:
+        args['side'] = rng.choice(['BUY', 'sell', 'B'])
+    if rng.random() < 0.2:
+        args['type'] = rng.choice(['block', 'BULK '])
+    if rng.random() < 0.3:
+        args['scrip'] = ','.join({picked['scripCode'], rng.choice(all_deals)['scripCode'].lower()})
+    if rng.random() < 0.25:
+        args['client'] = rng.choice([picked['clientName'], picked['clientName'].lower()])
+    if rng.random() < 0.3:
+        args['q'] = rng.choice(['company 12', 'CLIENT 3', 'huf', 'ltd', 'zzz', picked['securityName'][-7:]])
+    if rng.random() < 0.3:
+        args['min_value'] = str(rng.choice([1e6, 1e8, 1e9]))
+    if rng.random() < 0.2:
+        args['max_value'] = str(rng.choice([1e7, 5e9]))
+    args['sort'] = rng.choice(['-date', 'date', '-value', 'value'])
+    args['offset'] = str(rng.choice([0, 0, 5, 40]))
+    return DealQuery.from_args(MultiDict(args), limit=rng.choice([1, 10, 50]))
+
+
+def test_planner_matches_a_full_scan(db):
+    rng = random.Random(11)
+    all_deals = db.get_all_deals()
+    drivers = set()
+    for _ in range(300):
+        query = random_query(rng, all_deals)
+        page, total, plan = db.query(query)
+        expected, expected_total = brute_query(db, query)
+        assert (total, [dedup_key(d) for d in page]) == (expected_total, [dedup_key(d) for d in expected]), vars(query)
+        drivers.add(plan['driver'])
+    assert drivers >= {'scan', 'date', 'scrip', 'client', 'trigram'}
+
+
+def test_query_args_are_validated():
+    for args in ({'sort': 'size'}, {'side': 'HOLD'}, {'exchange': 'LSE'}, {'offset': 'x'}, {'min_value': 'lots'}):
+        with pytest.raises(ValueError):
+            DealQuery.from_args(MultiDict(args), limit=10)
+
+
+def test_top_deals_match_a_full_sort(db):
+    all_deals = db.get_all_deals()
+    metrics = {'value': value, 'quantity': lambda d: d['quantity']}
+    for by in TOP_METRICS:
+        for start, end, exchange, side in ((None, None, None, None), ('2015-03-01', '2019-08-31', None, 'BUY'),
+                                           ('2020-01-01', '2020-01-31', 'NSE', None), (None, '2013-06-30', 'BSE', 'SELL')):
+            query = DealQuery(start=start, end=end, exchange=exchange, side=side)
+            found = [i for i, d in enumerate(all_deals) if matches(db, query, d)]
+            found.sort(key=lambda i: (metrics[by](all_deals[i]), ordinal(all_deals[i]), i), reverse=True)
+            for k in (1, 7, 100):
+                top = db.get_top_deals(k, by, start, end, exchange, side)
+                assert [dedup_key(d) for d in top] == [dedup_key(all_deals[i]) for i in found[:k]], (by, start, k)
+
+
+def group_key(group_by, deal):
+    if group_by == 'scrip':
+        return scrip_key(deal['scripCode'])
+    if group_by == 'client':
+        return deal['clientEntity']
+    if group_by == 'month':
+        return deal['date'][:7]
+    return ('', 'BSE', 'NSE')[exchange_class(deal['exchange'])]
+
+
+def test_aggregates_match_a_full_scan(db):
+    all_deals = db.get_all_deals()
+    for group_by in ('scrip', 'client', 'month', 'exchange'):
+        for start, end, side in ((None, None, None), ('2016-01-01', '2017-12-31', 'SELL')):
+            query = AggregateQuery(group_by, start=start, end=end, side=side, limit=100000)
+            window = DealQuery(start=start, end=end, side=side)
+            expected = defaultdict(lambda: dict.fromkeys(AGGREGATE_METRICS, 0))
+            names = {}
+            for d in all_deals:
+                if not matches(db, window, d):
+                    continue
+                group = expected[group_key(group_by, d)]
+                group['count'] += 1
+                group['qty'] += d['quantity']
+                group['value'] += value(d)
+                group['net_value'] += {1: value(d), 2: -value(d)}.get(side_class(d['side']), 0)
+                names[group_key(group_by, d)] = d['clientName' if group_by == 'client' else 'securityName']
+
+            groups, total = db.aggregate(query)
+            assert total == len(expected) == len(groups), (group_by, start)
+            for group in groups:
+                want = expected[group['key']]
+                assert (group['count'], group['qty']) == (want['count'], want['qty'])
+                assert group['value'] == pytest.approx(want['value'], abs=0.01)
+                assert group['net_value'] == pytest.approx(want['net_value'], abs=0.01)
+                if group_by in ('scrip', 'client'):
+                    # Named after the group's latest deal
+                    assert group['name'] == names[group['key']]
+            sort_key = [g['key'] for g in groups] if query.sort_field == 'key' else [-g['value'] for g in groups]
+            assert sort_key == sorted(sort_key)
+
+            top = db.aggregate(AggregateQuery(group_by, start=start, end=end, side=side, sort='-count', limit=5))[0]
+            assert [g['count'] for g in top] == sorted((g['count'] for g in expected.values()), reverse=True)[:5]
@@ -0,0 +1,94 @@
+"""Binary snapshot round trip, and workers booted from it answering like ones booted from JSON"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+from bulk_deals_database import BulkDealsDatabase, DATABASE_FILENAME
+from deal_aggregate import AggregateQuery
+from deal_indexes import key_hash, key_hashes
+from deal_query import DealQuery
+from deal_snapshot import FORMAT_VERSION, MANIFEST_FILENAME, load_snapshot, read_manifest, write_snapshot
+from deal_store import ColumnarDealStore, ShardedDealStore, dedup_key
+
+SOURCE = {'size': 1, 'mtime_ns': 1}
+
+
+def test_round_trip(deals, tmp_path):
+    snapshot_dir = str(tmp_path)
+    store = ColumnarDealStore.from_dicts(deals)
+    manifest = write_snapshot(snapshot_dir, store, SOURCE)
+    assert manifest['format_version'] == FORMAT_VERSION and manifest['rows'] == len(deals)
+    assert len(manifest['shards']) > 1
+
+    loaded, dedup_index, hashes = load_snapshot(snapshot_dir, SOURCE)
+    assert isinstance(loaded, ShardedDealStore)
+    assert loaded.to_dicts() == store.to_dicts()
+    np.testing.assert_array_equal(hashes, key_hashes(dedup_key(d) for d in deals))
+    assert len(dedup_index) == len(deals)
+    assert not dedup_index.add_hash(key_hash(dedup_key(deals[42])))
+
+    # The latest year is the mutable tail; a new generation replaces the old one
+    offset = loaded.append(dict(deals[0], date='2026-01-02'))
+    assert offset == len(deals) and loaded.get(offset)['date'] == '2026-01-02'
+    second = write_snapshot(snapshot_dir, ColumnarDealStore.from_dicts(loaded.to_dicts()), SOURCE)
+    assert second['generation'] == manifest['generation'] + 1
+    assert len(load_snapshot(snapshot_dir, SOURCE)[0]) == len(deals) + 1
+
+
+def test_stale_or_damaged_snapshots_are_ignored(deals, tmp_path):
+    snapshot_dir = str(tmp_path)
+    write_snapshot(snapshot_dir, ColumnarDealStore.from_dicts(deals), SOURCE)
+    assert load_snapshot(snapshot_dir, dict(SOURCE, size=2)) is None
+    assert load_snapshot(snapshot_dir, None) is None
+
+    manifest = read_manifest(snapshot_dir)
+    with open(os.path.join(snapshot_dir, MANIFEST_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump(dict(manifest, format_version=FORMAT_VERSION - 1), f)
+    assert load_snapshot(snapshot_dir, SOURCE) is None
+
+    with open(os.path.join(snapshot_dir, MANIFEST_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.remove(os.path.join(snapshot_dir, manifest['directory'], 'keys.npy'))
+    assert load_snapshot(snapshot_dir, SOURCE) is None
+
+
+@pytest.fixture
+def booted(deals, write_database):
+    """(worker booted from JSON, worker booted from the snapshot the first one wrote), both caught up"""
+    data_dir = write_database([dict(d) for d in deals[:1200]])
+    from_json = BulkDealsDatabase(engine='columnar', data_dir=data_dir)
+    from_snapshot = BulkDealsDatabase(engine='columnar', data_dir=data_dir)
+    assert isinstance(from_snapshot.store, ShardedDealStore)
+    assert not isinstance(from_json.store, ShardedDealStore)
+    from_json.add_deals([dict(d) for d in deals[1200:]])
+    from_snapshot.refresh()
+    return from_json, from_snapshot
+
+
+def test_workers_agree_however_they_booted(booted):
+    first, second = booted
+    assert second.get_all_deals() == first.get_all_deals()
+    assert second.get_deals_by_date_range('2016-01-01', '2018-12-31') == \
+        first.get_deals_by_date_range('2016-01-01', '2018-12-31')
+    assert second.count_deals('2016-01-01', '2018-12-31', 'BSE') == first.count_deals('2016-01-01', '2018-12-31', 'BSE')
+    # Ties in these are broken by offset, so the offsets must agree too
+    assert second.get_top_deals(50, 'quantity') == first.get_top_deals(50, 'quantity')
+    assert second.search_deals('company 1', 40) == first.search_deals('company 1', 40)
+    query = DealQuery(start='2013-01-01', end='2020-12-31', side='BUY', sort='-date', limit=60, offset=30)
+    assert second.query(query)[:2] == first.query(query)[:2]
+    for group_by in ('scrip', 'client', 'month'):
+        assert second.aggregate(AggregateQuery(group_by, limit=30)) == first.aggregate(AggregateQuery(group_by, limit=30))
+    assert second.get_stats('2014-01-01', '2014-12-31', daily=True) == first.get_stats('2014-01-01', '2014-12-31', daily=True)
+
+
+def test_reopen_after_compaction(booted, deals):
+    first, _ = booted
+    first.compact()
+    reopened = BulkDealsDatabase(engine='columnar', data_dir=first.data_dir)
+    assert isinstance(reopened.store, ShardedDealStore)
+    assert reopened.get_all_deals() == first.get_all_deals()
+    with open(os.path.join(first.data_dir, DATABASE_FILENAME), encoding='utf-8') as f:
+        assert len(json.load(f)['deals']) == len(deals)
@@ -0,0 +1,74 @@
+"""The storage engines answer every read the same way, in the same (offset) order"""
+
+import numpy as np
+import pytest
+
+from deal_snapshot import load_snapshot, write_snapshot
+from deal_store import ColumnarDealStore, create_store, dedup_key, normalize_date
+
+
+@pytest.fixture
+def stores(deals, tmp_path):
+    """dict, columnar and snapshot-loaded sharded stores over the same deals, plus appends since"""
+    deals = [dict(d) for d in deals]
+    deals[3]['remarks'] = 'block window'
+    deals[5]['date'] = 'sometime in May'
+    deals[8]['source'] = 'csv'
+    head, added = deals[:1400], deals[1400:]
+    source = {'size': 1, 'mtime_ns': 1}
+    write_snapshot(str(tmp_path), ColumnarDealStore.from_dicts(head), source)
+    sharded, _, _ = load_snapshot(str(tmp_path), source)
+    built = {'dict': create_store('dict', [dict(d) for d in head]),
+             'columnar': create_store('columnar', head),
+             'sharded': sharded}
+    for store in built.values():
+        for deal in added:
+            store.append(dict(deal))
+    return deals, built
+
+
+def test_normalize_date():
+    for raw in ('2024-03-01', '01/03/2024', '01-03-2024', '01-Mar-2024', '01-March-2024', '2024/03/01', '1/3/2024'):
+        assert normalize_date(raw) == '2024-03-01'
+    assert normalize_date('') == ''
+    assert normalize_date('sometime in May') == 'sometime in May'
+
+
+def test_dedup_key_ignores_client_spelling():
+    deal = {'date': '2024-03-01', 'scripCode': '500001', 'clientName': 'ABC CAPITAL PVT. LTD.',
+            'side': 'BUY', 'exchange': 'BSE'}
+    assert dedup_key(deal) == dedup_key(dict(deal, clientName='M/S Abc Capital (P) Ltd'))
+    assert dedup_key(deal) != dedup_key(dict(deal, side='SELL'))
+
+
+def test_engines_return_the_same_rows(stores):
+    deals, built = stores
+    expected = built['dict'].to_dicts()
+    assert [d['scripCode'] for d in expected] == [d['scripCode'] for d in deals]
+    for engine, store in built.items():
+        assert len(store) == len(deals), engine
+        rows = store.to_dicts()
+        for field in ('date', 'scripCode', 'securityName', 'clientName', 'side', 'quantity', 'price', 'exchange'):
+            assert [r.get(field) for r in rows] == [d.get(field) for d in expected], (engine, field)
+        assert rows[3]['remarks'] == 'block window' and rows[8]['source'] == 'csv', engine
+        picked = [1450, 7, 3, 1399, 0]
+        assert [store.get(i)['clientName'] for i in picked] == [expected[i]['clientName'] for i in picked], engine
+        assert list(store.dedup_keys()) == list(built['dict'].dedup_keys()), engine
+        np.testing.assert_array_equal(store.date_ordinals(), built['dict'].date_ordinals())
+        np.testing.assert_allclose(store.deal_values(), built['dict'].deal_values())
+
+
+def test_engines_find_the_same_offsets(stores):
+    deals, built = stores
+    client = deals[700]['clientName']
+    for engine, store in built.items():
+        assert list(store.offsets_between('2015-01-01', '2016-12-31')) == \
+            [i for i, d in enumerate(deals) if '2015-01-01' <= d['date'] <= '2016-12-31'], engine
+        assert list(store.offsets_equal('clientName', client.lower(), ignore_case=True)) == \
+            [i for i, d in enumerate(deals) if d['clientName'] == client], engine
+        within = list(range(0, len(deals), 3))
+        assert list(store.offsets_equal('exchange', 'NSE', within=within)) == \
+            [i for i in within if deals[i]['exchange'] == 'NSE'], engine
+        assert list(store.offsets_matching('securityName', lambda v: v.endswith('7 LTD'))) == \
+            [i for i, d in enumerate(deals) if d['securityName'].endswith('7 LTD')], engine
+        assert store.value_counts('side') == built['dict'].value_counts('side'), engine
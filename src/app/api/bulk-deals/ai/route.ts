@@ -1,6 +1,5 @@
 import { NextRequest, NextResponse } from "next/server"
-import fs from "fs/promises"
-import path from "path"
+import { loadBulkDealsDatabase } from "@/lib/bulk-deals/database"
 import OpenAI from "openai"
 
 export const dynamic = "force-dynamic"
@@ -16,12 +15,9 @@ function rupeeCompact(value: number): string {
 
 async function loadDeals(start: string, end: string) {
   try {
-    const projectRoot = process.cwd()
-    const dbPath = path.join(projectRoot, "python-services", "data", "bulk-deals", "bulk_deals_database.json")
-    const dbFile = await fs.readFile(dbPath, "utf-8")
-    const database = JSON.parse(dbFile)
+    const database = await loadBulkDealsDatabase()
     
-    return (database.deals || []).filter((d: any) => {
+    return database.deals.filter((d: any) => {
       const date = d.date || ""
       return date >= start && date <= end
     })
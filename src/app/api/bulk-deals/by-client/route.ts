@@ -0,0 +1,38 @@
+import { NextRequest, NextResponse } from "next/server"
+import { getDealsByClient } from "@/lib/bulk-deals/database"
+import { cacheHeaders, dealsETag, notModified } from "@/lib/bulk-deals/etag"
+
+export const dynamic = "force-dynamic"
+export const revalidate = 0
+export const runtime = "nodejs"
+
+// A client's deals, newest first, from the per-client posting list
+export async function GET(request: NextRequest) {
+  try {
+    const searchParams = request.nextUrl.searchParams
+    const name = (searchParams.get("name") || "").trim()
+    if (!name) {
+      return NextResponse.json({ success: false, error: "name is required" }, { status: 400 })
+    }
+
+    // Unchanged generation and query: 304 without touching the deals
+    const etag = await dealsETag(request)
+    const unchanged = notModified(request, etag)
+    if (unchanged) return unchanged
+
+    const deals = await getDealsByClient(name, searchParams.get("start"), searchParams.get("end"))
+
+    return NextResponse.json({
+      success: true,
+      clientName: name,
+      count: deals.length,
+      data: deals,
+    }, { headers: cacheHeaders(etag) })
+  } catch (error: any) {
+    console.error("Bulk deals by-client API error", error)
+    return NextResponse.json(
+      { error: "Failed to load bulk deals", message: error?.message },
+      { status: 500 },
+    )
+  }
+}
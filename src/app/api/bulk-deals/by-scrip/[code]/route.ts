@@ -0,0 +1,37 @@
+import { NextRequest, NextResponse } from "next/server"
+import { getDealsByScrip } from "@/lib/bulk-deals/database"
+import { cacheHeaders, dealsETag, notModified } from "@/lib/bulk-deals/etag"
+
+export const dynamic = "force-dynamic"
+export const revalidate = 0
+export const runtime = "nodejs"
+
+// A security's deals, newest first, from the per-scrip posting list
+export async function GET(
+  request: NextRequest,
+  { params }: { params: Promise<{ code: string }> }
+) {
+  try {
+    // Unchanged generation and query: 304 without touching the deals
+    const etag = await dealsETag(request)
+    const unchanged = notModified(request, etag)
+    if (unchanged) return unchanged
+
+    const { code: scripCode } = await params
+    const searchParams = request.nextUrl.searchParams
+    const deals = await getDealsByScrip(scripCode, searchParams.get("start"), searchParams.get("end"))
+
+    return NextResponse.json({
+      success: true,
+      scripCode,
+      count: deals.length,
+      data: deals,
+    }, { headers: cacheHeaders(etag) })
+  } catch (error: any) {
+    console.error("Bulk deals by-scrip API error", error)
+    return NextResponse.json(
+      { error: "Failed to load bulk deals", message: error?.message },
+      { status: 500 },
+    )
+  }
+}
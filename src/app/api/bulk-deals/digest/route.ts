@@ -1,6 +1,6 @@
 import { NextRequest, NextResponse } from "next/server"
-import fs from "fs/promises"
-import path from "path"
+import { getTopDeals, loadBulkDealsDatabase } from "@/lib/bulk-deals/database"
+import { cacheHeaders, dealsETag, notModified } from "@/lib/bulk-deals/etag"
 
 export const dynamic = "force-dynamic"
 export const runtime = "nodejs"
@@ -18,6 +18,11 @@ function formatDate(d: Date): string {
 
 export async function GET(request: NextRequest) {
   try {
+    // Unchanged generation and query: 304 without touching the deals
+    const etag = await dealsETag(request)
+    const unchanged = notModified(request, etag)
+    if (unchanged) return unchanged
+
     const searchParams = request.nextUrl.searchParams
     const dateParam = searchParams.get("date")
     
@@ -25,12 +30,7 @@ export async function GET(request: NextRequest) {
     const targetDate = dateParam || formatDate(new Date())
     
     // Load database
-    const projectRoot = process.cwd()
-    const dbPath = path.join(projectRoot, "python-services", "data", "bulk-deals", "bulk_deals_database.json")
-    
-    const dbFile = await fs.readFile(dbPath, "utf-8")
-    const database = JSON.parse(dbFile)
-    const allDeals = database.deals || []
+    const { deals: allDeals } = await loadBulkDealsDatabase()
     
     // Filter by date
     const dayDeals = allDeals.filter((d: any) => d.date === targetDate)
@@ -43,7 +43,7 @@ export async function GET(request: NextRequest) {
         stats: null,
         topDeals: [],
         topInvestors: [],
-      })
+      }, { headers: cacheHeaders(etag) })
     }
     
     // Calculate stats
@@ -58,25 +58,21 @@ export async function GET(request: NextRequest) {
     const uniqueCompanies = new Set(dayDeals.map((d: any) => d.scripCode || d.securityName)).size
     const uniqueInvestors = new Set(dayDeals.map((d: any) => d.clientName)).size
     
-    // Top deals by value
-    const dealsWithValue = dayDeals.map((d: any) => ({
-      ...d,
-      value: (Number(d.quantity) || 0) * (Number(d.price) || 0)
-    }))
-    
-    const topDeals = dealsWithValue
-      .sort((a: any, b: any) => b.value - a.value)
-      .slice(0, 10)
-      .map((d: any) => ({
-        company: d.securityName,
-        code: d.scripCode,
-        investor: d.clientName,
-        side: d.side === 'BUY' || d.side === 'B' || d.side === 'P' ? 'BUY' : 'SELL',
-        value: d.value,
-        valueFormatted: rupeeCompact(d.value),
-        quantity: d.quantity,
-        price: d.price,
-      }))
+    // Top deals by value: bounded selection over the day, no full sort
+    const topDeals = (await getTopDeals({ k: 10, start: targetDate, end: targetDate }))
+      .map((d: any) => {
+        const value = (Number(d.quantity) || 0) * (Number(d.price) || 0)
+        return {
+          company: d.securityName,
+          code: d.scripCode,
+          investor: d.clientName,
+          side: d.side === 'BUY' || d.side === 'B' || d.side === 'P' ? 'BUY' : 'SELL',
+          value,
+          valueFormatted: rupeeCompact(value),
+          quantity: d.quantity,
+          price: d.price,
+        }
+      })
     
     // Top investors
     const investorMap = new Map<string, { name: string; totalValue: number; buyValue: number; sellValue: number; dealCount: number }>()
@@ -101,7 +97,7 @@ export async function GET(request: NextRequest) {
       }))
     
     // Big money deals (>= ₹10 Cr)
-    const bigMoneyDeals = dealsWithValue.filter((d: any) => d.value >= 1e8)
+    const bigMoneyDeals = dayDeals.filter((d: any) => (Number(d.quantity) || 0) * (Number(d.price) || 0) >= 1e8)
     
     // Generate text summary
     const summary = `
@@ -140,7 +136,7 @@ ${topInvestors.slice(0, 5).map((inv, i) => `${i + 1}. ${inv.name} - ${inv.totalV
       },
       topDeals,
       topInvestors,
-    })
+    }, { headers: cacheHeaders(etag) })
   } catch (error: any) {
     console.error("Digest API error:", error)
     return NextResponse.json(
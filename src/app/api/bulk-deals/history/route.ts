@@ -1,16 +1,12 @@
 import { NextRequest, NextResponse } from "next/server"
-import fs from "fs/promises"
-import path from "path"
+import { getDealsPage, loadBulkDealsDatabase, type DealsPage } from "@/lib/bulk-deals/database"
+import { cacheHeaders, dealsETag, notModified } from "@/lib/bulk-deals/etag"
+import { parseShape, shapeDeals, type DealsShape } from "@/lib/bulk-deals/projection"
 
 export const dynamic = "force-dynamic"
 export const revalidate = 0
 export const runtime = "nodejs"
 
-// Cache the database in memory after first load
-let cachedDatabase: { deals: any[]; metadata: any } | null = null
-let cacheTimestamp = 0
-const CACHE_DURATION = 3600_000 // 1 hour
-
 function normalizeDate(d: Date): Date {
   return new Date(d.getFullYear(), d.getMonth(), d.getDate())
 }
@@ -29,40 +25,13 @@ function formatDate(d: Date): string {
   return `${year}-${month}-${day}`
 }
 
-async function loadDatabase() {
-  const now = Date.now()
-  
-  // Return cached if still valid
-  if (cachedDatabase && (now - cacheTimestamp) < CACHE_DURATION) {
-    return cachedDatabase
-  }
-  
-  const projectRoot = process.cwd()
-  const dbPath = path.join(projectRoot, "python-services", "data", "bulk-deals", "bulk_deals_database.json")
-  const metaPath = path.join(projectRoot, "python-services", "data", "bulk-deals", "database_metadata.json")
-  
-  try {
-    const [dbFile, metaFile] = await Promise.all([
-      fs.readFile(dbPath, "utf-8"),
-      fs.readFile(metaPath, "utf-8").catch(() => "{}"),
-    ])
-    
-    const database = JSON.parse(dbFile)
-    const metadata = JSON.parse(metaFile)
-    
-    cachedDatabase = { deals: database.deals || [], metadata }
-    cacheTimestamp = now
-    
-    console.log(`[BulkDealsHistory] Loaded ${cachedDatabase.deals.length.toLocaleString()} deals from database`)
-    return cachedDatabase
-  } catch (err: any) {
-    console.error("[BulkDealsHistory] Failed to load database:", err.message)
-    return { deals: [], metadata: {} }
-  }
-}
-
 export async function GET(request: NextRequest) {
   try {
+    // Unchanged generation and query: 304 without touching the deals
+    const etag = await dealsETag(request)
+    const unchanged = notModified(request, etag)
+    if (unchanged) return unchanged
+
     const searchParams = request.nextUrl.searchParams
     const startParam = searchParams.get("start")
     const endParam = searchParams.get("end")
@@ -71,6 +40,16 @@ export async function GET(request: NextRequest) {
     const scripCodeParam = searchParams.get("scripCode")
     const tickerParam = searchParams.get("ticker")?.toUpperCase()
     const personParam = searchParams.get("person")?.toLowerCase()
+    const limitParam = searchParams.get("limit")
+    const cursorParam = searchParams.get("cursor")
+
+    // ?fields= projection and ?format=columnar
+    let shape: DealsShape
+    try {
+      shape = parseShape(searchParams)
+    } catch (error: any) {
+      return NextResponse.json({ error: error.message }, { status: 400 })
+    }
 
     const today = normalizeDate(new Date())
 
@@ -94,17 +73,14 @@ export async function GET(request: NextRequest) {
       endDate = tmp
     }
 
-    // Load database (cached)
-    const { deals, metadata } = await loadDatabase()
+    // Cached in memory; deals logged since the last request are applied as deltas
+    const { deals, metadata } = await loadBulkDealsDatabase()
     
     const startStr = formatDate(startDate)
     const endStr = formatDate(endDate)
     
-    // Filter deals by date range, exchange, and company/person
-    const filteredDeals = deals.filter((deal: any) => {
-      const dealDate = deal.date || deal.deal_date || ""
-      if (dealDate < startStr || dealDate > endStr) return false
-      
+    // Exchange and company/person filters
+    const matches = (deal: any): boolean => {
       if (exchangeParam !== "both") {
         const ex = (deal.exchange || "bse").toLowerCase()
         if (ex !== exchangeParam) return false
@@ -123,6 +99,38 @@ export async function GET(request: NextRequest) {
       }
       
       return true
+    }
+
+    const metadataSummary = {
+      dateRange: metadata.date_range,
+      totalDeals: metadata.total_deals,
+      lastUpdated: metadata.last_updated,
+    }
+
+    // Keyset pagination: one newest-first page, continue with ?cursor=<nextCursor>
+    if (limitParam || cursorParam) {
+      const limit = Math.min(Math.max(parseInt(limitParam || "100", 10) || 100, 1), 1000)
+      let page: DealsPage
+      try {
+        page = await getDealsPage({ limit, cursor: cursorParam, start: startStr, end: endStr, filter: matches })
+      } catch {
+        return NextResponse.json({ error: "Invalid cursor" }, { status: 400 })
+      }
+      return NextResponse.json({
+        success: true,
+        start: startStr,
+        end: endStr,
+        count: page.deals.length,
+        totalInDatabase: deals.length,
+        data: shapeDeals(page.deals, shape),
+        nextCursor: page.nextCursor,
+        metadata: metadataSummary,
+      }, { headers: cacheHeaders(etag) })
+    }
+
+    const filteredDeals = deals.filter((deal: any) => {
+      const dealDate = deal.date || deal.deal_date || ""
+      return dealDate >= startStr && dealDate <= endStr && matches(deal)
     })
 
     // Sort most recent deals first
@@ -138,13 +146,9 @@ export async function GET(request: NextRequest) {
       end: endStr,
       count: filteredDeals.length,
       totalInDatabase: deals.length,
-      data: filteredDeals,
-      metadata: {
-        dateRange: metadata.date_range,
-        totalDeals: metadata.total_deals,
-        lastUpdated: metadata.last_updated,
-      },
-    })
+      data: shapeDeals(filteredDeals, shape),
+      metadata: metadataSummary,
+    }, { headers: cacheHeaders(etag) })
   } catch (error: any) {
     console.error("Bulk deals history API error", error)
     return NextResponse.json(
@@ -0,0 +1,63 @@
+import { NextRequest, NextResponse } from "next/server"
+import { getTopDeals } from "@/lib/bulk-deals/database"
+import { cacheHeaders, dealsETag, notModified } from "@/lib/bulk-deals/etag"
+import { parseShape, shapeDeals, type DealsShape } from "@/lib/bulk-deals/projection"
+
+export const dynamic = "force-dynamic"
+export const revalidate = 0
+export const runtime = "nodejs"
+
+const MAX_K = 1000
+
+// The k largest deals by value or quantity in a window, same parameters as the Python service's /top
+export async function GET(request: NextRequest) {
+  try {
+    const searchParams = request.nextUrl.searchParams
+    const by = (searchParams.get("by") || "value").trim().toLowerCase()
+    if (by !== "value" && by !== "quantity") {
+      return NextResponse.json({ success: false, error: "by must be one of: value, quantity" }, { status: 400 })
+    }
+    const exchange = (searchParams.get("exchange") || "").trim().toUpperCase()
+    if (exchange && exchange !== "BSE" && exchange !== "NSE") {
+      return NextResponse.json({ success: false, error: "exchange must be BSE or NSE" }, { status: 400 })
+    }
+    const side = (searchParams.get("side") || "").trim().toUpperCase()
+    if (side && side !== "BUY" && side !== "SELL") {
+      return NextResponse.json({ success: false, error: "side must be BUY or SELL" }, { status: 400 })
+    }
+    let shape: DealsShape
+    try {
+      shape = parseShape(searchParams)
+    } catch (error: any) {
+      return NextResponse.json({ success: false, error: error.message }, { status: 400 })
+    }
+    const k = Math.min(Math.max(parseInt(searchParams.get("k") || "20", 10) || 20, 1), MAX_K)
+
+    // Unchanged generation and query: 304 without touching the deals
+    const etag = await dealsETag(request)
+    const unchanged = notModified(request, etag)
+    if (unchanged) return unchanged
+
+    const deals = await getTopDeals({
+      k,
+      by,
+      start: searchParams.get("start"),
+      end: searchParams.get("end"),
+      exchange,
+      side,
+    })
+
+    return NextResponse.json({
+      success: true,
+      by,
+      count: deals.length,
+      data: shapeDeals(deals, shape),
+    }, { headers: cacheHeaders(etag) })
+  } catch (error: any) {
+    console.error("Bulk deals top API error", error)
+    return NextResponse.json(
+      { error: "Failed to load bulk deals", message: error?.message },
+      { status: 500 },
+    )
+  }
+}
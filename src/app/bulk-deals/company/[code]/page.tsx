@@ -53,9 +53,14 @@ export default function CompanyBulkDealsPage() {
     async function fetchDeals() {
       setLoading(true)
       try {
-        const res = await fetch(`/api/bulk-deals/history?start=2012-01-01&end=${new Date().toISOString().split('T')[0]}`)
-        const data = await res.json()
-        const allDeals: Deal[] = (data.data || []).map((d: any) => ({
+        // Posting-list lookup by scrip code; links without a code carry the security name instead
+        let res = await fetch(`/api/bulk-deals/by-scrip/${encodeURIComponent(companyCode)}`)
+        let data = await res.json()
+        if (!data.data?.length) {
+          res = await fetch(`/api/bulk-deals/history?start=2012-01-01&end=${new Date().toISOString().split('T')[0]}&ticker=${encodeURIComponent(companyCode)}`)
+          data = await res.json()
+        }
+        const companyDeals: Deal[] = (data.data || []).map((d: any) => ({
           date: d.date || d.deal_date || "",
           scripCode: d.scripCode || d.scrip_code || "",
           securityName: d.securityName || d.security_name || d.Company || "",
@@ -66,15 +71,7 @@ export default function CompanyBulkDealsPage() {
           type: d.type || "bulk",
           exchange: d.exchange || "BSE",
         }))
-        
-        // Filter by company code or name
-        const companyDeals = allDeals.filter(d => 
-          d.scripCode === companyCode || 
-          d.scripCode.toLowerCase() === companyCode.toLowerCase() ||
-          d.securityName.toLowerCase().includes(companyCode.toLowerCase())
-        )
-        
-        companyDeals.sort((a, b) => b.date.localeCompare(a.date))
+
         setDeals(companyDeals)
       } catch (err) {
         console.error('Failed to fetch deals:', err)
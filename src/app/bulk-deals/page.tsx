@@ -1,6 +1,6 @@
 "use client"
 
-import { useEffect, useMemo, useState, useCallback } from "react"
+import { useEffect, useMemo, useState, useCallback, useRef } from "react"
 import Link from "next/link"
 import { Search, Filter, TrendingUp, TrendingDown, ArrowUpRight, ArrowDownRight, Calendar, Users, Building2, Activity, ChevronLeft, ChevronRight, RefreshCw, ExternalLink, Database, Sparkles, BarChart3, Target, Zap } from "lucide-react"
 import { BulkDealsAIBar } from "@/components/bulk-deals-ai-bar"
@@ -81,6 +81,10 @@ function rupeeCompact(v: number | null | undefined) {
 
 function clsx(...v: (string | false | undefined)[]) { return v.filter(Boolean).join(" ") }
 
+// History is paged newest first: a small first page for the first screen, then larger pages
+const FIRST_PAGE_SIZE = 200
+const HISTORY_PAGE_SIZE = 1000
+
 export default function BulkDealsPage() {
   const [from, setFrom] = useState(() => new Date(Date.now() - 7*24*3600*1000))
   const [to, setTo] = useState(() => new Date())
@@ -148,16 +152,21 @@ export default function BulkDealsPage() {
     return `${year}-${month}-${day}`
   }
 
+  // Bumped on every fetchDeals so a superseded run stops paging
+  const fetchRun = useRef(0)
+
   const fetchDeals = async () => {
+    const run = ++fetchRun.current
     setLoading(true)
     setPage(1)
     try {
-      // Fetch from history API (has 182K deals from 2012-2025)
+      // Fetch from history API (has 182K deals from 2012-2025), first page only
       const startDate = formatDateLocal(from)
       const endDate = formatDateLocal(to)
+      const historyUrl = `/api/bulk-deals/history?start=${startDate}&end=${endDate}`
       
       const [historyRes, liveRes] = await Promise.all([
-        fetch(`/api/bulk-deals/history?start=${startDate}&end=${endDate}`, { cache: "no-store" }),
+        fetch(`${historyUrl}&limit=${FIRST_PAGE_SIZE}`, { cache: "no-store" }),
         fetch(`/api/bse/bulk-deals`, { cache: "no-store" }),
       ])
       
@@ -201,24 +210,40 @@ export default function BulkDealsPage() {
       const liveDeals = normalizeDeals(liveData.deals || liveData.data || [])
 
       // Merge history + live data, deduplicating by unique key
+      const dealKey = (d: Deal) => `${d.date}|${d.scripCode}|${d.clientName}|${d.side}`
       const dealsMap = new Map<string, Deal>()
       for (const d of historyDeals) {
-        const key = `${d.date}|${d.scripCode}|${d.clientName}|${d.side}`
-        dealsMap.set(key, d)
+        dealsMap.set(dealKey(d), d)
       }
       for (const d of liveDeals) {
-        const key = `${d.date}|${d.scripCode}|${d.clientName}|${d.side}`
-        dealsMap.set(key, d) // Live data overwrites history
+        dealsMap.set(dealKey(d), d) // Live data overwrites history
       }
       
+      if (run !== fetchRun.current) return
       setDeals(Array.from(dealsMap.values()))
+      setLoading(false)
+
+      // Older pages of the range load in the background, appended as they arrive
+      let cursor: string | null = historyData.nextCursor || null
+      while (cursor) {
+        const res = await fetch(`${historyUrl}&limit=${HISTORY_PAGE_SIZE}&cursor=${encodeURIComponent(cursor)}`, { cache: "no-store" })
+        const more = await res.json()
+        if (run !== fetchRun.current) return
+        for (const d of normalizeDeals(more.data || [])) {
+          const key = dealKey(d)
+          if (!dealsMap.has(key)) dealsMap.set(key, d)
+        }
+        setDeals(Array.from(dealsMap.values()))
+        cursor = more.nextCursor || null
+      }
     } catch (err) {
       console.error('Failed to fetch deals:', err)
+      if (run !== fetchRun.current) return
       // Fallback to localStorage cache
       const cachedDeals = getCachedDeals()
       setDeals(cachedDeals)
     } finally {
-      setLoading(false)
+      if (run === fetchRun.current) setLoading(false)
     }
   }
 
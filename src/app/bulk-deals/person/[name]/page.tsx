@@ -107,10 +107,10 @@ export default function PersonProfilePage() {
     async function fetchDeals() {
       setLoading(true)
       try {
-        // Fetch all time data for this person
-        const res = await fetch(`/api/bulk-deals/history?start=2012-01-01&end=${new Date().toISOString().split('T')[0]}`)
+        // All-time deals for this person, newest first, from the per-client posting list
+        const res = await fetch(`/api/bulk-deals/by-client?name=${encodeURIComponent(personName)}`)
         const data = await res.json()
-        const allDeals: Deal[] = (data.data || []).map((d: any) => ({
+        const personDeals: Deal[] = (data.data || []).map((d: any) => ({
           date: d.date || d.deal_date || "",
           scripCode: d.scripCode || d.scrip_code || "",
           securityName: d.securityName || d.security_name || d.Company || "",
@@ -121,15 +121,7 @@ export default function PersonProfilePage() {
           type: d.type || "bulk",
           exchange: d.exchange || "BSE",
         }))
-        
-        // Filter by person name (case-insensitive)
-        const personDeals = allDeals.filter(d => 
-          d.clientName.toLowerCase() === personName.toLowerCase()
-        )
-        
-        // Sort by date descending
-        personDeals.sort((a, b) => b.date.localeCompare(a.date))
-        
+
         setDeals(personDeals)
       } catch (err) {
         console.error('Failed to fetch deals:', err)
@@ -0,0 +1,32 @@
+/**
+ * Client name normalization, the same rules as canonical_client_name in
+ * python-services/deal_entities.py (upper case, no punctuation, single spaces,
+ * legal suffixes and HUF spelled out one way). Both sides build the dedup key
+ * from it, so they must agree exactly: python-services/test_deal_entities.py
+ * runs python-services/testdata/client_names.json through both.
+ */
+
+// Whole-token rewrites applied after punctuation is stripped
+const CLIENT_TOKEN_SYNONYMS: Record<string, string> = {
+  PVT: "PRIVATE", PVTLTD: "PRIVATE LIMITED", PRIV: "PRIVATE",
+  LTD: "LIMITED", LIMTED: "LIMITED",
+  CORP: "CORPORATION", CORPN: "CORPORATION",
+  INTL: "INTERNATIONAL",
+  MGMT: "MANAGEMENT",
+}
+
+export function canonicalClientName(name: any): string {
+  const text = String(name || "")
+    .toUpperCase()
+    .replace(/^\s*M\s*\/\s*S\.?\s+/, "")
+    .replace(/&/g, " AND ")
+    .replace(/[.']/g, "")
+    .replace(/[^A-Z0-9 ]+/g, " ")
+  return text
+    .split(" ")
+    .filter(Boolean)
+    .map((token) => CLIENT_TOKEN_SYNONYMS[token] ?? token)
+    .join(" ")
+    .replace(/\bH U F\b/g, "HUF")
+    .replace(/\bP (?=LIMITED\b)/g, "PRIVATE ")
+}
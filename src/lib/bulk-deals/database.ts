@@ -0,0 +1,458 @@
+/**
+ * Bulk Deals Database Reader
+ * Server-side view of python-services/data/bulk-deals kept current through the
+ * Python service's change feed: the JSON snapshot is parsed once, then deals
+ * appended to bulk_deals_log.jsonl are applied as deltas whenever the
+ * generation file changes (see python-services/deal_log.py).
+ *
+ * Per-scrip and per-client posting lists (indexes into deals, date-sorted; clients
+ * by the entity key stored with each deal) are kept alongside, mirroring
+ * PostingIndex in python-services/deal_indexes.py, plus one over every deal,
+ * sorted by (date, deal key), that newest-first pages are cut from.
+ */
+
+import fs from "fs/promises"
+import path from "path"
+import { canonicalClientName } from "./clientNames"
+
+const DATA_DIR = path.join(process.cwd(), "python-services", "data", "bulk-deals")
+const DATABASE_PATH = path.join(DATA_DIR, "bulk_deals_database.json")
+const METADATA_PATH = path.join(DATA_DIR, "database_metadata.json")
+const LOG_PATH = path.join(DATA_DIR, "bulk_deals_log.jsonl")
+const PREVIOUS_LOG_PATH = `${LOG_PATH}.prev`
+const GENERATION_PATH = `${LOG_PATH}.generation`
+
+export interface BulkDealsDatabase {
+  deals: any[]
+  metadata: any
+  generation: number
+}
+
+interface CachedDatabase extends BulkDealsDatabase {
+  snapshotStamp: string
+  generationStamp: string
+  epoch: number
+  offset: number
+  keys: Set<string>
+  dealKeys: string[]
+  byDate: number[]
+  byScrip: Map<string, number[]>
+  byClient: Map<string, number[]>
+  // canonical client name -> entity key its deals are posted under
+  clientEntities: Map<string, string>
+}
+
+export interface DealsPage {
+  deals: any[]
+  nextCursor: string | null
+}
+
+let cached: CachedDatabase | null = null
+let loading: Promise<BulkDealsDatabase> | null = null
+
+// Same key python-services uses to recognise a deal it already has
+function dealKey(deal: any): string {
+  return `${deal.date || ""}|${deal.scripCode || ""}|${canonicalClientName(deal.clientName)}|${deal.side || ""}|${deal.exchange || ""}`
+}
+
+// Same normalization as scrip_key in python-services/deal_indexes.py
+function scripKey(code: any): string {
+  return String(code || "").trim().toUpperCase()
+}
+
+// The investor entity python-services stored with the deal (clientEntity: near-identical
+// spellings merged); deals stored before that field fall back to their canonical name
+function clientEntity(db: CachedDatabase, deal: any): string {
+  const canonical = canonicalClientName(deal.clientName ?? deal.client_name)
+  const entity = deal.clientEntity || canonical
+  for (const name of [entity, canonical]) {
+    if (!db.clientEntities.has(name)) db.clientEntities.set(name, entity)
+  }
+  return entity
+}
+
+function dealDate(deal: any): string {
+  return deal.date || deal.deal_date || ""
+}
+
+// First position in a date-sorted posting list dated after `date` (or on it, when inclusive)
+function bisectDate(deals: any[], postings: number[], date: string, inclusive: boolean): number {
+  let lo = 0
+  let hi = postings.length
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1
+    const d = dealDate(deals[postings[mid]])
+    if (d < date || (!inclusive && d === date)) lo = mid + 1
+    else hi = mid
+  }
+  return lo
+}
+
+// Position in byDate of the first deal at (date, key), or with `past` of the first one after it
+function seekPage(db: CachedDatabase, date: string, key: string, past = false): number {
+  let lo = 0
+  let hi = db.byDate.length
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1
+    const i = db.byDate[mid]
+    const d = dealDate(db.deals[i])
+    const k = db.dealKeys[i]
+    if (d < date || (d === date && (k < key || (past && k === key)))) lo = mid + 1
+    else hi = mid
+  }
+  return lo
+}
+
+function insertPosting(postings: number[], deals: any[], i: number) {
+  // New deals are usually the newest: append, else insert at their date
+  if (!postings.length || dealDate(deals[postings[postings.length - 1]]) <= dealDate(deals[i])) {
+    postings.push(i)
+  } else {
+    postings.splice(bisectDate(deals, postings, dealDate(deals[i]), false), 0, i)
+  }
+}
+
+function post(index: Map<string, number[]>, key: string, deals: any[], i: number) {
+  let postings = index.get(key)
+  if (!postings) {
+    postings = []
+    index.set(key, postings)
+  }
+  insertPosting(postings, deals, i)
+}
+
+function postDeal(db: CachedDatabase, i: number) {
+  const deal = db.deals[i]
+  // By deal key within a date, not by index (which differs between processes), so a cursor holds
+  // anywhere; after any stored deal with the same key, so those stay in storage order
+  db.byDate.splice(seekPage(db, dealDate(deal), db.dealKeys[i], true), 0, i)
+  post(db.byScrip, scripKey(deal.scripCode ?? deal.scrip_code), db.deals, i)
+  post(db.byClient, clientEntity(db, deal), db.deals, i)
+}
+
+async function fileStamp(file: string): Promise<string> {
+  try {
+    const stat = await fs.stat(file)
+    return `${stat.mtimeMs}:${stat.ino}:${stat.size}`
+  } catch {
+    return ""
+  }
+}
+
+async function readPosition(): Promise<{ generation: number; epoch: number }> {
+  try {
+    const state = JSON.parse(await fs.readFile(GENERATION_PATH, "utf-8"))
+    return { generation: Number(state.generation) || 0, epoch: Number(state.epoch) || 0 }
+  } catch {
+    return { generation: 0, epoch: 0 }
+  }
+}
+
+// Complete JSON lines after a byte offset, and the offset just past the last one
+async function readLines(file: string, offset: number): Promise<{ deals: any[]; offset: number }> {
+  let buffer: Buffer
+  try {
+    const handle = await fs.open(file, "r")
+    try {
+      const { size } = await handle.stat()
+      buffer = Buffer.alloc(Math.max(size - offset, 0))
+      if (buffer.length) await handle.read(buffer, 0, buffer.length, offset)
+    } finally {
+      await handle.close()
+    }
+  } catch {
+    return { deals: [], offset }
+  }
+  const end = buffer.lastIndexOf(0x0a) + 1
+  if (end === 0) return { deals: [], offset }
+
+  const deals: any[] = []
+  for (const line of buffer.subarray(0, end).toString("utf-8").split("\n")) {
+    if (!line.trim()) continue
+    try {
+      deals.push(JSON.parse(line))
+    } catch {
+      // torn or corrupt line: skipped, like DealLog.read()
+    }
+  }
+  return { deals, offset: offset + end }
+}
+
+async function readMetadata(): Promise<any> {
+  try {
+    return JSON.parse(await fs.readFile(METADATA_PATH, "utf-8"))
+  } catch {
+    return {}
+  }
+}
+
+function applyDeals(db: CachedDatabase, deals: any[]): number {
+  let added = 0
+  for (const deal of deals) {
+    const key = dealKey(deal)
+    if (db.keys.has(key)) continue
+    db.keys.add(key)
+    db.dealKeys.push(key)
+    db.deals.push(deal)
+    postDeal(db, db.deals.length - 1)
+    added++
+  }
+  return added
+}
+
+async function loadFull(snapshotStamp: string, generationStamp: string): Promise<CachedDatabase> {
+  const position = await readPosition()
+  const [dbFile, metadata] = await Promise.all([
+    fs.readFile(DATABASE_PATH, "utf-8").catch((err) => {
+      console.error("[BulkDealsDatabase] Failed to load database:", err.message)
+      return "{}"
+    }),
+    readMetadata(),
+  ])
+  const deals: any[] = JSON.parse(dbFile).deals || []
+  const dealKeys = deals.map(dealKey)
+
+  const db: CachedDatabase = {
+    deals,
+    metadata,
+    generation: position.generation,
+    snapshotStamp,
+    generationStamp,
+    epoch: position.epoch,
+    offset: 0,
+    keys: new Set(dealKeys),
+    dealKeys,
+    byDate: [],
+    byScrip: new Map(),
+    byClient: new Map(),
+    clientEntities: new Map(),
+  }
+  // Post in (date, deal key) order so every list is built by appends
+  const order = deals.map((_, i) => i).sort((a, b) => {
+    const dateA = dealDate(deals[a])
+    const dateB = dealDate(deals[b])
+    if (dateA !== dateB) return dateA < dateB ? -1 : 1
+    return dealKeys[a] < dealKeys[b] ? -1 : dealKeys[a] > dealKeys[b] ? 1 : a - b
+  })
+  for (const i of order) postDeal(db, i)
+  const logged = await readLines(LOG_PATH, 0)
+  applyDeals(db, logged.deals)
+  db.offset = logged.offset
+
+  console.log(`[BulkDealsDatabase] Loaded ${db.deals.length.toLocaleString()} deals (generation ${db.generation})`)
+  return db
+}
+
+async function refresh(): Promise<BulkDealsDatabase> {
+  const [snapshotStamp, generationStamp] = await Promise.all([fileStamp(DATABASE_PATH), fileStamp(GENERATION_PATH)])
+
+  if (cached && cached.snapshotStamp === snapshotStamp && cached.generationStamp === generationStamp) {
+    return cached
+  }
+
+  // Deltas only: same snapshot, or one compaction we can bridge through the rotated log
+  if (cached) {
+    const position = await readPosition()
+    let delta: { deals: any[]; offset: number } | null = null
+    if (position.epoch === cached.epoch && cached.snapshotStamp === snapshotStamp) {
+      delta = await readLines(LOG_PATH, cached.offset)
+    } else if (position.epoch === cached.epoch + 1) {
+      const previous = await readLines(PREVIOUS_LOG_PATH, cached.offset)
+      const current = await readLines(LOG_PATH, 0)
+      delta = { deals: [...previous.deals, ...current.deals], offset: current.offset }
+    }
+    if (delta) {
+      const added = applyDeals(cached, delta.deals)
+      cached.offset = delta.offset
+      cached.epoch = position.epoch
+      cached.generation = position.generation
+      cached.snapshotStamp = snapshotStamp
+      cached.generationStamp = generationStamp
+      if (added) cached.metadata = await readMetadata()
+      return cached
+    }
+  }
+
+  cached = await loadFull(snapshotStamp, generationStamp)
+  return cached
+}
+
+/**
+ * The bulk deals database, current as of the last deal any Python process logged.
+ * Cheap when nothing changed (two stats); otherwise applies only the new deals.
+ */
+export async function loadBulkDealsDatabase(): Promise<BulkDealsDatabase> {
+  if (!loading) {
+    loading = refresh().finally(() => {
+      loading = null
+    })
+  }
+  return loading
+}
+
+function postedDeals(db: CachedDatabase, postings: number[] | undefined, start?: string | null, end?: string | null): any[] {
+  if (!postings) return []
+  const from = start ? bisectDate(db.deals, postings, start, true) : 0
+  const to = end ? bisectDate(db.deals, postings, end, false) : postings.length
+  const result: any[] = []
+  for (let k = to - 1; k >= from; k--) result.push(db.deals[postings[k]])
+  return result
+}
+
+/** A security's deals (case-insensitive code match) within optional date bounds, newest first */
+export async function getDealsByScrip(code: string, start?: string | null, end?: string | null): Promise<any[]> {
+  await loadBulkDealsDatabase()
+  return cached ? postedDeals(cached, cached.byScrip.get(scripKey(code)), start, end) : []
+}
+
+/** An investor's deals under any stored spelling of their name within optional date bounds, newest first */
+export async function getDealsByClient(name: string, start?: string | null, end?: string | null): Promise<any[]> {
+  await loadBulkDealsDatabase()
+  if (!cached) return []
+  const canonical = canonicalClientName(name)
+  return postedDeals(cached, cached.byClient.get(cached.clientEntities.get(canonical) ?? canonical), start, end)
+}
+
+// Same token shape as encode_cursor in python-services/bulk_deals_database.py: [date, key,
+// occurrence] as base64url JSON. The key is the deal key, which every process derives from the
+// deal itself; the occurrence tells apart snapshot deals stored under the same key (from before
+// the key was canonical) by their rank in storage order, which every process shares
+function encodeCursor(date: string, key: string, occurrence: number): string {
+  return Buffer.from(JSON.stringify([date, key, occurrence])).toString("base64url")
+}
+
+function decodeCursor(cursor: string): { date: string; key: string; occurrence: number } {
+  let parsed: any
+  try {
+    parsed = JSON.parse(Buffer.from(cursor, "base64url").toString("utf-8"))
+  } catch {
+    parsed = null
+  }
+  // Tokens from before the occurrence was added have two elements
+  const occurrence = Array.isArray(parsed) && parsed.length === 3 ? parsed[2] : 0
+  if (
+    !Array.isArray(parsed) ||
+    parsed.length < 2 ||
+    parsed.length > 3 ||
+    typeof parsed[0] !== "string" ||
+    typeof parsed[1] !== "string" ||
+    !Number.isInteger(occurrence) ||
+    occurrence < 0
+  ) {
+    throw new Error(`Invalid cursor: ${cursor}`)
+  }
+  return { date: parsed[0], key: parsed[1], occurrence }
+}
+
+/**
+ * One page of deals newest first (date desc, then deal key desc, then storage order desc)
+ * within optional date bounds. A cursor resumes just below the previous page's last deal by
+ * bisecting the date-sorted list; a filter is applied while walking down from there.
+ */
+export async function getDealsPage(options: {
+  limit: number
+  cursor?: string | null
+  start?: string | null
+  end?: string | null
+  filter?: (deal: any) => boolean
+}): Promise<DealsPage> {
+  await loadBulkDealsDatabase()
+  if (!cached) return { deals: [], nextCursor: null }
+  const { deals, byDate } = cached
+  const { limit, cursor, start, end, filter } = options
+
+  const from = start ? bisectDate(deals, byDate, start, true) : 0
+  let to = end ? bisectDate(deals, byDate, end, false) : byDate.length
+  if (cursor) {
+    const after = decodeCursor(cursor)
+    const first = seekPage(cached, after.date, after.key)
+    to = Math.min(to, first + after.occurrence, seekPage(cached, after.date, after.key, true))
+  }
+
+  const page: any[] = []
+  let k = to - 1
+  for (; k >= from && page.length < limit; k--) {
+    const deal = deals[byDate[k]]
+    if (!filter || filter(deal)) page.push(deal)
+  }
+  // k + 1 is the last position examined; more may follow only if we stopped early
+  const last = byDate[k + 1]
+  let nextCursor: string | null = null
+  if (page.length && k >= from) {
+    const date = dealDate(deals[last])
+    const key = cached.dealKeys[last]
+    nextCursor = encodeCursor(date, key, k + 1 - seekPage(cached, date, key))
+  }
+  return { deals: page, nextCursor }
+}
+
+// Same classes as side_class in python-services/deal_indexes.py
+function sideClass(side: any): "BUY" | "SELL" | "" {
+  const s = String(side || "").trim().toUpperCase()
+  return s === "BUY" || s === "B" || s === "P" ? "BUY" : s === "SELL" || s === "S" ? "SELL" : ""
+}
+
+export type TopMetric = "value" | "quantity"
+
+function metricOf(deal: any, by: TopMetric): number {
+  const quantity = Number(deal.quantity) || 0
+  return by === "quantity" ? quantity : quantity * (Number(deal.price) || 0)
+}
+
+/**
+ * The k largest deals by traded value (or quantity) within optional date bounds,
+ * exchange and side, largest first (ties: newest first). The date window is cut from
+ * the date-sorted list by bisection and ranked through a k-entry min-heap, so nothing
+ * outside the window is read and only k deals are ever sorted.
+ */
+export async function getTopDeals(options: {
+  k: number
+  by?: TopMetric
+  start?: string | null
+  end?: string | null
+  exchange?: string | null
+  side?: string | null
+}): Promise<any[]> {
+  await loadBulkDealsDatabase()
+  if (!cached) return []
+  const { deals, byDate } = cached
+  const { k, by = "value", start, end } = options
+  const exchange = (options.exchange || "").trim().toUpperCase()
+  const side = sideClass(options.side)
+  if (k <= 0) return []
+
+  // Entries rank by metric, then by position in byDate (later = newer); heap[0] is the weakest kept
+  type Entry = { metric: number; position: number }
+  const heap: Entry[] = []
+  const weaker = (a: Entry, b: Entry) => a.metric < b.metric || (a.metric === b.metric && a.position < b.position)
+  const swap = (i: number, j: number) => {
+    const t = heap[i]
+    heap[i] = heap[j]
+    heap[j] = t
+  }
+
+  const from = start ? bisectDate(deals, byDate, start, true) : 0
+  const to = end ? bisectDate(deals, byDate, end, false) : byDate.length
+  for (let position = from; position < to; position++) {
+    const deal = deals[byDate[position]]
+    if (exchange && String(deal.exchange || "").trim().toUpperCase() !== exchange) continue
+    if (side && sideClass(deal.side) !== side) continue
+    const entry = { metric: metricOf(deal, by), position }
+    if (heap.length < k) {
+      heap.push(entry)
+      for (let i = heap.length - 1; i > 0 && weaker(heap[i], heap[(i - 1) >> 1]); i = (i - 1) >> 1) {
+        swap(i, (i - 1) >> 1)
+      }
+    } else if (weaker(heap[0], entry)) {
+      heap[0] = entry
+      for (let i = 0; ; ) {
+        let m = i
+        for (const c of [2 * i + 1, 2 * i + 2]) if (c < heap.length && weaker(heap[c], heap[m])) m = c
+        if (m === i) break
+        swap(i, m)
+        i = m
+      }
+    }
+  }
+  return heap.sort((a, b) => (weaker(a, b) ? 1 : -1)).map((entry) => deals[byDate[entry.position]])
+}
@@ -0,0 +1,42 @@
+/**
+ * Conditional GET for bulk deals routes
+ * Same scheme as data_etag in python-services/bulk_deals_database.py: a weak
+ * ETag from the database generation plus the normalized query, so a client
+ * revalidating unchanged data gets a 304 instead of the deals again.
+ */
+
+import { createHash } from "crypto"
+import { NextRequest, NextResponse } from "next/server"
+import { loadBulkDealsDatabase } from "./database"
+
+// Data may be stored but is revalidated against its ETag every time
+export const DATA_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+export async function dealsETag(request: NextRequest): Promise<string> {
+  const { generation } = await loadBulkDealsDatabase()
+  const query = [...request.nextUrl.searchParams.entries()]
+    .map(([key, value]) => `${key}=${value}`)
+    .sort()
+    .join("&")
+  // Routes default their windows to today, so the day is part of the key
+  const today = new Date().toISOString().split("T")[0]
+  const digest = createHash("sha1")
+    .update(`${request.nextUrl.pathname}?${query}|${request.headers.get("accept") || ""}|${today}`)
+    .digest("hex")
+    .slice(0, 16)
+  return `W/"${generation}-${digest}"`
+}
+
+export function cacheHeaders(etag: string): Record<string, string> {
+  return { ETag: etag, "Cache-Control": DATA_CACHE_CONTROL, Vary: "Accept" }
+}
+
+/** A 304 if If-None-Match (weak comparison) still matches etag, else null */
+export function notModified(request: NextRequest, etag: string): NextResponse | null {
+  const header = request.headers.get("if-none-match")
+  if (!header) return null
+  const opaque = (tag: string) => tag.trim().replace(/^W\//, "")
+  const tags = header.split(",").map(opaque)
+  if (!tags.includes("*") && !tags.includes(opaque(etag))) return null
+  return new NextResponse(null, { status: 304, headers: cacheHeaders(etag) })
+}
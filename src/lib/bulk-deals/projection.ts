@@ -0,0 +1,42 @@
+/**
+ * Field projection and columnar output for bulk deals routes
+ * Same parameters as python-services/deal_stream.py: ?fields=date,clientName
+ * keeps only those fields, ?format=columnar returns one array per field
+ * instead of an array of objects.
+ */
+
+// Fields every stored deal carries, in output order
+export const DEAL_FIELDS = [
+  "date", "scripCode", "securityName", "clientName", "clientEntity", "side",
+  "quantity", "price", "type", "exchange", "remarks",
+] as const
+
+export type DealField = (typeof DEAL_FIELDS)[number]
+
+export interface DealsShape {
+  fields: DealField[] | null
+  columnar: boolean
+}
+
+/** Requested fields and format; throws naming any field deals do not have */
+export function parseShape(searchParams: URLSearchParams): DealsShape {
+  const columnar = (searchParams.get("format") || "").toLowerCase() === "columnar"
+  const param = searchParams.get("fields")
+  let fields: DealField[] | null = null
+  if (param) {
+    const names = [...new Set(param.split(",").map((f) => f.trim()).filter(Boolean))]
+    const unknown = names.filter((f) => !(DEAL_FIELDS as readonly string[]).includes(f))
+    if (unknown.length) throw new Error(`Unknown fields: ${unknown.join(", ")}`)
+    fields = names.length ? (names as DealField[]) : null
+  }
+  return { fields: fields ?? (columnar ? [...DEAL_FIELDS] : null), columnar }
+}
+
+/** Deals as rows (projected when fields are given) or as { field: values[] } */
+export function shapeDeals(deals: any[], { fields, columnar }: DealsShape): any[] | Record<string, any[]> {
+  if (!fields) return deals
+  if (columnar) {
+    return Object.fromEntries(fields.map((f) => [f, deals.map((deal) => deal[f] ?? "")]))
+  }
+  return deals.map((deal) => Object.fromEntries(fields.map((f) => [f, deal[f] ?? ""])))
+}